@@ -1,23 +1,25 @@
 import asyncio
+import logging
 from dotenv import load_dotenv
 import shutil
 import subprocess
 import requests
 import time
 import os
+import threading
 import aiohttp
+import httpx
 
+from langchain_core.messages import SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_groq import ChatGroq
 from langchain_openai import ChatOpenAI
-from langchain.memory import ConversationBufferMemory
 from langchain.prompts import (
     ChatPromptTemplate,
     MessagesPlaceholder,
     SystemMessagePromptTemplate,
     HumanMessagePromptTemplate,
 )
-from langchain.chains import LLMChain
 
 from deepgram import (
     DeepgramClient,
@@ -27,47 +29,118 @@ from deepgram import (
     Microphone,
 )
 
+from QuickAgent.memory import build_memory
+
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
-class LanguageModelProcessor:
-    def __init__(self):
-        self.llm = ChatGroq(temperature=0, model_name="mixtral-8x7b-32768", groq_api_key=os.getenv("GROQ_API_KEY"))
-        # self.llm = ChatOpenAI(temperature=0, model_name="gpt-4-0125-preview", openai_api_key=os.getenv("OPENAI_API_KEY"))
-        # self.llm = ChatOpenAI(temperature=0, model_name="gpt-3.5-turbo-0125", openai_api_key=os.getenv("OPENAI_API_KEY"))
-
-        self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-        script_dir = os.path.dirname(__file__)  # Get the directory of the current script
-        file_path = os.path.join(script_dir, 'system_prompt.txt')
-        # Load the system prompt from a file
-        with open(file_path, 'r') as file:
-            system_prompt = file.read().strip()
-        
-        self.prompt = ChatPromptTemplate.from_messages([
-            SystemMessagePromptTemplate.from_template(system_prompt),
-            MessagesPlaceholder(variable_name="chat_history"),
-            HumanMessagePromptTemplate.from_template("{text}")
-        ])
-
-        self.conversation = LLMChain(
-            llm=self.llm,
-            prompt=self.prompt,
-            memory=self.memory
-        )
+LLM_MODEL = os.getenv("GROQ_MODEL", "mixtral-8x7b-32768")
+# Keep-alive connections to the Groq API shared by every chat in the process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))
+
+_llm = None
+_prompt = None
+_registry_lock = threading.Lock()
+
+
+def get_llm():
+    """
+    The process-wide chat model. Its sync and async HTTP clients pool
+    connections, so chats reuse warm TLS sessions instead of opening their own.
+    """
+    global _llm
+    with _registry_lock:
+        if _llm is None:
+            limits = httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS)
+            _llm = ChatGroq(
+                temperature=0,
+                model_name=LLM_MODEL,
+                groq_api_key=os.getenv("GROQ_API_KEY"),
+                http_client=httpx.Client(limits=limits, timeout=LLM_TIMEOUT),
+                http_async_client=httpx.AsyncClient(limits=limits, timeout=LLM_TIMEOUT),
+            )
+            # _llm = ChatOpenAI(temperature=0, model_name="gpt-4-0125-preview", openai_api_key=os.getenv("OPENAI_API_KEY"))
+        return _llm
+
+
+def get_prompt():
+    """
+    The chat prompt template, read from system_prompt.txt and parsed once per process.
+    """
+    global _prompt
+    with _registry_lock:
+        if _prompt is None:
+            script_dir = os.path.dirname(__file__)  # Get the directory of the current script
+            file_path = os.path.join(script_dir, 'system_prompt.txt')
+            # Load the system prompt from a file
+            with open(file_path, 'r') as file:
+                system_prompt = file.read().strip()
+
+            _prompt = ChatPromptTemplate.from_messages([
+                SystemMessagePromptTemplate.from_template(system_prompt),
+                # Details about the patient relevant to this turn, if any
+                MessagesPlaceholder(variable_name="context", optional=True),
+                MessagesPlaceholder(variable_name="chat_history"),
+                HumanMessagePromptTemplate.from_template("{text}")
+            ])
+        return _prompt
 
-    def process(self, text):
-        self.memory.chat_memory.add_user_message(text)  # Add user message to memory
 
+class LanguageModelProcessor:
+    def __init__(self, memory=None):
+        # The model and prompt are shared; only the conversation memory is per chat
+        self.llm = get_llm()
+        self.prompt = get_prompt()
+        self.memory = memory or build_memory()
+        self.chain = self.prompt | self.llm
+        self.summary_task = None
+
+    def inputs(self, text, context):
+        inputs = {"text": text, "chat_history": self.memory.load()}
+        if context:
+            facts = "\n".join(f"- {snippet}" for snippet in context)
+            inputs["context"] = [SystemMessage(content=f"What you know about the patient that may help:\n{facts}")]
+        return inputs
+
+    def process(self, text, context=()):
         start_time = time.time()
 
         # Go get the response from the LLM
-        response = self.conversation.invoke({"text": text})
+        response = self.chain.invoke(self.inputs(text, context))
         end_time = time.time()
 
-        self.memory.chat_memory.add_ai_message(response['text'])  # Add AI response to memory
+        # Stored once here; the chain itself keeps no memory. The caller
+        # schedules the summary once the reply is on its way (summarize_later)
+        self.memory.add_turn(text, response.content)
 
         elapsed_time = int((end_time - start_time) * 1000)
-        print(f"LLM ({elapsed_time}ms): {response['text']}")
-        return response['text']
+        logger.debug(f"LLM ({elapsed_time}ms): {response.content}")
+        return response.content
+
+    async def astream(self, text, context=()):
+        """
+        Yield the reply to `text` chunk by chunk as the LLM produces it,
+        then store the exchange in memory once the reply is complete.
+        `context` holds snippets about the patient to show the LLM this turn.
+        """
+        parts = []
+        async for chunk in self.chain.astream(self.inputs(text, context)):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield chunk.content
+
+        self.memory.add_turn(text, "".join(parts))
+        self.summarize_later()
+
+    def summarize_later(self):
+        """
+        Summarise evicted turns in a background task on the event loop, so a
+        reply isn't held up by a second LLM call. At most one runs at a time.
+        """
+        if self.memory.needs_summary and (self.summary_task is None or self.summary_task.done()):
+            self.summary_task = asyncio.create_task(self.memory.asummarize(self.llm))
 
 def get_audio_data(self, text):
         DEEPGRAM_URL = f"https://api.deepgram.com/v1/speak?model={self.MODEL_NAME}&performance=true&encoding=linear16&sample_rate=24000"
@@ -0,0 +1,172 @@
+import logging
+import os
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+logger = logging.getLogger(__name__)
+
+# 'buffer' keeps everything, 'window' drops the oldest turns past the budget,
+# 'summary' folds them into a rolling summary instead
+CHAT_MEMORY_STRATEGY = os.getenv("CHAT_MEMORY_STRATEGY", "summary")
+CHAT_MEMORY_MAX_TOKENS = int(os.getenv("CHAT_MEMORY_MAX_TOKENS", 1500))
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", 200))
+
+# Rough size of a token in English text; close enough for a budget
+CHARS_PER_TOKEN = 4
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You keep notes on a conversation between a dementia patient and their assistant. "
+     "Update the summary with the new lines. Keep what matters for later turns: the patient's "
+     "health, feelings, people and places they mention, and anything they were promised. "
+     "Reply with the summary only, in under {words} words."),
+    ("human", "Current summary:\n{summary}\n\nNew lines:\n{lines}"),
+])
+
+
+def count_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class ChatMemory:
+    """
+    Conversation history kept within a token budget.
+
+    Once the stored turns exceed `max_tokens`, the oldest whole turns are
+    evicted until they fit in three quarters of it, so trimming happens every
+    few turns rather than on each one. With `summarize` the evicted turns
+    wait in `pending` until summarize() folds them into a rolling summary,
+    which is sent ahead of the remaining turns. If summarising keeps
+    failing, pending turns past `max_tokens` are dropped, oldest first.
+    `max_tokens=None` keeps everything.
+
+    New messages collect in `unsaved` and a changed summary sets
+    `summary_dirty` until a conversation store persists them.
+    """
+
+    def __init__(self, max_tokens=CHAT_MEMORY_MAX_TOKENS, summarize=True, summary_tokens=CHAT_SUMMARY_MAX_TOKENS):
+        self.max_tokens = max_tokens
+        self.summarize_evicted = summarize
+        self.summary_tokens = summary_tokens
+        self.messages = []
+        self.tokens = 0
+        self.summary = ""
+        self.pending = []
+        self.unsaved = []
+        # Last message folded into the summary, and whether the summary is unsaved
+        self.summary_through = None
+        self.summary_dirty = False
+
+    def load(self):
+        """
+        The messages to send as chat_history.
+        """
+        if not self.summary:
+            return list(self.messages)
+        return [SystemMessage(content=f"Summary of the conversation so far: {self.summary}")] + self.messages
+
+    def add_turn(self, text, reply):
+        for message in (HumanMessage(content=text), AIMessage(content=reply)):
+            self.messages.append(message)
+            self.unsaved.append(message)
+            self.tokens += count_tokens(message.content)
+        self.trim()
+
+    def restore(self, summary, messages):
+        """
+        Start from a stored summary and the messages that followed it, oldest
+        first. Messages past the budget are queued for summarising.
+        """
+        self.summary = summary
+        for message in messages:
+            self.messages.append(message)
+            self.tokens += count_tokens(message.content)
+        self.trim()
+
+    def trim(self):
+        if self.max_tokens is None or self.tokens <= self.max_tokens:
+            return
+        target = self.max_tokens * 3 // 4
+        # Keep at least the latest turn, however long it is
+        while self.tokens > target and len(self.messages) > 2:
+            for message in self.messages[:2]:
+                self.tokens -= count_tokens(message.content)
+                if self.summarize_evicted:
+                    self.pending.append(message)
+            del self.messages[:2]
+
+    def cap_pending(self):
+        """
+        Drop the oldest pending turns past `max_tokens`, so they can't grow
+        without bound while summaries fail.
+        """
+        if self.max_tokens is None:
+            return
+        excess = sum(count_tokens(message.content) for message in self.pending) - self.max_tokens
+        dropped = 0
+        while excess > 0 and len(self.pending) - dropped > 2:
+            for message in self.pending[dropped:dropped + 2]:
+                excess -= count_tokens(message.content)
+            dropped += 2
+        if dropped:
+            logger.warning(f"Dropping {dropped} messages that could not be summarised")
+            del self.pending[:dropped]
+
+    @property
+    def needs_summary(self):
+        return bool(self.pending)
+
+    def summary_input(self):
+        lines = "\n".join(
+            f"{'Patient' if isinstance(message, HumanMessage) else 'Assistant'}: {message.content}"
+            for message in self.pending
+        )
+        # Ask for words rather than tokens; a word is about 1.3 tokens
+        return {"summary": self.summary or "(none yet)", "lines": lines, "words": self.summary_tokens * 3 // 4}
+
+    def apply_summary(self, summary, summarized):
+        self.summary = summary.strip()[:self.summary_tokens * CHARS_PER_TOKEN]
+        self.summary_through = self.pending[summarized - 1]
+        self.summary_dirty = True
+        # Turns evicted while the summary was being written stay pending
+        del self.pending[:summarized]
+
+    def summarize(self, llm):
+        """
+        Fold pending turns into the summary with one LLM call.
+        """
+        if not self.pending:
+            return
+        self.cap_pending()
+        summarized = len(self.pending)
+        try:
+            result = (SUMMARY_PROMPT | llm).invoke(self.summary_input())
+        except Exception as e:
+            logger.error(f"Failed to summarise conversation: {e}")
+            return
+        self.apply_summary(result.content, summarized)
+
+    async def asummarize(self, llm):
+        if not self.pending:
+            return
+        self.cap_pending()
+        summarized = len(self.pending)
+        try:
+            result = await (SUMMARY_PROMPT | llm).ainvoke(self.summary_input())
+        except Exception as e:
+            logger.error(f"Failed to summarise conversation: {e}")
+            return
+        self.apply_summary(result.content, summarized)
+
+
+def build_memory(strategy=CHAT_MEMORY_STRATEGY):
+    """
+    A ChatMemory configured for the deployment's CHAT_MEMORY_STRATEGY.
+    """
+    if strategy == "buffer":
+        return ChatMemory(max_tokens=None, summarize=False)
+    if strategy == "window":
+        return ChatMemory(summarize=False)
+    if strategy != "summary":
+        logger.warning(f"Unknown CHAT_MEMORY_STRATEGY {strategy!r}, using 'summary'")
+    return ChatMemory()
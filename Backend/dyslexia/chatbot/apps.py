@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ChatbotConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'chatbot'
+
+    def ready(self):
+        # Connect the response cache invalidation receivers
+        from . import signals  # noqa: F401
@@ -1,40 +1,62 @@
-import os
-import sys
 import json
 import logging
+import time
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-from QuickAgent.QuickAgent import LanguageModelProcessor, get_audio_data
+from django.conf import settings
+from QuickAgent.QuickAgent import LanguageModelProcessor
+from .executor import get_executor, ExecutorSaturated
+from .store import get_store, load_memory, save_memory
+from .response_cache import response_cache, patient_generation
+from .retrieval import retrieve_context
+from .speech import split_sentences, synthesize, TurnTimer
 import asyncio
 from dotenv import load_dotenv
-from deepgram import DeepgramClient, DeepgramClientOptions, LiveTranscriptionEvents, LiveOptions
-import websockets, ssl
-import requests
-import threading
+from deepgram import DeepgramClient, LiveTranscriptionEvents, LiveOptions
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
-print(f"DEEPGRAM_API_KEY: {DEEPGRAM_API_KEY}")
-DEEPGRAM_WEBSOCKET_URL = f"wss://api.deepgram.com/v1/listen"
-DEEPGRAM_API_URL = "https://api.deepgram.com/v1/listen"
 
-HEADERS = {
-    "Authorization": f"Token {DEEPGRAM_API_KEY}",
-    "Content-Type": "audio/wav"  # Change this according to the format you're using
-}
+class PatientConversationMixin:
+    """
+    Conversation state shared by the text and voice consumers: the patient's
+    stored history, the details retrieved for each prompt, and saving turns.
+    """
 
+    async def setup_conversation(self):
+        # Patients pick up their stored conversation; anyone else chats without history
+        user = self.scope.get('user')
+        self.store = get_store()
+        self.patient_id = None
+        memory = None
+        if user is not None and user.is_authenticated and user.is_patient:
+            self.patient_id = user.id
+            if self.store is not None:
+                memory = await database_sync_to_async(load_memory)(self.store, self.patient_id)
+        # Only the conversation memory is per connection; the client and prompt are
+        # shared. The first connection builds them (reading the prompt file, setting up
+        # HTTP clients), so do it in a worker thread rather than on the event loop
+        self.llm_processor = await sync_to_async(LanguageModelProcessor, thread_sensitive=False)(memory=memory)
 
-from deepgram import (
-    DeepgramClient,
-    DeepgramClientOptions,
-    LiveTranscriptionEvents,
-    LiveOptions,
-)
+    async def patient_context(self, prompt):
+        if self.patient_id is None:
+            return []
+        return await database_sync_to_async(retrieve_context)(self.patient_id, prompt)
+
+    async def save_history(self):
+        if self.store is None or self.patient_id is None:
+            return
+        try:
+            await database_sync_to_async(save_memory)(self.store, self.patient_id, self.llm_processor.memory)
+        except Exception as e:
+            logger.error(f"Failed to store chat history for patient {self.patient_id}: {e}")
 
-class ChatConsumer(AsyncWebsocketConsumer):
+
+class ChatConsumer(PatientConversationMixin, AsyncWebsocketConsumer):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -42,24 +64,97 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def connect(self):
         logger.debug("WebSocket connection attempt.")
-        self.llm_processor = LanguageModelProcessor()
+        await self.setup_conversation()
         await self.accept()
         logger.debug("WebSocket connection accepted.")
         await self.send(text_data=json.dumps({'type': 'Connection Successful'}))
 
     async def disconnect(self, close_code):
         logger.debug(f"WebSocket disconnected with close code: {close_code}")
+        if hasattr(self, 'llm_processor'):
+            # Keep a summary that finished after the last reply
+            await self.save_history()
 
     async def receive(self, text_data):
         logger.debug(f"Received message: {text_data}")
         try:
-            user_prompt = json.loads(text_data)['prompt']
-            response = self.llm_processor.process(user_prompt)
-            await self.send(text_data=json.dumps({'response': response}))
+            message = json.loads(text_data)
+            user_prompt = message['prompt']
+            context = await self.patient_context(user_prompt)
+            generation = None
+            if self.patient_id is not None:
+                generation = await patient_generation(self.patient_id)
+            # Repeated questions are answered from the cache (patients only; replies are per
+            # patient), as long as the same facts about the patient would go into the prompt
+            cached = None
+            if generation is not None:
+                generation = (generation, tuple(context))
+                cached = response_cache.get(self.patient_id, user_prompt, generation)
+
+            if cached is not None:
+                self.llm_processor.memory.add_turn(user_prompt, cached)
+                await self.send_cached(cached, message.get('stream'))
+                self.llm_processor.summarize_later()
+            else:
+                if message.get('stream'):
+                    response = await self.stream_response(user_prompt, context)
+                else:
+                    # The blocking LLM call runs on the LLM pool, not the event loop
+                    response = await get_executor('llm').run(self.llm_processor.process, user_prompt, context)
+                    await self.send(text_data=json.dumps({'response': response}))
+                    self.llm_processor.summarize_later()
+                if generation is not None and response:
+                    response_cache.put(self.patient_id, user_prompt, response, generation)
+            await self.save_history()
+        except ExecutorSaturated as e:
+            logger.warning(str(e))
+            await self.send(text_data=json.dumps({'error': 'The assistant is busy, please try again shortly.'}))
         except Exception as e:
             logger.error(f"Error processing message: {e}")
             await self.send(text_data=json.dumps({'error': str(e)}))
 
+    async def stream_response(self, user_prompt, context=()):
+        """
+        Send the reply as {"type": "chunk"} messages while the LLM generates it,
+        then a {"type": "done"} message with the full text and timings.
+        Awaiting the async stream keeps the event loop free for other sockets.
+        """
+        start_time = time.perf_counter()
+        first_chunk_ms = None
+        parts = []
+        async for chunk in self.llm_processor.astream(user_prompt, context):
+            if first_chunk_ms is None:
+                first_chunk_ms = int((time.perf_counter() - start_time) * 1000)
+            parts.append(chunk)
+            await self.send(text_data=json.dumps({'type': 'chunk', 'text': chunk}))
+
+        elapsed_ms = int((time.perf_counter() - start_time) * 1000)
+        logger.debug(f"LLM stream: first chunk {first_chunk_ms}ms, total {elapsed_ms}ms")
+        response = ''.join(parts)
+        await self.send(text_data=json.dumps({
+            'type': 'done',
+            'response': response,
+            'first_chunk_ms': first_chunk_ms,
+            'elapsed_ms': elapsed_ms
+        }))
+        return response
+
+    async def send_cached(self, response, stream):
+        """
+        Send a cached reply in the same shape as a generated one, marked cached.
+        """
+        if not stream:
+            await self.send(text_data=json.dumps({'response': response, 'cached': True}))
+            return
+        await self.send(text_data=json.dumps({'type': 'chunk', 'text': response}))
+        await self.send(text_data=json.dumps({
+            'type': 'done',
+            'response': response,
+            'first_chunk_ms': 0,
+            'elapsed_ms': 0,
+            'cached': True
+        }))
+
 
 class TranscriptCollector:
     """Collects transcript parts and forms a full sentence."""
@@ -75,53 +170,142 @@ class TranscriptCollector:
     def reset(self):
         self.parts = []
 
-class DeepgramConsumer(AsyncWebsocketConsumer):
+class DeepgramConsumer(PatientConversationMixin, AsyncWebsocketConsumer):
+    """
+    Full-duplex voice chat.
+
+    Binary frames from the client are audio, forwarded to Deepgram as they
+    arrive. Each finished utterance (speech_final) goes straight to the LLM,
+    and the reply is spoken back sentence by sentence as binary frames of raw
+    linear16 audio on the same socket while the LLM is still generating.
+    Text frames carry the transcript, the reply text and each turn's
+    per-stage latency. Speaking again while a reply plays interrupts it.
+    """
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.transcript_collector = TranscriptCollector()
+        self.dg_connection = None
+        self.reply_task = None
+        self.audio_started_at = None
 
     async def connect(self):
         logger.debug("WebSocket connection attempt.")
         await self.accept()
         logger.debug("WebSocket connection accepted.")
-        self.deepgram = DeepgramClient()
-        self.dg_connection = self.deepgram.listen.websocket.v("1")
+        await self.setup_conversation()
+
+        self.dg_connection = DeepgramClient().listen.asyncwebsocket.v("1")
         self.dg_connection.on(LiveTranscriptionEvents.Transcript, self.on_message)
-        
-        options = LiveOptions(model="nova-2")
-        if self.dg_connection.start(options) is False:
-            print("Failed to start connection")
+        # The app streams raw 16-bit mono PCM from the microphone
+        options = LiveOptions(
+            model="nova-2",
+            encoding="linear16",
+            channels=1,
+            sample_rate=settings.DEEPGRAM_STT_SAMPLE_RATE,
+            punctuate=True,
+            smart_format=True,
+            endpointing=300,
+        )
+        if await self.dg_connection.start(options) is False:
+            logger.error("Failed to start Deepgram connection")
+            await self.send(text_data=json.dumps({'error': 'Speech recognition is unavailable.'}))
+            await self.close()
             return
-        self.lock_exit = threading.Lock()
-        self.exit = False
-
 
-        await self.send(text_data=json.dumps({'type': 'Connection Successful'}))
+        await self.send(text_data=json.dumps({
+            'type': 'Connection Successful',
+            'audio': {'encoding': 'linear16', 'sample_rate': settings.DEEPGRAM_TTS_SAMPLE_RATE},
+        }))
 
     async def disconnect(self, close_code):
         logger.debug(f"WebSocket disconnected with close code: {close_code}")
+        if self.reply_task is not None:
+            self.reply_task.cancel()
+        if self.dg_connection is not None:
+            await self.dg_connection.finish()
+        if hasattr(self, 'llm_processor'):
+            await self.save_history()
 
-    async def receive(self, bytes_data):
-        logger.debug(f"Received message: {bytes_data}")
-        try:
+    async def receive(self, text_data=None, bytes_data=None):
+        if bytes_data is None or self.dg_connection is None:
+            return
+        if self.audio_started_at is None:
+            self.audio_started_at = time.perf_counter()
+        # The whole frame goes to Deepgram's socket as a view, without copying or re-chunking
+        await self.dg_connection.send(memoryview(bytes_data))
+
+    async def on_message(self, client, result, **kwargs):
+        sentence = result.channel.alternatives[0].transcript
+        if result.is_final and sentence:
+            self.transcript_collector.add_part(sentence)
+        if not result.speech_final:
+            return
+
+        full_sentence = self.transcript_collector.get_full_transcript().strip()
+        self.transcript_collector.reset()
+        if not full_sentence:
+            return
 
-            # If you need to iterate over bytes in chunks:
-            chunk_size = 1024  # Define your chunk size
-            for i in range(0, len(bytes_data), chunk_size):
-                chunk = bytes_data[i:i + chunk_size]
-                self.lock_exit.acquire()
-                if self.exit:
-                    break
-                self.lock_exit.release()
+        # How far behind the audio the final transcript arrived, assuming the
+        # client streams in real time (Deepgram's offsets are in audio seconds)
+        spoken_until = self.audio_started_at + result.start + result.duration
+        timer = TurnTimer(stt_ms=max(int((time.perf_counter() - spoken_until) * 1000), 0))
+        await self.send(text_data=json.dumps({'type': 'transcript', 'text': full_sentence}))
 
-                self.dg_connection.send(chunk)
+        if self.reply_task is not None and not self.reply_task.done():
+            self.reply_task.cancel()
+            await self.send(text_data=json.dumps({'type': 'interrupted'}))
+        self.reply_task = asyncio.create_task(self.reply(full_sentence, timer))
 
+    async def reply(self, text, timer):
+        """
+        Stream the LLM's reply to `text`, speaking each sentence as soon as it
+        is complete, then report the turn's timings.
+        """
+        sentences = asyncio.Queue()
+        speaker = asyncio.create_task(self.speak(sentences, timer))
+        try:
+            context = await self.patient_context(text)
+            timer.mark('retrieval_ms')
+            pending = ''
+            parts = []
+            async for chunk in self.llm_processor.astream(text, context):
+                timer.mark('llm_first_token_ms')
+                parts.append(chunk)
+                await self.send(text_data=json.dumps({'type': 'chunk', 'text': chunk}))
+                ready, pending = split_sentences(pending + chunk)
+                for sentence in ready:
+                    sentences.put_nowait((sentence, time.perf_counter()))
+            timer.mark('llm_ms')
+            if pending.strip():
+                sentences.put_nowait((pending.strip(), time.perf_counter()))
+            sentences.put_nowait(None)
+            await speaker
+            timer.mark('total_ms')
+
+            await self.send(text_data=json.dumps({'type': 'done', 'response': ''.join(parts), **timer.stages}))
+            logger.debug(f"Voice turn: {timer.stages}")
+            await self.save_history()
+        except asyncio.CancelledError:
+            speaker.cancel()
+            raise
         except Exception as e:
-            logger.error(f"Error processing message: {e}")
+            speaker.cancel()
+            logger.error(f"Error in voice reply: {e}")
             await self.send(text_data=json.dumps({'error': str(e)}))
 
-    async def on_message(self, result, **kwargs):
-            sentence = result.channel.alternatives[0].transcript
-            if len(sentence) == 0:
+    async def speak(self, sentences, timer):
+        """
+        Turn queued sentences into audio in order, sending each chunk to the
+        client as Deepgram produces it.
+        """
+        while True:
+            item = await sentences.get()
+            if item is None:
                 return
-            print(f"speaker: {sentence}")
\ No newline at end of file
+            sentence, queued_at = item
+            async for audio in synthesize(sentence):
+                timer.mark('tts_first_byte_ms', since=queued_at)
+                timer.mark('first_audio_ms')
+                await self.send(bytes_data=audio)
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorSaturated(Exception):
+    """
+    Raised instead of queueing when an executor already has max_pending jobs.
+    """
+
+
+class BoundedExecutor:
+    """
+    Thread pool for blocking calls made from async consumers, so they run
+    off the event loop.
+
+    At most `max_workers` jobs run at once per process; once `max_pending`
+    jobs are queued or running, new ones are rejected with ExecutorSaturated
+    rather than piling up behind a slow upstream. Queue depth and wait/run
+    times are kept for metrics().
+    """
+
+    def __init__(self, name, max_workers, max_pending):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-executor")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.peak_pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+
+    async def run(self, func, *args):
+        """
+        Run func(*args) on the pool and return its result.
+        """
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise ExecutorSaturated(f"{self.name} executor is at capacity ({self.max_pending} jobs)")
+            self.pending += 1
+            self.submitted += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+            if self.pending == self.max_pending // 2 + 1:
+                logger.warning(f"{self.name} executor queue is over half full ({self.pending}/{self.max_pending})")
+
+        queued_at = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._pool, self._call, queued_at, func, args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def _call(self, queued_at, func, args):
+        started_at = time.perf_counter()
+        with self._lock:
+            self.running += 1
+            wait = started_at - queued_at
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+        ok = False
+        try:
+            result = func(*args)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.run_total += time.perf_counter() - started_at
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def metrics(self):
+        with self._lock:
+            finished = self.completed + self.failed
+            started = finished + self.running
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "running": self.running,
+                "queued": max(self.pending - self.running, 0),
+                "peak_pending": self.peak_pending,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.wait_total / started * 1000, 2) if started else 0.0,
+                "max_wait_ms": round(self.wait_max * 1000, 2),
+                "avg_run_ms": round(self.run_total / finished * 1000, 2) if finished else 0.0,
+            }
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name):
+    """
+    The process-wide executor for `name` (e.g. 'llm'), sized from
+    settings.EXECUTOR_LIMITS.
+    """
+    with _executors_lock:
+        if name not in _executors:
+            max_workers, max_pending = settings.EXECUTOR_LIMITS[name]
+            _executors[name] = BoundedExecutor(name, max_workers, max_pending)
+        return _executors[name]
+
+
+def executor_metrics():
+    with _executors_lock:
+        executors = list(_executors.values())
+    return {executor.name: executor.metrics() for executor in executors}
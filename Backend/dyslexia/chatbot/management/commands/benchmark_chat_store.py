@@ -0,0 +1,58 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from langchain_core.messages import HumanMessage
+from users.models import Patient
+from chatbot.store import DatabaseConversationStore, RedisConversationStore, load_memory, save_memory
+
+
+class Command(BaseCommand):
+    help = "Measure per-turn conversation store cost as a patient's chat history grows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', choices=['database', 'redis'], default='database')
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 50000])
+        parser.add_argument('--turns', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if options['backend'] == 'redis':
+            store = RedisConversationStore(settings.CHAT_STORE_REDIS_ALIAS)
+        else:
+            store = DatabaseConversationStore()
+
+        # Everything runs in a transaction that is rolled back at the end
+        with transaction.atomic():
+            patient = Patient.objects.create_user(email='benchmark-chat@example.com', username='benchmark-chat-user', password='benchmark-password')
+            try:
+                self.run(store, patient.id, sorted(options['sizes']), options['turns'])
+            finally:
+                if options['backend'] == 'redis':
+                    store.redis.delete(*store.keys(patient.id))
+                transaction.set_rollback(True)
+
+    def run(self, store, patient_id, sizes, turns):
+        self.stdout.write(f"{'history':>8}  {'append turn':>12}  {'reconnect':>10}  {'loaded':>6}")
+        stored = 0
+        for size in sizes:
+            # Grow the history in bulk, folding all but the last 20 messages into a summary
+            while stored < size:
+                batch = min(size - stored, 1000)
+                ids = store.append(patient_id, [HumanMessage(content=f"filler message {stored + i} " * 8) for i in range(batch)])
+                stored += batch
+            store.save_summary(patient_id, "The patient talked about their garden.", ids[-21])
+
+            memory = load_memory(store, patient_id)
+            start = time.perf_counter()
+            for i in range(turns):
+                memory.add_turn(f"How are you today? {i}", f"I'm well, thank you for asking. {i}")
+                save_memory(store, patient_id, memory)
+            append_ms = (time.perf_counter() - start) * 1000 / turns
+            stored += 2 * turns
+
+            start = time.perf_counter()
+            for _ in range(turns):
+                memory = load_memory(store, patient_id)
+            load_ms = (time.perf_counter() - start) * 1000 / turns
+
+            self.stdout.write(f"{stored:>8}  {append_ms:>10.3f}ms  {load_ms:>8.3f}ms  {len(memory.messages) + len(memory.pending):>6}")
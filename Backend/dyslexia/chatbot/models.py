@@ -0,0 +1,57 @@
+from django.db import models
+from users.models import Patient
+
+
+class ChatMessage(models.Model):
+    """
+    One message of a patient's conversation with the chatbot. Rows are only
+    ever appended; the auto-increment id gives their order.
+    """
+    USER = 'user'
+    ASSISTANT = 'assistant'
+    ROLE_CHOICES = [
+        (USER, 'User'),
+        (ASSISTANT, 'Assistant'),
+    ]
+
+    patient = models.ForeignKey(
+        Patient,
+        on_delete=models.CASCADE,
+        related_name='chat_messages'
+    )
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    content = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Latest messages for a patient
+            models.Index(fields=['patient', '-id'], name='chatmessage_patient_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.role} message for patient {self.patient_id}"
+
+
+class ChatSummary(models.Model):
+    """
+    Rolling summary of a patient's earlier conversation. A new row is added
+    each time the summary changes; the latest one is used.
+    """
+    patient = models.ForeignKey(
+        Patient,
+        on_delete=models.CASCADE,
+        related_name='chat_summaries'
+    )
+    content = models.TextField()
+    # Last ChatMessage folded into this summary
+    through_message_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', '-id'], name='chatsummary_patient_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"Chat summary for patient {self.patient_id} through message {self.through_message_id}"
@@ -0,0 +1,272 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+# Padding that doesn't change what a short question is asking
+FILLER_WORDS = {'please', 'um', 'uh', 'oh', 'hey', 'hi', 'hello', 'well', 'kindly', 'tell', 'me', 'remind'}
+CONTRACTIONS = {
+    'whos': 'who is', 'wheres': 'where is', 'whats': 'what is', 'whens': 'when is',
+    'hows': 'how is', 'im': 'i am', 'isnt': 'is not', 'dont': 'do not', 'didnt': 'did not',
+    'cant': 'can not', 'cannot': 'can not', 'shouldnt': 'should not', 'wont': 'will not',
+}
+# Words ignored when checking two prompts ask about the same things
+FUNCTION_WORDS = {'a', 'an', 'the', 'is', 'are', 'am', 'i', 'my', 'to', 'of', 'be'}
+# Modal, tense, aspect and negation words: "can I take my pills" and "did I
+# take my pills" ask different things, so these must match exactly
+SENSITIVE_WORDS = {
+    'can', 'could', 'should', 'would', 'will', 'may', 'might', 'must', 'shall',
+    'do', 'does', 'did', 'was', 'were', 'has', 'have', 'had', 'been',
+    'again', 'just', 'already', 'still', 'yet', 'ever', 'never', 'not', 'no', 'more', 'another',
+}
+# Prompts whose answer depends on the clock or on earlier turns of this
+# conversation are never cached
+TIME_WORDS = {
+    'time', 'clock', 'oclock', 'date', 'day', 'today', 'tonight', 'tomorrow', 'yesterday',
+    'now', 'week', 'month', 'year', 'later', 'soon', 'ago', 'currently', 'recently',
+}
+CONVERSATION_WORDS = {
+    'said', 'say', 'saying', 'told', 'asked', 'mentioned', 'repeat', 'earlier', 'before',
+    'previous', 'previously', 'last', 'it', 'that', 'this', 'those', 'these',
+    'he', 'she', 'him', 'her', 'they', 'them', 'his', 'their',
+}
+
+
+def normalize(text):
+    """
+    Lowercase, drop punctuation and filler, and expand common contractions,
+    so "Where am I, please?" and "where am i" share a key.
+    """
+    words = []
+    for word in WORD_RE.findall(text.lower().replace("'", "").replace("’", "")):
+        if word not in FILLER_WORDS:
+            words.append(CONTRACTIONS.get(word, word))
+    return " ".join(words)
+
+
+def cacheable(key):
+    """
+    Whether a normalised prompt's reply can be reused: not if it asks about
+    the time or refers back to the conversation ("what did I just say").
+    """
+    words = set(key.split())
+    return bool(words) and not (words & TIME_WORDS or words & CONVERSATION_WORDS)
+
+
+def trigrams(text):
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def content_words(text):
+    return {word for word in text.split() if word not in FUNCTION_WORDS}
+
+
+def same_content(a, b):
+    """
+    Whether two prompts' content words match, allowing for misspellings:
+    each word only one side has needs a close spelling on the other, so
+    "carrer" matches "carer" but "morning" never matches "evening".
+    Sensitive words (see SENSITIVE_WORDS) never count as misspellings.
+    """
+    for words, others in ((a - b, b), (b - a, a)):
+        for word in words:
+            if word in SENSITIVE_WORDS:
+                return False
+            if not any(other not in SENSITIVE_WORDS and jaccard(trigrams(word), trigrams(other)) >= 0.5 for other in others):
+                return False
+    return True
+
+
+class PatientEntries:
+    """
+    One patient's cached replies, least recently used first, with a trigram
+    index for finding near-duplicate prompts.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.index = defaultdict(set)
+
+    def add(self, key, entry):
+        self.remove(key)
+        self.entries[key] = entry
+        for gram in entry['trigrams']:
+            self.index[gram].add(key)
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for gram in entry['trigrams']:
+            keys = self.index.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.index[gram]
+
+    def similar(self, key, grams, threshold):
+        """
+        The cached key whose character trigrams are most similar to `key`,
+        among those asking about the same things (see same_content).
+        """
+        counts = defaultdict(int)
+        for gram in grams:
+            for candidate in self.index.get(gram, ()):
+                counts[candidate] += 1
+
+        words = content_words(key)
+        best, best_score = None, threshold
+        for candidate, shared in counts.items():
+            entry = self.entries[candidate]
+            score = shared / (len(grams) + len(entry['trigrams']) - shared)
+            if score >= best_score and same_content(words, entry['words']):
+                best, best_score = candidate, score
+        return best
+
+
+class ResponseCache:
+    """
+    Per-process cache of chatbot replies keyed by patient and normalised
+    prompt, so a patient asking the same question again is answered without
+    an LLM call.
+
+    An exact match on the normalised prompt is tried first, then the most
+    similar cached prompt scoring at least `threshold`. Entries expire after
+    `ttl` seconds and each patient keeps at most `max_entries`, dropping the
+    least recently used. Entries carry the patient's context generation and
+    are ignored once it moves on (see invalidate_patient). Prompts that are
+    not cacheable() are neither looked up nor stored.
+    """
+
+    def __init__(self, ttl, max_entries, threshold):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._patients = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    def get(self, patient_id, prompt, generation):
+        key = normalize(prompt)
+        now = time.monotonic()
+        with self._lock:
+            if not cacheable(key):
+                self.skipped += 1
+                return None
+            patient = self._patients.get(patient_id)
+            hit = None
+            if patient is not None:
+                if key in patient.entries:
+                    hit = key
+                else:
+                    hit = patient.similar(key, trigrams(key), self.threshold)
+
+            if hit is not None:
+                entry = patient.entries[hit]
+                if entry['expires_at'] <= now or entry['generation'] != generation:
+                    patient.remove(hit)
+                    hit = None
+
+            if hit is None:
+                self.misses += 1
+                return None
+            if hit == key:
+                self.exact_hits += 1
+            else:
+                self.similar_hits += 1
+            patient.entries.move_to_end(hit)
+            return patient.entries[hit]['response']
+
+    def put(self, patient_id, prompt, response, generation):
+        key = normalize(prompt)
+        if not cacheable(key):
+            return
+        with self._lock:
+            patient = self._patients.setdefault(patient_id, PatientEntries())
+            patient.add(key, {
+                'response': response,
+                'generation': generation,
+                'expires_at': time.monotonic() + self.ttl,
+                'trigrams': trigrams(key),
+                'words': content_words(key),
+            })
+            while len(patient.entries) > self.max_entries:
+                patient.remove(next(iter(patient.entries)))
+            self.stores += 1
+
+    def invalidate(self, patient_id):
+        with self._lock:
+            if self._patients.pop(patient_id, None) is not None:
+                self.invalidations += 1
+
+    def metrics(self):
+        with self._lock:
+            hits = self.exact_hits + self.similar_hits
+            lookups = hits + self.misses
+            return {
+                "patients": len(self._patients),
+                "entries": sum(len(patient.entries) for patient in self._patients.values()),
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "skipped": self.skipped,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "invalidations": self.invalidations,
+            }
+
+
+response_cache = ResponseCache(
+    settings.CHAT_CACHE_TTL,
+    settings.CHAT_CACHE_MAX_ENTRIES,
+    settings.CHAT_CACHE_SIMILARITY,
+)
+
+
+def generation_key(patient_id):
+    return f"chat-context:{patient_id}"
+
+
+async def patient_generation(patient_id):
+    """
+    The patient's context generation from the shared cache, so every worker
+    sees an invalidation. None if the cache is unreachable, meaning the
+    response cache should be skipped.
+    """
+    try:
+        return await caches[settings.CHAT_CACHE_ALIAS].aget(generation_key(patient_id), 0)
+    except Exception as e:
+        logger.warning(f"Chat context generation unavailable for patient {patient_id}: {e}")
+        return None
+
+
+def invalidate_patient(patient_id):
+    """
+    Drop cached replies for the patient after their notes or contacts change.
+    """
+    response_cache.invalidate(patient_id)
+    cache = caches[settings.CHAT_CACHE_ALIAS]
+    key = generation_key(patient_id)
+    try:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+    except Exception as e:
+        logger.warning(f"Failed to invalidate cached chat replies for patient {patient_id}: {e}")
@@ -0,0 +1,197 @@
+import logging
+import math
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from django.conf import settings
+from contacts.models import Contact
+from users.changes import collapse
+from users.models import Appointment, ChangeLog, Note
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    'a', 'about', 'am', 'an', 'and', 'are', 'at', 'be', 'can', 'did', 'do', 'does', 'for', 'from', 'has',
+    'have', 'how', 'i', 'in', 'is', 'it', 'me', 'my', 'of', 'on', 'or', 'please', 'tell', 'that', 'the',
+    'there', 'this', 'to', 'was', 'what', 'when', 'where', 'which', 'who', 'will', 'with', 'you', 'your',
+}
+# BM25 term-frequency saturation and length normalisation
+K1 = 1.5
+B = 0.75
+
+
+def tokenize(text):
+    terms = []
+    for word in TOKEN_RE.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        # Crude plural folding so "pills" finds "pill"
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def note_document(note):
+    return f'Note "{note.title}" ({note.date}): {note.description}'
+
+
+def contact_document(contact):
+    return f"Contact: {contact.name}, {contact.relationship}, phone {contact.phone_number}"
+
+
+def appointment_document(appointment):
+    return f"Appointment on {appointment.date} at {appointment.time}: {appointment.description}"
+
+
+# Change-log resource -> (model, columns read, document builder)
+SOURCES = {
+    ChangeLog.NOTE: (Note, ('id', 'title', 'date', 'description'), note_document),
+    ChangeLog.CONTACT: (Contact, ('id', 'name', 'relationship', 'phone_number'), contact_document),
+    ChangeLog.APPOINTMENT: (Appointment, ('id', 'date', 'time', 'description'), appointment_document),
+}
+
+
+class PatientIndex:
+    """
+    BM25 inverted index over one patient's notes, contacts and appointments.
+    Documents are keyed by (resource, id) and can be added or removed one at
+    a time. `cursor` is the last ChangeLog id applied.
+    """
+
+    def __init__(self, cursor=0):
+        self.cursor = cursor
+        self.docs = {}
+        self.postings = defaultdict(dict)
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, key, text):
+        self.remove(key)
+        terms = Counter(tokenize(text))
+        length = sum(terms.values())
+        self.docs[key] = (text, terms, length)
+        self.total_length += length
+        for term, count in terms.items():
+            self.postings[term][key] = count
+
+    def remove(self, key):
+        doc = self.docs.pop(key, None)
+        if doc is None:
+            return
+        _, terms, length = doc
+        self.total_length -= length
+        for term in terms:
+            postings = self.postings[term]
+            postings.pop(key, None)
+            if not postings:
+                del self.postings[term]
+
+    def search(self, query, k):
+        """
+        Text of the `k` documents scoring highest for `query`, best first.
+        """
+        if not self.docs:
+            return []
+        count = len(self.docs)
+        average_length = self.total_length / count or 1
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key, frequency in postings.items():
+                length = self.docs[key][2]
+                scores[key] += idf * frequency * (K1 + 1) / (frequency + K1 * (1 - B + B * length / average_length))
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [self.docs[key][0] for key in best]
+
+
+class RetrievalIndex:
+    """
+    Per-process PatientIndex for the most recently active patients.
+
+    A patient's index is built from the database on first use. After that,
+    each lookup reads the patient's ChangeLog entries since the index's
+    cursor (one indexed query) and re-reads only the rows they name, so
+    edits made through any worker are picked up without a rebuild.
+    """
+
+    def __init__(self, max_patients):
+        self.max_patients = max_patients
+        self._patients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, patient_id):
+        with self._lock:
+            index = self._patients.get(patient_id)
+            if index is not None:
+                self.update(patient_id, index)
+                self._patients.move_to_end(patient_id)
+                return index
+
+        # Build without the lock so other patients' lookups aren't held up
+        # behind these queries; if another thread got there first, use its index
+        built = self.build(patient_id)
+        with self._lock:
+            index = self._patients.get(patient_id)
+            if index is None:
+                index = self._patients[patient_id] = built
+                while len(self._patients) > self.max_patients:
+                    self._patients.popitem(last=False)
+            else:
+                self.update(patient_id, index)
+                self._patients.move_to_end(patient_id)
+            return index
+
+    @staticmethod
+    def build(patient_id):
+        # Take the cursor first so changes made while the rows are read are applied next time
+        latest = ChangeLog.objects.filter(patient_id=patient_id).order_by('-id').values_list('id', flat=True).first()
+        index = PatientIndex(latest or 0)
+        for resource, (model, columns, document) in SOURCES.items():
+            for row in model.objects.filter(patient_id=patient_id).only(*columns):
+                index.add((resource, row.id), document(row))
+        return index
+
+    @staticmethod
+    def update(patient_id, index):
+        entries = list(
+            ChangeLog.objects.filter(patient_id=patient_id, id__gt=index.cursor, resource__in=SOURCES)
+            .order_by('id')
+            .only('id', 'resource', 'object_id', 'deleted')
+        )
+        if not entries:
+            return
+        for resource, objects in collapse(entries).items():
+            model, columns, document = SOURCES[resource]
+            changed = [object_id for object_id, deleted in objects.items() if not deleted]
+            rows = {row.id: row for row in model.objects.filter(id__in=changed).only(*columns)}
+            for object_id in objects:
+                if object_id in rows:
+                    index.add((resource, object_id), document(rows[object_id]))
+                else:
+                    index.remove((resource, object_id))
+        index.cursor = entries[-1].id
+
+
+retrieval_index = RetrievalIndex(settings.CHAT_RETRIEVAL_MAX_PATIENTS)
+
+
+def retrieve_context(patient_id, query):
+    """
+    The patient's notes, contacts and appointments most relevant to `query`:
+    at most CHAT_RETRIEVAL_TOP_K snippets of CHAT_RETRIEVAL_SNIPPET_CHARS
+    each, so the prompt stays the same size however much the patient has stored.
+    """
+    try:
+        snippets = retrieval_index.get(patient_id).search(query, settings.CHAT_RETRIEVAL_TOP_K)
+    except Exception as e:
+        logger.error(f"Failed to retrieve chat context for patient {patient_id}: {e}")
+        return []
+    limit = settings.CHAT_RETRIEVAL_SNIPPET_CHARS
+    return [snippet if len(snippet) <= limit else snippet[:limit - 3] + "..." for snippet in snippets]
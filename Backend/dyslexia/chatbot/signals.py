@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from contacts.models import Contact
+from users.models import Note
+from .response_cache import invalidate_patient
+
+# Patient data the chatbot's replies may depend on
+CONTEXT_MODELS = (Note, Contact)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_cached_replies(sender, instance, **kwargs):
+    if sender in CONTEXT_MODELS:
+        # After commit, so a reply computed from the old rows can't be cached under the new generation
+        patient_id = instance.patient_id
+        transaction.on_commit(lambda: invalidate_patient(patient_id))
@@ -0,0 +1,89 @@
+import re
+import threading
+import time
+import httpx
+from django.conf import settings
+
+# A sentence ends at . ! or ? followed by whitespace, or at a line break
+SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+|\n+')
+# Speak long unpunctuated runs in pieces rather than waiting for the end
+MAX_SENTENCE_CHARS = 200
+
+_tts_client = None
+_tts_client_lock = threading.Lock()
+
+
+class TextToSpeechError(Exception):
+    pass
+
+
+def split_sentences(buffer):
+    """
+    Split streamed LLM text into complete sentences ready to speak and the
+    unfinished remainder, which waits for more text.
+    """
+    pieces = SENTENCE_END_RE.split(buffer)
+    sentences, rest = [piece.strip() for piece in pieces[:-1] if piece.strip()], pieces[-1]
+    while len(rest) > MAX_SENTENCE_CHARS:
+        cut = rest.rfind(' ', 0, MAX_SENTENCE_CHARS)
+        cut = cut if cut > 0 else MAX_SENTENCE_CHARS
+        sentences.append(rest[:cut].strip())
+        rest = rest[cut:].lstrip()
+    return sentences, rest
+
+
+def get_tts_client():
+    """
+    The process-wide HTTP client for Deepgram's speak API, so each sentence
+    reuses a warm connection.
+    """
+    global _tts_client
+    with _tts_client_lock:
+        if _tts_client is None:
+            _tts_client = httpx.AsyncClient(
+                base_url="https://api.deepgram.com",
+                headers={"Authorization": f"Token {settings.DEEPGRAM_API_KEY}"},
+                limits=httpx.Limits(max_connections=settings.DEEPGRAM_TTS_MAX_CONNECTIONS),
+                timeout=settings.DEEPGRAM_TTS_TIMEOUT,
+            )
+        return _tts_client
+
+
+async def synthesize(text):
+    """
+    Yield linear16 audio for `text` as Deepgram streams it back.
+    """
+    params = {
+        "model": settings.DEEPGRAM_TTS_MODEL,
+        "encoding": "linear16",
+        "sample_rate": settings.DEEPGRAM_TTS_SAMPLE_RATE,
+        "container": "none",
+    }
+    async with get_tts_client().stream("POST", "/v1/speak", params=params, json={"text": text}) as response:
+        if response.status_code != 200:
+            body = await response.aread()
+            raise TextToSpeechError(f"Deepgram speak returned {response.status_code}: {body[:200]!r}")
+        async for chunk in response.aiter_bytes():
+            if chunk:
+                yield chunk
+
+
+class TurnTimer:
+    """
+    Per-stage latency of one voice turn, in milliseconds from the moment the
+    final transcript arrived unless mark() is given another start.
+    """
+
+    def __init__(self, stt_ms=None):
+        self.started_at = time.perf_counter()
+        self.stages = {"stt_ms": stt_ms}
+
+    def elapsed_ms(self, since=None):
+        return int((time.perf_counter() - (since or self.started_at)) * 1000)
+
+    def mark(self, stage, since=None):
+        """
+        Record `stage` the first time it happens.
+        """
+        if self.stages.get(stage) is None:
+            self.stages[stage] = self.elapsed_ms(since)
@@ -0,0 +1,145 @@
+import json
+import logging
+import threading
+from django.conf import settings
+from langchain_core.messages import AIMessage, HumanMessage
+from QuickAgent.memory import build_memory
+from .models import ChatMessage, ChatSummary
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_CLASSES = {ChatMessage.USER: HumanMessage, ChatMessage.ASSISTANT: AIMessage}
+
+
+def role_of(message):
+    return ChatMessage.USER if isinstance(message, HumanMessage) else ChatMessage.ASSISTANT
+
+
+class DatabaseConversationStore:
+    """
+    Conversations in the ChatMessage and ChatSummary tables.
+    """
+
+    def append(self, patient_id, messages):
+        """
+        Add messages to the end of the patient's conversation and return their ids.
+        """
+        rows = ChatMessage.objects.bulk_create([
+            ChatMessage(patient_id=patient_id, role=role_of(message), content=message.content)
+            for message in messages
+        ])
+        return [row.id for row in rows]
+
+    def save_summary(self, patient_id, content, through_id):
+        ChatSummary.objects.create(patient_id=patient_id, content=content, through_message_id=through_id)
+
+    def load(self, patient_id, limit):
+        """
+        The latest summary and up to `limit` of the newest messages after it,
+        oldest first, as (summary, [(id, role, content)]).
+        """
+        latest = (
+            ChatSummary.objects.filter(patient_id=patient_id)
+            .order_by('-id')
+            .values_list('content', 'through_message_id')
+            .first()
+        )
+        summary, through_id = latest or ("", 0)
+        rows = (
+            ChatMessage.objects.filter(patient_id=patient_id, id__gt=through_id)
+            .order_by('-id')
+            .values_list('id', 'role', 'content')[:limit]
+        )
+        return summary, list(reversed(rows))
+
+
+class RedisConversationStore:
+    """
+    Conversations in Redis: each patient's messages in a list (a message's id
+    is its index) and the latest summary in a plain key.
+    """
+
+    def __init__(self, alias):
+        from django_redis import get_redis_connection
+        self.redis = get_redis_connection(alias)
+
+    @staticmethod
+    def keys(patient_id):
+        return f"chat:{patient_id}:messages", f"chat:{patient_id}:summary"
+
+    def append(self, patient_id, messages):
+        messages_key, _ = self.keys(patient_id)
+        length = self.redis.rpush(messages_key, *[
+            json.dumps({"role": role_of(message), "content": message.content}) for message in messages
+        ])
+        return list(range(length - len(messages), length))
+
+    def save_summary(self, patient_id, content, through_id):
+        _, summary_key = self.keys(patient_id)
+        self.redis.set(summary_key, json.dumps({"content": content, "through": through_id}))
+
+    def load(self, patient_id, limit):
+        messages_key, summary_key = self.keys(patient_id)
+        # One round trip, applied atomically so a concurrent append can't shift the indexes
+        pipe = self.redis.pipeline()
+        pipe.get(summary_key)
+        pipe.llen(messages_key)
+        pipe.lrange(messages_key, -limit, -1)
+        raw_summary, length, items = pipe.execute()
+
+        summary, through_id = "", -1
+        if raw_summary:
+            stored = json.loads(raw_summary)
+            summary, through_id = stored["content"], stored["through"]
+
+        rows = []
+        for index, item in enumerate(items, start=length - len(items)):
+            if index > through_id:
+                message = json.loads(item)
+                rows.append((index, message["role"], message["content"]))
+        return summary, rows
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    The process-wide conversation store chosen by settings.CHAT_STORE, or
+    None when history is kept only in memory.
+    """
+    global _store
+    with _store_lock:
+        if _store is None and settings.CHAT_STORE:
+            if settings.CHAT_STORE == 'redis':
+                _store = RedisConversationStore(settings.CHAT_STORE_REDIS_ALIAS)
+            else:
+                _store = DatabaseConversationStore()
+        return _store
+
+
+def load_memory(store, patient_id):
+    """
+    A ChatMemory restored from the patient's stored summary and recent messages.
+    Reads at most CHAT_STORE_LOAD_LIMIT messages however long the history is.
+    """
+    memory = build_memory()
+    summary, rows = store.load(patient_id, settings.CHAT_STORE_LOAD_LIMIT)
+    memory.restore(summary, [MESSAGE_CLASSES[role](content=content, id=str(id)) for id, role, content in rows])
+    return memory
+
+
+def save_memory(store, patient_id, memory):
+    """
+    Append the memory's new messages and store its summary if it changed.
+    """
+    if memory.unsaved:
+        messages, memory.unsaved = memory.unsaved, []
+        for message, id in zip(messages, store.append(patient_id, messages)):
+            message.id = str(id)
+
+    through = memory.summary_through
+    if memory.summary_dirty and through is not None and through.id is not None:
+        memory.summary_dirty = False
+        store.save_summary(patient_id, memory.summary, int(through.id))
@@ -0,0 +1,273 @@
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.test import SimpleTestCase, TestCase, override_settings
+from langchain_core.runnables import RunnableLambda
+from QuickAgent.memory import ChatMemory
+from contacts.models import Contact
+from users.models import Note, Patient
+from .consumers import ChatConsumer, DeepgramConsumer
+from .response_cache import ResponseCache
+from .retrieval import PatientIndex, RetrievalIndex, tokenize
+from .store import DatabaseConversationStore, load_memory, save_memory
+
+
+class ResponseCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(ttl=60, max_entries=50, threshold=0.7)
+
+    def test_reuses_rephrased_question(self):
+        self.cache.put(1, "Where am I?", "At home.", 0)
+        self.cache.put(1, "Who is my carer?", "Anita.", 0)
+        self.assertEqual(self.cache.get(1, "where am i, please", 0), "At home.")
+        self.assertEqual(self.cache.get(1, "who's my carer", 0), "Anita.")
+        self.assertEqual(self.cache.get(1, "who is my carrer", 0), "Anita.")
+
+    def test_modal_tense_and_aspect_words_keep_prompts_apart(self):
+        pairs = [
+            ("did I take my pills", "can I take my pills"),
+            ("should I take my pills", "should I take my pills again"),
+            ("can I take my pills", "can I just take my pills"),
+            ("did I take my morning pills", "did I take my evening pills"),
+        ]
+        for cached, asked in pairs:
+            with self.subTest(cached=cached, asked=asked):
+                cache = ResponseCache(ttl=60, max_entries=50, threshold=0.7)
+                cache.put(1, cached, "reply", 0)
+                self.assertIsNone(cache.get(1, asked, 0))
+
+    def test_time_and_conversation_prompts_are_not_cached(self):
+        for prompt in ["what time is it", "what day is it today", "what did I just say", "who is she"]:
+            with self.subTest(prompt=prompt):
+                self.cache.put(1, prompt, "reply", 0)
+                self.assertIsNone(self.cache.get(1, prompt, 0))
+        self.assertEqual(self.cache.metrics()['entries'], 0)
+
+    def test_other_generation_or_patient_misses(self):
+        self.cache.put(1, "Where am I?", "At home.", 0)
+        self.assertIsNone(self.cache.get(1, "Where am I?", 1))
+        self.assertIsNone(self.cache.get(2, "Where am I?", 0))
+
+
+class ChatMemoryTests(SimpleTestCase):
+
+    def test_pending_is_capped_while_summaries_fail(self):
+        memory = ChatMemory(max_tokens=100)
+        failing = RunnableLambda(lambda _: (_ for _ in ()).throw(RuntimeError("LLM down")))
+        with self.assertLogs('QuickAgent.memory', level='WARNING'):
+            for i in range(50):
+                memory.add_turn(f"question {i} " * 10, f"answer {i} " * 10)
+                memory.summarize(failing)
+
+        self.assertTrue(memory.pending)
+        self.assertLessEqual(len(memory.pending), 4)
+        self.assertEqual(memory.summary, "")
+
+
+class ChatConsumerConnectTests(SimpleTestCase):
+
+    async def test_builds_language_model_off_the_event_loop(self):
+        built_on = []
+
+        def build(memory=None):
+            built_on.append(threading.get_ident())
+            return mock.Mock(memory=memory)
+
+        with mock.patch('chatbot.consumers.LanguageModelProcessor', side_effect=build):
+            communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), '/ws/chat/')
+            communicator.scope['user'] = AnonymousUser()
+            connected, _ = await communicator.connect()
+            await communicator.disconnect()
+
+        self.assertTrue(connected)
+        self.assertEqual(len(built_on), 1)
+        self.assertNotEqual(built_on[0], threading.get_ident())
+
+
+class DatabaseConversationStoreTests(TestCase):
+
+    def setUp(self):
+        self.patient = Patient.objects.create_user(email='p@example.com', username='p', password='pw')
+        self.store = DatabaseConversationStore()
+
+    def contents(self, memory):
+        return [message.content for message in memory.messages]
+
+    def test_saved_turns_are_restored(self):
+        memory = ChatMemory(max_tokens=None)
+        memory.add_turn("Where am I?", "At home.")
+        save_memory(self.store, self.patient.id, memory)
+        memory.add_turn("Who is my carer?", "Anita.")
+        save_memory(self.store, self.patient.id, memory)
+
+        self.assertEqual(memory.unsaved, [])
+        self.assertTrue(all(message.id for message in memory.messages))
+        restored = load_memory(self.store, self.patient.id)
+        self.assertEqual(self.contents(restored), ["Where am I?", "At home.", "Who is my carer?", "Anita."])
+        self.assertEqual(restored.summary, "")
+
+    def test_summary_replaces_the_messages_it_covers(self):
+        memory = ChatMemory(max_tokens=30)
+        for i in range(4):
+            memory.add_turn(f"question {i} " * 3, f"answer {i} " * 3)
+        save_memory(self.store, self.patient.id, memory)
+        summarized = list(memory.pending)
+        memory.apply_summary("They asked four questions.", len(summarized))
+        save_memory(self.store, self.patient.id, memory)
+
+        restored = ChatMemory(max_tokens=None)
+        with mock.patch('chatbot.store.build_memory', return_value=restored):
+            load_memory(self.store, self.patient.id)
+        self.assertEqual(restored.summary, "They asked four questions.")
+        self.assertEqual(self.contents(restored), self.contents(memory))
+
+    @override_settings(CHAT_STORE_LOAD_LIMIT=2)
+    def test_loads_only_the_newest_messages(self):
+        memory = ChatMemory(max_tokens=None)
+        for i in range(3):
+            memory.add_turn(f"question {i}", f"answer {i}")
+        save_memory(self.store, self.patient.id, memory)
+
+        restored = ChatMemory(max_tokens=None)
+        with mock.patch('chatbot.store.build_memory', return_value=restored):
+            load_memory(self.store, self.patient.id)
+        self.assertEqual(self.contents(restored), ["question 2", "answer 2"])
+
+
+class PatientIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = PatientIndex()
+        self.index.add(('note', 1), "Took the blue pill after breakfast")
+        self.index.add(('note', 2), "Walked to the park with Anita, then a long walk by the river and the market")
+        self.index.add(('contact', 1), "Contact: Anita, daughter, phone 123")
+        self.index.add(('note', 3), "Pills: blue pill at breakfast, white pill at night")
+
+    def test_tokenize_drops_stopwords_and_folds_plurals(self):
+        self.assertEqual(tokenize("Where are my pills?"), ["pill"])
+        self.assertEqual(tokenize("new address"), ["new", "address"])
+
+    def test_ranks_by_term_frequency_and_rarity(self):
+        self.assertEqual(self.index.search("which pills do I take", 2), [
+            "Pills: blue pill at breakfast, white pill at night",
+            "Took the blue pill after breakfast",
+        ])
+        # "daughter" only appears once, so it outweighs the shared "Anita"
+        self.assertEqual(self.index.search("Anita my daughter", 1), ["Contact: Anita, daughter, phone 123"])
+
+    def test_unmatched_query_and_removed_documents(self):
+        self.assertEqual(self.index.search("holiday", 3), [])
+        self.index.remove(('contact', 1))
+        self.assertNotIn("Contact: Anita, daughter, phone 123", self.index.search("Anita", 3))
+        self.assertNotIn('daughter', self.index.postings)
+
+
+class RetrievalIndexTests(TestCase):
+
+    def setUp(self):
+        self.patient = Patient.objects.create_user(email='p@example.com', username='p', password='pw')
+        self.retrieval = RetrievalIndex(max_patients=10)
+
+    def test_applies_changes_since_the_cursor(self):
+        note = Note.objects.create(patient=self.patient, title='Pills', description='Blue pill at breakfast')
+        index = self.retrieval.get(self.patient.id)
+        self.assertEqual(len(index), 1)
+
+        note.description = 'White pill at night'
+        note.save()
+        Contact.objects.create(patient=self.patient, name='Anita', phone_number='123', relationship='daughter')
+
+        self.assertIs(self.retrieval.get(self.patient.id), index)
+        self.assertEqual(len(index), 2)
+        self.assertIn('White pill', index.search('pill', 1)[0])
+
+        note.delete()
+        self.retrieval.get(self.patient.id)
+        self.assertEqual(index.search('pill', 3), [])
+
+    def test_builds_outside_the_lock(self):
+        build = RetrievalIndex.build
+
+        def check_unlocked(patient_id):
+            self.assertFalse(self.retrieval._lock.locked())
+            return build(patient_id)
+
+        with mock.patch.object(RetrievalIndex, 'build', side_effect=check_unlocked) as built:
+            index = self.retrieval.get(self.patient.id)
+            self.assertIs(self.retrieval.get(self.patient.id), index)
+        self.assertEqual(built.call_count, 1)
+
+    def test_evicts_the_least_recent_patient(self):
+        retrieval = RetrievalIndex(max_patients=1)
+        other = Patient.objects.create_user(email='o@example.com', username='o', password='pw')
+        first = retrieval.get(self.patient.id)
+        retrieval.get(other.id)
+        self.assertIsNot(retrieval.get(self.patient.id), first)
+
+
+def transcript(text):
+    return SimpleNamespace(
+        channel=SimpleNamespace(alternatives=[SimpleNamespace(transcript=text)]),
+        is_final=True, speech_final=True, start=0.0, duration=1.0,
+    )
+
+
+class DeepgramConsumerReplyTests(SimpleTestCase):
+
+    def setUp(self):
+        self.consumer = DeepgramConsumer()
+        self.consumer.send = mock.AsyncMock()
+        self.consumer.store = None
+        self.consumer.patient_id = None
+        self.consumer.audio_started_at = time.perf_counter()
+        self.stalled = asyncio.Event()
+
+        async def astream(text, context):
+            if text == "Where am I":
+                yield "You are at home. "
+                # Still generating when the patient speaks again
+                self.stalled.set()
+                await asyncio.Event().wait()
+            yield "Okay."
+
+        self.consumer.llm_processor = mock.Mock(astream=astream)
+
+    def frames(self, key):
+        return [call.kwargs[key] for call in self.consumer.send.call_args_list if key in call.kwargs]
+
+    async def test_new_utterance_interrupts_the_reply(self):
+        async def synthesize(sentence):
+            yield sentence.encode()
+
+        with mock.patch('chatbot.consumers.synthesize', synthesize):
+            await self.consumer.on_message(None, transcript("Where am I"))
+            first = self.consumer.reply_task
+            await asyncio.wait_for(self.stalled.wait(), 1)
+
+            await self.consumer.on_message(None, transcript("Stop"))
+            await asyncio.wait_for(self.consumer.reply_task, 1)
+
+        self.assertTrue(first.cancelled())
+        messages = [json.loads(frame) for frame in self.frames('text_data')]
+        self.assertEqual([message['type'] for message in messages], [
+            'transcript', 'chunk', 'transcript', 'interrupted', 'chunk', 'done',
+        ])
+        self.assertEqual(messages[-1]['response'], "Okay.")
+        self.assertEqual(self.frames('bytes_data'), [b"You are at home.", b"Okay."])
+
+    async def test_speech_errors_are_reported(self):
+        async def synthesize(sentence):
+            raise RuntimeError("speak failed")
+            yield
+
+        with mock.patch('chatbot.consumers.synthesize', synthesize), self.assertLogs('chatbot.consumers', 'ERROR'):
+            await self.consumer.on_message(None, transcript("Stop"))
+            await asyncio.wait_for(self.consumer.reply_task, 1)
+
+        self.assertEqual(json.loads(self.frames('text_data')[-1]), {'error': 'speak failed'})
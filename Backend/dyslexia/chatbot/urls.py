@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('metrics/executors/', views.ExecutorMetricsView.as_view(), name='executor-metrics'),
+    path('metrics/response-cache/', views.ResponseCacheMetricsView.as_view(), name='response-cache-metrics'),
+]
@@ -0,0 +1,25 @@
+from rest_framework import generics, status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from .executor import executor_metrics
+from .response_cache import response_cache
+
+
+class ExecutorMetricsView(generics.GenericAPIView):
+    """
+    Queue depth and timings of this process's consumer thread pools
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(executor_metrics(), status=status.HTTP_200_OK)
+
+
+class ResponseCacheMetricsView(generics.GenericAPIView):
+    """
+    Hit rate and size of this process's chatbot response cache
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(response_cache.metrics(), status=status.HTTP_200_OK)
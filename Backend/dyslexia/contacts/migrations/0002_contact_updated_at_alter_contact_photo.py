@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contact',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='contact',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, upload_to='contacts'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0002_contact_updated_at_alter_contact_photo'),
+        ('users', '0010_alter_note_options_note_note_patient_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['patient', '-created_at', '-id'], name='contact_patient_created_idx'),
+        ),
+    ]
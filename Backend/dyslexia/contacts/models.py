@@ -14,6 +14,13 @@ class Contact(models.Model):
     photo = models.ImageField(upload_to="contacts", blank=True, null=True)
     relationship = models.CharField(max_length=50)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
 
     def __str__(self):
         return f"{self.name} ({self.relationship})"
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of a patient's contacts, newest first
+            models.Index(fields=['patient', '-created_at', '-id'], name='contact_patient_created_idx'),
+        ]
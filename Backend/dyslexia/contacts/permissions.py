@@ -1,4 +1,6 @@
 from rest_framework.permissions import BasePermission
+from users.models import BaseUser
+from users.roles import get_role
 
 
 class IscaretakerOrReadOnly(BasePermission):
@@ -10,7 +12,7 @@ class IscaretakerOrReadOnly(BasePermission):
     def has_permission(self, request, view):
         if request.method in ['GET', 'HEAD', 'OPTIONS']:
             return True  
-        return hasattr(request.user, 'caretaker')
+        return get_role(request.user) == BaseUser.CARETAKER
 
     def has_object_permission(self, request, view, obj):
         if request.method in ['GET', 'HEAD', 'OPTIONS']:
@@ -1,8 +1,12 @@
 from rest_framework import serializers
 from .models import Contact
 from users.models import Patient, caretaker
+from users.serializers import media_url
 
 class ContactSerializer(serializers.ModelSerializer):
+    # Stored path only; to_representation adds the host once per response
+    photo = serializers.ImageField(required=False, allow_null=True, use_url=False)
+
     class Meta:
         model = Contact
         fields = ['id', 'name', 'phone_number', 'photo', 'relationship', 'created_at']
@@ -32,8 +36,20 @@ class ContactSerializer(serializers.ModelSerializer):
         
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        request = self.context.get('request')
-        if instance.photo and request:
-            representation['photo_url'] = request.build_absolute_uri(instance.photo.url)
+        if instance.photo:
+            representation['photo'] = media_url(self.context, instance.photo)
+            if self.context.get('request'):
+                representation['photo_url'] = representation['photo']
         return representation
 
+
+class PatientContactsSerializer(serializers.ModelSerializer):
+    """
+    One of a caretaker's patients with their contacts, which the view prefetches.
+    """
+    contacts = ContactSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Patient
+        fields = ['id', 'username', 'name', 'contacts']
+
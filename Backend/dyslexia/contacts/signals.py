@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from users.changes import record_change
+from users.models import ChangeLog
+from .models import Contact
+
+
+@receiver(post_save, sender=Contact)
+def log_contact_saved(sender, instance, **kwargs):
+    record_change(instance.patient_id, ChangeLog.CONTACT, instance.pk)
+
+
+@receiver(post_delete, sender=Contact)
+def log_contact_deleted(sender, instance, **kwargs):
+    record_change(instance.patient_id, ChangeLog.CONTACT, instance.pk, deleted=True)
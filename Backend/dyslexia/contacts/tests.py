@@ -1,3 +1,83 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
+from users.models import caretaker, Patient
+from .models import Contact
 
-# Create your tests here.
+
+class CaretakerContactsByPatientTests(TestCase):
+    url = '/contacts/caretaker/by-patient/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.caretaker = caretaker.objects.create_user(email='care@example.com', username='care', password='pw')
+        other = caretaker.objects.create_user(email='other@example.com', username='other', password='pw')
+
+        cls.patients = []
+        for i in range(3):
+            patient = Patient.objects.create_user(email=f'p{i}@example.com', username=f'p{i}', password='pw', name=f'Patient {i}')
+            # A second caretaker on the same patients must not duplicate rows
+            cls.caretaker.patients.add(patient)
+            other.patients.add(patient)
+            cls.patients.append(patient)
+
+        for i, patient in enumerate(cls.patients[:2]):
+            for j in range(i + 2):
+                Contact.objects.create(
+                    patient=patient, name=f'Contact {i}.{j}', phone_number='123',
+                    relationship='friend', photo=f'contacts/{i}-{j}.png'
+                )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.caretaker)
+
+    def test_groups_contacts_by_patient(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        groups = {group['id']: group for group in response.json()}
+        self.assertEqual(set(groups), {patient.id for patient in self.patients})
+        self.assertEqual([len(groups[patient.id]['contacts']) for patient in self.patients], [2, 3, 0])
+
+        contact = groups[self.patients[0].id]['contacts'][0]
+        self.assertEqual(contact['photo'], contact['photo_url'])
+        self.assertTrue(contact['photo'].startswith('http://testserver/'))
+
+    def test_query_count_does_not_grow_with_contacts(self):
+        # One query for the patients, one for all their contacts
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+        for patient in self.patients:
+            for j in range(5):
+                Contact.objects.create(patient=patient, name=f'Extra {j}', phone_number='123', relationship='friend')
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(sum(len(group['contacts']) for group in response.json()), 20)
+
+    def test_caretaker_contact_list_has_no_duplicates(self):
+        response = self.client.get('/contacts/caretaker/')
+        ids = [contact['id'] for contact in response.json()]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len(ids), 5)
+
+
+
+class PatientContactConditionalTests(TestCase):
+    url = '/contacts/patient/'
+
+    def setUp(self):
+        self.patient = Patient.objects.create_user(email='p@example.com', username='p', password='pw')
+        self.contact = Contact.objects.create(patient=self.patient, name='Friend', phone_number='123', relationship='friend')
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+
+    def test_not_modified_until_a_contact_changes(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.contact.delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
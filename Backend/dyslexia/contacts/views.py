@@ -1,20 +1,25 @@
 from rest_framework import generics, status, serializers
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db.models import Prefetch
 from .models import Contact
-from .serializers import ContactSerializer
+from .serializers import ContactSerializer, PatientContactsSerializer
 from users.models import Patient
 from users.permissions import Iscaretaker, IsPatient
+from users.conditional import conditional_get, queryset_version
+from users.pagination import KeysetPagination
 import logging
 
 logger = logging.getLogger(__name__)
 class CaretakerContactView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated, Iscaretaker]
     serializer_class = ContactSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        # Get patients associated with the current caretaker
-        return Contact.objects.filter(patient__caretakers=self.request.user)
+        # Get patients associated with the current caretaker; distinct() so the
+        # M2M join can never repeat a contact
+        return Contact.objects.filter(patient__caretakers=self.request.user).distinct()
 
     def get_serializer_context(self):
         # Pass request to serializer context for validation
@@ -22,6 +27,23 @@ class CaretakerContactView(generics.ListCreateAPIView):
         context['request'] = self.request
         return context
 
+class CaretakerContactsByPatientView(generics.ListAPIView):
+    """
+    The caretaker's patients, each with their contacts (newest first),
+    in two queries however many patients and contacts there are.
+    """
+    permission_classes = [IsAuthenticated, Iscaretaker]
+    serializer_class = PatientContactsSerializer
+
+    def get_queryset(self):
+        return (
+            Patient.objects.filter(caretakers=self.request.user)
+            .distinct()
+            .only('id', 'username', 'name')
+            .order_by('name', 'id')
+            .prefetch_related(Prefetch('contacts', queryset=Contact.objects.order_by('-created_at', '-id')))
+        )
+
 class CaretakerContactDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated, Iscaretaker]
     serializer_class = ContactSerializer
@@ -38,7 +60,15 @@ class CaretakerContactDetailView(generics.RetrieveUpdateDestroyAPIView):
 class PatientContactListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated, IsPatient]
     serializer_class = ContactSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         # Patient can only see their own contacts
-        return Contact.objects.filter(patient=self.request.user)
\ No newline at end of file
+        return Contact.objects.filter(patient=self.request.user)
+
+    def get_version(self, request, *args, **kwargs):
+        return queryset_version(self.get_queryset())
+
+    @conditional_get
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
@@ -2,13 +2,22 @@ import os
 from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
-import chatbot.routing
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "dyslexia.settings")
 
+# Initialise Django before importing consumers that touch the ORM
+django_asgi_app = get_asgi_application()
+
+import chatbot.routing
+import users.routing
+from users.middleware import TokenAuthMiddleware
+
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    "websocket":  URLRouter(
+    "http": django_asgi_app,
+    "websocket": TokenAuthMiddleware(
+        URLRouter(
             chatbot.routing.websocket_urlpatterns
+            + users.routing.websocket_urlpatterns
         )
-})
\ No newline at end of file
+    )
+})
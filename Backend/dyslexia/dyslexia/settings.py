@@ -133,7 +133,7 @@ AUTH_USER_MODEL = 'users.BaseUser'
 # SimpleJWT configuration for authentication
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -167,19 +167,100 @@ LOGGING = {
 }
 
 
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
+# Geofence transition detection: a crossing must clear the fence edge by
+# GEOFENCE_MARGIN_KM and persist for GEOFENCE_DWELL_SECONDS before an
+# enter/exit event is emitted
+GEOFENCE_MARGIN_KM = float(os.getenv('GEOFENCE_MARGIN_KM', 0.05))
+GEOFENCE_DWELL_SECONDS = int(os.getenv('GEOFENCE_DWELL_SECONDS', 30))
+
+# Bounds for the next_report_after_s hint returned to the patient app, and
+# the slowest speed assumed when estimating time to reach a fence edge
+GEOFENCE_REPORT_MIN_SECONDS = int(os.getenv('GEOFENCE_REPORT_MIN_SECONDS', 5))
+GEOFENCE_REPORT_MAX_SECONDS = int(os.getenv('GEOFENCE_REPORT_MAX_SECONDS', 300))
+GEOFENCE_MIN_SPEED_MPS = float(os.getenv('GEOFENCE_MIN_SPEED_MPS', 1.4))
+
+
+# Appointment reminders go out this many minutes before the appointment
+REMINDER_APPOINTMENT_LEAD_MINUTES = float(os.getenv('REMINDER_APPOINTMENT_LEAD_MINUTES', 30))
+
+# Per-process thread pools for blocking calls made from WebSocket consumers:
+# (concurrent jobs, jobs queued or running before new ones are rejected)
+EXECUTOR_LIMITS = {
+    'llm': (int(os.getenv('LLM_EXECUTOR_WORKERS', 8)), int(os.getenv('LLM_EXECUTOR_MAX_PENDING', 32))),
 }
 
+# Speech on the /ws/audio/ voice socket: Deepgram transcribes the patient's
+# linear16 microphone audio and speaks the reply back as raw linear16 audio
+DEEPGRAM_API_KEY = os.getenv('DEEPGRAM_API_KEY')
+DEEPGRAM_STT_SAMPLE_RATE = int(os.getenv('DEEPGRAM_STT_SAMPLE_RATE', 16000))
+DEEPGRAM_TTS_MODEL = os.getenv('DEEPGRAM_TTS_MODEL', 'aura-asteria-en')
+DEEPGRAM_TTS_SAMPLE_RATE = int(os.getenv('DEEPGRAM_TTS_SAMPLE_RATE', 24000))
+DEEPGRAM_TTS_MAX_CONNECTIONS = int(os.getenv('DEEPGRAM_TTS_MAX_CONNECTIONS', 20))
+DEEPGRAM_TTS_TIMEOUT = float(os.getenv('DEEPGRAM_TTS_TIMEOUT', 30))
+
+# Where chat history is kept between connections: 'database', 'redis' (the
+# cache alias below) or '' to keep it only for the life of the socket
+CHAT_STORE = os.getenv('CHAT_STORE', 'database')
+CHAT_STORE_REDIS_ALIAS = 'default'
+# Most messages read back when a patient reconnects
+CHAT_STORE_LOAD_LIMIT = int(os.getenv('CHAT_STORE_LOAD_LIMIT', 40))
+
+# Patient notes, contacts and appointments added to each chatbot prompt
+# (chatbot.retrieval): snippets per turn, characters per snippet, and how
+# many patients' indexes a process keeps
+CHAT_RETRIEVAL_TOP_K = int(os.getenv('CHAT_RETRIEVAL_TOP_K', 4))
+CHAT_RETRIEVAL_SNIPPET_CHARS = int(os.getenv('CHAT_RETRIEVAL_SNIPPET_CHARS', 300))
+CHAT_RETRIEVAL_MAX_PATIENTS = int(os.getenv('CHAT_RETRIEVAL_MAX_PATIENTS', 500))
+
+# Chatbot replies reused when a patient repeats a question (chatbot.response_cache):
+# seconds an entry lives, entries kept per patient, and how similar a prompt
+# must be (0-1) to reuse another's reply
+CHAT_CACHE_TTL = int(os.getenv('CHAT_CACHE_TTL', 3600))
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv('CHAT_CACHE_MAX_ENTRIES', 200))
+CHAT_CACHE_SIMILARITY = float(os.getenv('CHAT_CACHE_SIMILARITY', 0.7))
+# Shared cache holding each patient's context generation, so invalidations reach every worker
+CHAT_CACHE_ALIAS = 'default'
+
+# Redis server shared by the cache (database 1) and the channel layer (database 2)
+REDIS_URL = os.getenv('REDIS_URL', 'redis://127.0.0.1:6379')
+
+# The in-memory layer only reaches consumers in the same process. Reminders
+# (run_reminders) and more than one ASGI worker need CHANNEL_LAYER=redis
+if os.getenv('CHANNEL_LAYER', 'memory') == 'redis':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [f'{REDIS_URL}/2']},
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+
 CACHES = {
     'default': {
         'BACKEND': 'django_redis.cache.RedisCache',
-        'LOCATION': 'redis://127.0.0.1:6379/1',  # Redis server URL
+        'LOCATION': f'{REDIS_URL}/1',  # Redis server URL
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            # Fail fast so requests fall back instead of hanging on a dead Redis
+            'SOCKET_CONNECT_TIMEOUT': 0.5,
+            'SOCKET_TIMEOUT': 0.5,
         },
-        'KEY_PREFIX': 'myapp'  # Optional: Prefix for cache keys
+        'KEY_PREFIX': 'myapp',  # Optional: Prefix for cache keys
+        'TIMEOUT': 300,
+    },
+    # Per-process fallback used while Redis is unreachable
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'local-fallback',
     }
-}
\ No newline at end of file
+}
+
+# Token -> user lookups cached by users.authentication.CachedTokenAuthentication
+TOKEN_CACHE_ALIAS = 'default'
+TOKEN_CACHE_FALLBACK_ALIAS = 'local'
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 300))
\ No newline at end of file
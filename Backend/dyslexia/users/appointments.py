@@ -0,0 +1,36 @@
+from datetime import datetime, time
+from django.utils import timezone
+
+# Formats the app has written appointment times in ("hh:mm a" from the patient screen)
+TIME_FORMATS = ['%I:%M %p', '%I:%M%p', '%H:%M', '%H:%M:%S']
+
+
+def parse_appointment_datetime(date_value, time_value=None):
+    """
+    Combine an appointment's free-text date and time into an aware datetime.
+
+    The date may be 'YYYY-MM-DD' or a full ISO timestamp; a missing or
+    unparseable time falls back to midnight. Returns None if the date
+    cannot be read.
+    """
+    try:
+        parsed = datetime.fromisoformat(str(date_value).strip())
+    except (TypeError, ValueError):
+        return None
+
+    # A full ISO timestamp already carries its time of day
+    if len(str(date_value).strip()) <= 10:
+        at = time()
+        text = str(time_value or '').strip().upper()
+        for fmt in TIME_FORMATS:
+            try:
+                at = datetime.strptime(text, fmt).time()
+                break
+            except ValueError:
+                continue
+        parsed = datetime.combine(parsed.date(), at)
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
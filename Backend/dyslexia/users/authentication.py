@@ -0,0 +1,82 @@
+import hashlib
+import logging
+import time
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from .models import BaseUser
+
+logger = logging.getLogger(__name__)
+
+# Non-sensitive columns kept in the cache; everything else (password,
+# last_login) is deferred and only loaded if a view actually touches it.
+# Kept in model field order, as Model.from_db expects.
+CACHED_USER_FIELDS = [
+    field.attname for field in BaseUser._meta.concrete_fields
+    if field.attname in {'id', 'username', 'email', 'name', 'role', 'is_active', 'is_staff', 'is_superuser', 'photo'}
+]
+
+# After a cache error, use the local-memory cache for this long before retrying
+FALLBACK_SECONDS = 30
+
+_fallback_until = 0.0
+
+
+def token_cache_key(key):
+    # Hash so raw tokens never appear in cache keys
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _cache_call(method, *args):
+    """
+    Run a cache operation on the configured cache, falling back to the
+    local-memory cache while the shared one (Redis) is unreachable.
+    """
+    global _fallback_until
+    if time.monotonic() >= _fallback_until:
+        try:
+            return getattr(caches[settings.TOKEN_CACHE_ALIAS], method)(*args)
+        except Exception as e:
+            logger.warning(f"Token cache unavailable, using local memory for {FALLBACK_SECONDS}s: {e}")
+            _fallback_until = time.monotonic() + FALLBACK_SECONDS
+    return getattr(caches[settings.TOKEN_CACHE_FALLBACK_ALIAS], method)(*args)
+
+
+def invalidate_token(key):
+    """
+    Drop a token from both the shared and the local cache, e.g. on sign out.
+    The shared delete is always attempted, even while lookups are using the
+    local fallback, so other workers stop accepting the token.
+    """
+    cache_key = token_cache_key(key)
+    try:
+        caches[settings.TOKEN_CACHE_ALIAS].delete(cache_key)
+    except Exception as e:
+        logger.error(f"Failed to drop token from the shared cache; it stays valid there for up to {settings.TOKEN_CACHE_TTL}s: {e}")
+    caches[settings.TOKEN_CACHE_FALLBACK_ALIAS].delete(cache_key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that caches the token -> user (and role) mapping for
+    TOKEN_CACHE_TTL seconds, so most requests skip the Token + BaseUser join.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        values = _cache_call('get', cache_key)
+        if values is not None:
+            user = BaseUser.from_db('default', CACHED_USER_FIELDS, values)
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed('User inactive or deleted.')
+            return (user, self.get_model()(key=key, user=user))
+
+        user, token = super().authenticate_credentials(key)
+        _cache_call(
+            'set',
+            cache_key,
+            [getattr(user, field) if field != 'photo' else user.photo.name for field in CACHED_USER_FIELDS],
+            settings.TOKEN_CACHE_TTL
+        )
+        return (user, token)
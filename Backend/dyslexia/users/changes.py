@@ -0,0 +1,44 @@
+import threading
+from .models import ChangeLog
+
+# Patient columns that change on every location report; saves limited to
+# these are not worth a sync round trip
+VOLATILE_PATIENT_FIELDS = {'current_coordinates_lat', 'current_coordinates_long', 'location_version', 'zones_version', 'last_login'}
+
+
+# Patients being deleted on this thread; their rows' cascade deletes are not
+# logged, since the log rows would point at the patient being removed
+_deleting = threading.local()
+
+
+def deleting_patients():
+    if not hasattr(_deleting, 'ids'):
+        _deleting.ids = set()
+    return _deleting.ids
+
+
+def record_change(patient_id, resource, object_id, deleted=False):
+    if patient_id is None or patient_id in deleting_patients():
+        return
+    ChangeLog.objects.create(patient_id=patient_id, resource=resource, object_id=object_id, deleted=deleted)
+
+
+def record_changes(patient_id, resource, object_ids, deleted=False):
+    """
+    Log several rows at once, e.g. after a bulk_create (which sends no signals).
+    """
+    ChangeLog.objects.bulk_create([
+        ChangeLog(patient_id=patient_id, resource=resource, object_id=object_id, deleted=deleted)
+        for object_id in object_ids
+    ])
+
+
+def collapse(entries):
+    """
+    Reduce log entries to the last action per object, in log order.
+    Returns {resource: {object_id: deleted}}.
+    """
+    latest = {}
+    for entry in entries:
+        latest.setdefault(entry.resource, {})[entry.object_id] = entry.deleted
+    return latest
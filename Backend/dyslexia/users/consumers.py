@@ -0,0 +1,96 @@
+import logging
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .models import Patient
+from .realtime import location_group_name, build_location_payload, reminder_group_name
+
+logger = logging.getLogger(__name__)
+
+
+class PatientLocationConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Live location stream for a caretaker watching one patient.
+    The server pushes a message whenever the patient uploads a new fix,
+    instead of the map polling PatientLocationView every second.
+    """
+
+    async def connect(self):
+        self.patient_id = self.scope['url_route']['kwargs']['patient_id']
+        self.group_name = location_group_name(self.patient_id)
+        user = self.scope.get('user')
+
+        if user is None or not user.is_authenticated:
+            logger.debug("Location stream rejected: unauthenticated.")
+            await self.close(code=4401)
+            return
+
+        patient, snapshot = await self.get_patient(user)
+        if patient is None:
+            logger.debug(f"Location stream rejected for user {user.id} and patient {self.patient_id}.")
+            await self.close(code=4403)
+            return
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+        # Send the current snapshot so the map has something to draw right away
+        if snapshot is not None:
+            await self.send_json(snapshot)
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # The stream is server -> client only
+        pass
+
+    async def location_update(self, event):
+        await self.send_json(event['location'])
+
+    async def geofence_transition(self, event):
+        await self.send_json({"geofence_event": event['event']})
+
+    @database_sync_to_async
+    def get_patient(self, user):
+        """
+        Return (patient, location snapshot) if the user is one of their
+        caretakers, otherwise (None, None). The snapshot is None until the
+        patient has a location and a centre. It is built here because
+        checking the patient's zones may query the database.
+        """
+        patient = Patient.objects.filter(id=self.patient_id, caretakers=user.id).first()
+        if patient is None:
+            return None, None
+        snapshot = None
+        if patient.current_coordinates_lat is not None and patient.center_coordinates_lat is not None:
+            snapshot = build_location_payload(patient)
+        return patient, snapshot
+
+
+class ReminderConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Appointment and medicine reminders for the connected user, pushed by the
+    run_reminders scheduler process when they fall due.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.group_name = reminder_group_name(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # The stream is server -> client only
+        pass
+
+    async def reminder_due(self, event):
+        await self.send_json({"reminder": event['reminder']})
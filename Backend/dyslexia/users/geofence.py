@@ -0,0 +1,246 @@
+"""
+Vectorised geofence evaluation and transition detection.
+
+Loads every patient's centre, radius and last fix into NumPy arrays and
+computes haversine distances and inside/outside flags for the whole
+population in one pass, instead of one geopy call per patient.
+
+Per-fix checks go through the safe zone index in zones.py; the population
+pass here covers each patient's primary (Patient.center/radius) circle.
+
+The transition detector keeps the last confirmed inside/outside state per
+patient and only emits an event when a crossing clears the margin and
+lasts for the dwell time.
+
+next_report_interval tells the patient app how long it can wait before the
+next fix: slow far inside a zone, fast near an edge or outside.
+"""
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from .models import Patient, GeofenceState, GeofenceEvent
+from .zones import get_patient_index, point_distance_km
+
+# Mean Earth radius (IUGG), in kilometers
+EARTH_RADIUS_KM = 6371.0088
+
+POPULATION_FIELDS = (
+    'id',
+    'center_coordinates_lat',
+    'center_coordinates_long',
+    'radius',
+    'current_coordinates_lat',
+    'current_coordinates_long',
+)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in kilometers between arrays of points given in degrees.
+    Agrees with geopy's geodesic distance to within ~0.5%.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=float)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class GeofencePopulation:
+    """
+    Column arrays for a set of patients. Missing coordinates are NaN.
+    """
+
+    def __init__(self, ids, center_lat, center_long, radius, current_lat, current_long):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.center_lat = np.asarray(center_lat, dtype=float)
+        self.center_long = np.asarray(center_long, dtype=float)
+        self.radius = np.asarray(radius, dtype=float)
+        self.current_lat = np.asarray(current_lat, dtype=float)
+        self.current_long = np.asarray(current_long, dtype=float)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build from (id, center_lat, center_long, radius, current_lat, current_long) rows.
+        """
+        if not rows:
+            return cls(*([] for _ in POPULATION_FIELDS))
+        # dtype=float turns None into NaN
+        table = np.array(rows, dtype=float)
+        return cls(table[:, 0], *(table[:, i] for i in range(1, len(POPULATION_FIELDS))))
+
+    @classmethod
+    def load(cls, queryset=None):
+        """
+        Load the population from the database in a single query.
+        """
+        if queryset is None:
+            queryset = Patient.objects.all()
+        return cls.from_rows(list(queryset.order_by('id').values_list(*POPULATION_FIELDS)))
+
+    def evaluate(self):
+        """
+        Return a GeofenceResult for every patient in one vectorised pass.
+        """
+        distance_km = haversine_km(self.center_lat, self.center_long, self.current_lat, self.current_long)
+        # Patients without a centre or a fix can't be evaluated
+        known = ~np.isnan(distance_km)
+        with np.errstate(invalid='ignore'):
+            outside = known & (distance_km > self.radius)
+        return GeofenceResult(self, distance_km, outside, known)
+
+
+class GeofenceResult:
+    def __init__(self, population, distance_km, outside, known):
+        self.population = population
+        self.distance_km = distance_km
+        self.outside = outside
+        self.known = known
+
+    @property
+    def outside_ids(self):
+        return self.population.ids[self.outside].tolist()
+
+    def as_dict(self):
+        """
+        Map patient id to {is_outside_geofence, distance_from_center}.
+        """
+        statuses = {}
+        for patient_id, distance_km, outside, known in zip(
+            self.population.ids.tolist(),
+            self.distance_km.tolist(),
+            self.outside.tolist(),
+            self.known.tolist(),
+        ):
+            statuses[patient_id] = {
+                "is_outside_geofence": outside if known else None,
+                "distance_from_center": distance_km if known else None,
+            }
+        return statuses
+
+
+class GeofenceTransitionDetector:
+    """
+    Hysteresis on the fence edge. A fix only counts as outside once it is
+    margin_km past the edge (inside once margin_km within it), and a new
+    state must hold for dwell_seconds before it is confirmed.
+    """
+
+    def __init__(self, margin_km=None, dwell_seconds=None):
+        self.margin_km = settings.GEOFENCE_MARGIN_KM if margin_km is None else margin_km
+        self.dwell = timedelta(seconds=settings.GEOFENCE_DWELL_SECONDS if dwell_seconds is None else dwell_seconds)
+
+    def classify(self, edge_km):
+        """
+        True if clearly outside, False if clearly inside, None inside the margin band.
+        """
+        if edge_km < -self.margin_km:
+            return True
+        if edge_km > self.margin_km:
+            return False
+        return None
+
+    def observe(self, state, edge_km, timestamp):
+        """
+        Feed one fix into the state. edge_km is the signed distance to the
+        fence edge (positive inside). Returns GeofenceEvent.EXIT/ENTER when a
+        crossing is confirmed, otherwise None.
+        """
+        outside = self.classify(edge_km)
+        if outside is None:
+            # Inside the margin band: no evidence either way
+            return None
+
+        if state.is_outside is None:
+            # First fix for this patient: adopt the state, and alert if it starts outside
+            state.is_outside = outside
+            state.changed_at = timestamp
+            return GeofenceEvent.EXIT if outside else None
+
+        if outside == state.is_outside:
+            state.pending_outside = None
+            state.pending_since = None
+            return None
+
+        if state.pending_outside != outside or state.pending_since is None:
+            state.pending_outside = outside
+            state.pending_since = timestamp
+
+        if timestamp - state.pending_since < self.dwell:
+            return None
+
+        state.is_outside = outside
+        state.changed_at = timestamp
+        state.pending_outside = None
+        state.pending_since = None
+        return GeofenceEvent.EXIT if outside else GeofenceEvent.ENTER
+
+
+def track_fixes(patient, fixes, detector=None):
+    """
+    Run a patient's new fixes (LocationFix instances) through the transition
+    detector, persisting the state and any confirmed crossings.
+    Returns (state, events); state is None if the patient has no geofence.
+    """
+    index = get_patient_index(patient)
+    if not len(index):
+        return None, []
+
+    detector = detector or GeofenceTransitionDetector()
+    fixes = sorted(fixes, key=lambda fix: fix.timestamp)
+    edges_km = [index.locate(fix.latitude, fix.longitude).edge_distance_km for fix in fixes]
+
+    state, _ = GeofenceState.objects.get_or_create(patient=patient)
+    before = (state.is_outside, state.pending_outside, state.pending_since)
+
+    events = []
+    for fix, edge_km in zip(fixes, edges_km):
+        kind = detector.observe(state, edge_km, fix.timestamp)
+        if kind is not None:
+            events.append(GeofenceEvent(
+                patient=patient,
+                kind=kind,
+                timestamp=fix.timestamp,
+                latitude=fix.latitude,
+                longitude=fix.longitude,
+                distance_from_edge=edge_km,
+            ))
+
+    # Most pings change nothing, so skip the write entirely
+    if (state.is_outside, state.pending_outside, state.pending_since) != before:
+        state.save()
+    if events:
+        GeofenceEvent.objects.bulk_create(events)
+    return state, events
+
+
+def estimate_speed_mps(previous, latest):
+    """
+    Ground speed between two (timestamp, lat, long) fixes, or None if unknown.
+    """
+    if previous is None or latest is None:
+        return None
+    elapsed = (latest[0] - previous[0]).total_seconds()
+    if elapsed <= 0:
+        return None
+    return point_distance_km(previous[1], previous[2], latest[1], latest[2]) * 1000 / elapsed
+
+
+def next_report_interval(edge_km, speed_mps=None, crossing_pending=False):
+    """
+    Seconds the device may wait before its next fix. The patient can't reach
+    the nearest edge sooner than edge / speed, and we report at half that so
+    a crossing is seen within one interval of it happening.
+    """
+    minimum = settings.GEOFENCE_REPORT_MIN_SECONDS
+    maximum = settings.GEOFENCE_REPORT_MAX_SECONDS
+
+    # Outside, unknown, or about to confirm a crossing: report as fast as allowed
+    if edge_km is None or edge_km <= 0 or crossing_pending:
+        return minimum
+
+    speed_mps = max(speed_mps or 0.0, settings.GEOFENCE_MIN_SPEED_MPS)
+    seconds_to_edge = edge_km * 1000 / speed_mps
+    return int(min(max(seconds_to_edge / 2, minimum), maximum))
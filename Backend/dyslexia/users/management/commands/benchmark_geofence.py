@@ -0,0 +1,56 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from geopy.distance import distance
+from users.geofence import GeofencePopulation
+
+
+class Command(BaseCommand):
+    help = "Benchmark the vectorised geofence pass against the per-row geopy path on synthetic patients."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        for size in options['sizes']:
+            population = self.synthetic_population(rng, size)
+
+            start = time.perf_counter()
+            result = population.evaluate()
+            vectorised = time.perf_counter() - start
+
+            start = time.perf_counter()
+            geopy_outside = self.geopy_pass(population)
+            per_row = time.perf_counter() - start
+
+            mismatches = int((geopy_outside != result.outside).sum())
+            self.stdout.write(
+                f"{size:>8} patients: geopy {per_row * 1000:9.1f}ms, "
+                f"numpy {vectorised * 1000:7.1f}ms, "
+                f"speedup {per_row / vectorised:6.0f}x, "
+                f"flag mismatches {mismatches}"
+            )
+
+    @staticmethod
+    def synthetic_population(rng, size):
+        # Patients scattered around Kathmandu, each a few km from home
+        center_lat = 27.7 + rng.uniform(-0.5, 0.5, size)
+        center_long = 85.3 + rng.uniform(-0.5, 0.5, size)
+        radius = rng.uniform(0.5, 5.0, size)
+        current_lat = center_lat + rng.normal(0, 0.03, size)
+        current_long = center_long + rng.normal(0, 0.03, size)
+        return GeofencePopulation(np.arange(size), center_lat, center_long, radius, current_lat, current_long)
+
+    @staticmethod
+    def geopy_pass(population):
+        """
+        The per-patient path used by GeofenceView and PatientLocationView.
+        """
+        outside = np.zeros(len(population), dtype=bool)
+        for i in range(len(population)):
+            center_point = (population.center_lat[i], population.center_long[i])
+            current_point = (population.current_lat[i], population.current_long[i])
+            outside[i] = distance(center_point, current_point).km > population.radius[i]
+        return outside
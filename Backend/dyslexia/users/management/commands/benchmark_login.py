@@ -0,0 +1,52 @@
+import time
+from django.contrib.auth import authenticate
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIClient
+from users.models import Patient
+from users.serializers import LoginSerializer
+
+
+class Command(BaseCommand):
+    help = "Measure single-worker login throughput, comparing the old double-authenticate path with LoginView."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        username, password = 'benchmark-login-user', 'benchmark-password'
+
+        # Everything runs in a transaction that is rolled back at the end
+        with transaction.atomic():
+            Patient.objects.create_user(email='benchmark-login@example.com', username=username, password=password)
+            credentials = {'username': username, 'password': password}
+
+            before = self.measure(iterations, lambda: self.legacy_login(credentials))
+
+            client = APIClient()
+            after = self.measure(iterations, lambda: client.post('/api/users/login/', credentials, format='json'))
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"before (validate + second authenticate): {before:6.2f} logins/s")
+        self.stdout.write(f"after  (LoginView, user reused):         {after:6.2f} logins/s")
+        self.stdout.write(f"speedup: {after / before:.2f}x")
+
+    @staticmethod
+    def legacy_login(credentials):
+        """
+        The password work the old LoginView did: the serializer authenticates,
+        then the view authenticates again.
+        """
+        serializer = LoginSerializer(data=credentials)
+        serializer.is_valid(raise_exception=True)
+        authenticate(username=credentials['username'], password=credentials['password'])
+
+    @staticmethod
+    def measure(iterations, login):
+        login()  # warm up
+        start = time.perf_counter()
+        for _ in range(iterations):
+            login()
+        return iterations / (time.perf_counter() - start)
@@ -0,0 +1,39 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from users.reminders import ReminderQueue
+
+
+class Command(BaseCommand):
+    help = "Benchmark schedule, cancel and pop on the reminder queue with synthetic reminders."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        size = options['size']
+        rng = random.Random(options['seed'])
+        now = time.time()
+        queue = ReminderQueue()
+
+        # Reminders spread over the next week
+        start = time.perf_counter()
+        for i in range(size):
+            queue.schedule(('appointment', i), now + rng.uniform(0, 7 * 86400), {"id": i})
+        scheduled = time.perf_counter() - start
+
+        cancelled_keys = rng.sample(range(size), size // 10)
+        start = time.perf_counter()
+        for i in cancelled_keys:
+            queue.cancel(('appointment', i))
+        cancelled = time.perf_counter() - start
+
+        start = time.perf_counter()
+        due = queue.pop_due(now + 86400)
+        popped = time.perf_counter() - start
+
+        self.stdout.write(f"schedule {size} reminders: {scheduled * 1e6 / size:6.2f}us each")
+        self.stdout.write(f"cancel   {len(cancelled_keys)} reminders: {cancelled * 1e6 / len(cancelled_keys):6.2f}us each")
+        self.stdout.write(f"pop      {len(due)} due in the next day: {popped * 1e6 / max(len(due), 1):6.2f}us each")
+        self.stdout.write(f"{len(queue)} reminders still scheduled")
@@ -0,0 +1,44 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from users.models import LocationFix
+from users.trails import compact_day, day_bounds, DEFAULT_TOLERANCE_M
+
+
+class Command(BaseCommand):
+    help = "Simplify each patient's location fixes for a day into a compact encoded trail."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Day to compact (YYYY-MM-DD). Defaults to yesterday.")
+        parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE_M, help="Simplification tolerance in meters.")
+        parser.add_argument('--prune', action='store_true', help="Delete the raw fixes once the trail is stored.")
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError("Date must be in YYYY-MM-DD format.")
+        else:
+            day = timezone.localdate() - timedelta(days=1)
+
+        if options['prune'] and day >= timezone.localdate():
+            raise CommandError("Refusing to prune fixes for a day that is not over yet.")
+
+        start, end = day_bounds(day)
+        patient_ids = (
+            LocationFix.objects.filter(timestamp__gte=start, timestamp__lt=end)
+            .values_list('patient_id', flat=True)
+            .distinct()
+        )
+
+        raw_total = kept_total = 0
+        for patient_id in list(patient_ids):
+            trail = compact_day(patient_id, day, options['tolerance'], prune=options['prune'])
+            raw_total += trail.raw_point_count
+            kept_total += trail.point_count
+            self.stdout.write(f"  patient {patient_id}: {trail.raw_point_count} -> {trail.point_count} points")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {day}: {raw_total} fixes -> {kept_total} points"
+        ))
@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+from users.geofence import GeofencePopulation
+
+
+class Command(BaseCommand):
+    help = "Evaluate every patient's geofence in one vectorised pass and report who is outside."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-list', action='store_true', help="Print the status of every patient.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        population = GeofencePopulation.load()
+        loaded = time.perf_counter()
+        result = population.evaluate()
+        evaluated = time.perf_counter()
+
+        self.stdout.write(
+            f"Evaluated {len(population)} patients "
+            f"(load {int((loaded - start) * 1000)}ms, evaluate {int((evaluated - loaded) * 1000)}ms)"
+        )
+        self.stdout.write(f"Without centre or fix: {int((~result.known).sum())}")
+        self.stdout.write(f"Outside geofence: {int(result.outside.sum())}")
+
+        if options['verbose_list']:
+            for patient_id, status in result.as_dict().items():
+                self.stdout.write(f"  {patient_id}: {status}")
+        else:
+            for patient_id in result.outside_ids:
+                self.stdout.write(f"  outside: {patient_id}")
@@ -0,0 +1,28 @@
+import asyncio
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.core.management.base import BaseCommand, CommandError
+from users.reminders import ReminderScheduler, serve
+
+
+class Command(BaseCommand):
+    help = "Run the appointment and medicine reminder scheduler, dispatching reminders over the channel layer."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-sleep', type=float, default=60, help="Longest wait between checks, in seconds.")
+
+    def handle(self, *args, **options):
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            raise CommandError("CHANNEL_LAYERS is not configured.")
+        # Its reminders would never reach the ASGI workers, nor their reload requests reach it
+        if isinstance(channel_layer, InMemoryChannelLayer):
+            raise CommandError("run_reminders needs a channel layer shared with the ASGI workers; set CHANNEL_LAYER=redis.")
+
+        scheduler = ReminderScheduler()
+        scheduler.load()
+        self.stdout.write(f"Scheduled {len(scheduler)} reminders.")
+
+        try:
+            asyncio.run(serve(scheduler, channel_layer, max_sleep=options['max_sleep']))
+        except KeyboardInterrupt:
+            pass
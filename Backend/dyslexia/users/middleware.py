@@ -0,0 +1,41 @@
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+
+
+@database_sync_to_async
+def get_user_for_token(key):
+    from rest_framework.exceptions import AuthenticationFailed
+    from .authentication import CachedTokenAuthentication
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+        return user
+    except AuthenticationFailed:
+        return AnonymousUser()
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """
+    Authenticate WebSocket connections with the same DRF token the app uses
+    for HTTP, passed as ?token=<key> or an "Authorization: Token <key>" header.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        key = self.get_token_key(scope)
+        scope['user'] = await get_user_for_token(key) if key else AnonymousUser()
+        return await super().__call__(scope, receive, send)
+
+    @staticmethod
+    def get_token_key(scope):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        if query.get('token'):
+            return query['token'][0]
+
+        for name, value in scope.get('headers', []):
+            if name == b'authorization':
+                parts = value.decode().split()
+                if len(parts) == 2 and parts[0].lower() == 'token':
+                    return parts[1]
+        return None
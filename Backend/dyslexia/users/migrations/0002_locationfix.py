@@ -0,0 +1,35 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='baseuser',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, upload_to='profile_pics/'),
+        ),
+        migrations.CreateModel(
+            name='LocationFix',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('accuracy', models.FloatField(blank=True, help_text='Horizontal accuracy in meters', null=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='location_fixes', to='users.patient')),
+            ],
+            options={
+                'verbose_name': 'Location Fix',
+                'verbose_name_plural': 'Location Fixes',
+                'constraints': [models.UniqueConstraint(fields=('patient', 'timestamp'), name='unique_patient_location_fix')],
+            },
+        ),
+    ]
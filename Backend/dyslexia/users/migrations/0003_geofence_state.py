@@ -0,0 +1,40 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_locationfix'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeofenceState',
+            fields=[
+                ('patient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='geofence_state', serialize=False, to='users.patient')),
+                ('is_outside', models.BooleanField(blank=True, null=True)),
+                ('pending_outside', models.BooleanField(blank=True, null=True)),
+                ('pending_since', models.DateTimeField(blank=True, null=True)),
+                ('changed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GeofenceEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('exit', 'Exit'), ('enter', 'Enter')], max_length=10)),
+                ('timestamp', models.DateTimeField()),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('distance_from_edge', models.FloatField(help_text='Signed distance to the fence edge in km, positive inside')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='geofence_events', to='users.patient')),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['patient', '-timestamp'], name='geofence_event_patient_time')],
+            },
+        ),
+    ]
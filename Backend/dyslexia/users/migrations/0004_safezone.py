@@ -0,0 +1,34 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_geofence_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='zones_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='SafeZone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('circle', 'Circle'), ('polygon', 'Polygon')], default='circle', max_length=10)),
+                ('center_lat', models.FloatField(blank=True, null=True)),
+                ('center_long', models.FloatField(blank=True, null=True)),
+                ('radius', models.FloatField(blank=True, help_text='Radius in kilometers', null=True)),
+                ('polygon', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='safe_zones', to='users.patient')),
+            ],
+        ),
+    ]
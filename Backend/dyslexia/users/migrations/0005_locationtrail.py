@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_safezone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationTrail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_time', models.DateTimeField()),
+                ('polyline', models.TextField()),
+                ('timestamps', models.TextField()),
+                ('point_count', models.PositiveIntegerField()),
+                ('raw_point_count', models.PositiveIntegerField()),
+                ('tolerance_m', models.FloatField(help_text='Douglas-Peucker tolerance in meters')),
+                ('pruned', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='location_trails', to='users.patient')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('patient', 'date'), name='unique_patient_trail_date')],
+            },
+        ),
+    ]
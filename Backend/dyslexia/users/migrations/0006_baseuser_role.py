@@ -0,0 +1,25 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:09
+
+from django.db import migrations, models
+
+
+def backfill_roles(apps, schema_editor):
+    BaseUser = apps.get_model('users', 'BaseUser')
+    BaseUser.objects.filter(caretaker__isnull=False).update(role='caretaker')
+    BaseUser.objects.filter(patient__isnull=False).update(role='patient')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_locationtrail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='baseuser',
+            name='role',
+            field=models.CharField(blank=True, choices=[('caretaker', 'Caretaker'), ('patient', 'Patient')], db_index=True, default='', max_length=20),
+        ),
+        migrations.RunPython(backfill_roles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:14
+
+from datetime import datetime, time
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# A copy of users.appointments as it stood when this migration was written,
+# so later changes to that module can't change what the migration does
+TIME_FORMATS = ['%I:%M %p', '%I:%M%p', '%H:%M', '%H:%M:%S']
+
+
+def parse_appointment_datetime(date_value, time_value=None):
+    try:
+        parsed = datetime.fromisoformat(str(date_value).strip())
+    except (TypeError, ValueError):
+        return None
+
+    if len(str(date_value).strip()) <= 10:
+        at = time()
+        text = str(time_value or '').strip().upper()
+        for fmt in TIME_FORMATS:
+            try:
+                at = datetime.strptime(text, fmt).time()
+                break
+            except ValueError:
+                continue
+        parsed = datetime.combine(parsed.date(), at)
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+def copy_schedule_from_json(apps, schema_editor):
+    Patient = apps.get_model('users', 'Patient')
+    Medicine = apps.get_model('users', 'Medicine')
+    Appointment = apps.get_model('users', 'Appointment')
+
+    medicines, appointments = [], []
+    for patient in Patient.objects.only('medicines', 'appointments').iterator():
+        for entry in patient.medicines or []:
+            if isinstance(entry, dict):
+                medicines.append(Medicine(
+                    patient_id=patient.pk,
+                    name=_text(entry.get('name')),
+                    dosage=_text(entry.get('dosage')),
+                    frequency=_text(entry.get('frequency')),
+                ))
+        for entry in patient.appointments or []:
+            if isinstance(entry, dict):
+                appointments.append(Appointment(
+                    patient_id=patient.pk,
+                    description=_text(entry.get('description')),
+                    date=_text(entry.get('date')),
+                    time=_text(entry.get('time')),
+                    scheduled_at=parse_appointment_datetime(entry.get('date'), entry.get('time')),
+                ))
+
+    Medicine.objects.bulk_create(medicines, batch_size=500)
+    Appointment.objects.bulk_create(appointments, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_baseuser_role'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Appointment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.TextField()),
+                ('date', models.CharField(max_length=64)),
+                ('time', models.CharField(blank=True, max_length=64)),
+                ('scheduled_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='patient_appointments', to='users.patient')),
+            ],
+            options={
+                'ordering': ['scheduled_at', 'id'],
+                'indexes': [models.Index(fields=['patient', 'scheduled_at'], name='appointment_patient_time_idx'), models.Index(fields=['scheduled_at'], name='appointment_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Medicine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('dosage', models.CharField(max_length=255)),
+                ('frequency', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='patient_medicines', to='users.patient')),
+            ],
+            options={
+                'ordering': ['name', 'id'],
+                'indexes': [models.Index(fields=['patient', 'name'], name='medicine_patient_name_idx')],
+            },
+        ),
+        migrations.RunPython(copy_schedule_from_json, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_medicine_appointment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(choices=[('note', 'Note'), ('contact', 'Contact'), ('medicine', 'Medicine'), ('appointment', 'Appointment'), ('patient', 'Patient')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='users.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['patient', 'id'], name='changelog_patient_cursor_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_changelog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='baseuser',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='location_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
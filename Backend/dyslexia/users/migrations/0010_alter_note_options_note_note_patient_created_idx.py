@@ -0,0 +1,29 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:22
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, Now
+
+
+def backfill_created_at(apps, schema_editor):
+    # Keyset pagination orders on created_at, which older rows may lack
+    Note = apps.get_model('users', 'Note')
+    Note.objects.filter(created_at__isnull=True).update(created_at=Coalesce('updated_at', Now()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_baseuser_updated_at_patient_location_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+        migrations.AlterModelOptions(
+            name='note',
+            options={'ordering': ['-created_at', '-id'], 'verbose_name': 'Patient Note', 'verbose_name_plural': 'Patient Notes'},
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['patient', '-created_at', '-id'], name='note_patient_created_idx'),
+        ),
+    ]
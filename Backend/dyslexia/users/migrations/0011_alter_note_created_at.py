@@ -0,0 +1,26 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:05
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, Now
+
+
+def backfill_created_at(apps, schema_editor):
+    # Rows written without created_at since 0010 would block the NOT NULL change
+    Note = apps.get_model('users', 'Note')
+    Note.objects.filter(created_at__isnull=True).update(created_at=Coalesce('updated_at', Now()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_alter_note_options_note_note_patient_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='note',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+    ]
@@ -19,6 +19,13 @@ class CustomUserManager(BaseUserManager):
 
 # Abstract User model
 class BaseUser(AbstractBaseUser):
+    CARETAKER = 'caretaker'
+    PATIENT = 'patient'
+    ROLE_CHOICES = [
+        (CARETAKER, 'Caretaker'),
+        (PATIENT, 'Patient'),
+    ]
+
     email = models.EmailField(unique=True)
     username = models.CharField(max_length=255, unique=True)
     name = models.CharField(max_length=255, blank=True, null=True)
@@ -26,6 +33,10 @@ class BaseUser(AbstractBaseUser):
     is_superuser = models.BooleanField(default=False)
     is_staff = models.BooleanField(default=False)  # Required for admin access
     photo = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    # Which child table (caretaker or Patient) holds this user's profile,
+    # so the role is known without probing the child tables
+    role = models.CharField(max_length=20, choices=ROLE_CHOICES, blank=True, default='', db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
     
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = ['email']
@@ -38,12 +49,30 @@ class BaseUser(AbstractBaseUser):
     def has_perm(self, perm, obj=None):
         return True
 
+    @property
+    def is_caretaker(self):
+        return self.role == self.CARETAKER
+
+    @property
+    def is_patient(self):
+        return self.role == self.PATIENT
+
 # Caretaker User
 class caretaker(BaseUser):
     qualifications = models.CharField(max_length=255, blank=True, null=True)
     experience_years = models.IntegerField(null=True, blank=True)
     patients = models.ManyToManyField('Patient', related_name='caretakers', blank=True)
 
+    def save(self, *args, **kwargs):
+        self.role = BaseUser.CARETAKER
+        super().save(*args, **kwargs)
+
+# Columns that feed the location payload (see users.realtime.build_location_payload)
+LOCATION_FIELDS = {
+    'current_coordinates_lat', 'current_coordinates_long',
+    'center_coordinates_lat', 'center_coordinates_long', 'radius',
+}
+
 # Patient User
 class Patient(BaseUser):
     medical_conditions = models.TextField(null=True, blank=True)
@@ -56,6 +85,10 @@ class Patient(BaseUser):
     center_coordinates_lat = models.FloatField(null=True, blank=True)
     center_coordinates_long = models.FloatField(null=True, blank=True)
     radius = models.FloatField(default=5.0)
+    # Bumped whenever the patient's SafeZones change, to invalidate cached zone indexes
+    zones_version = models.PositiveIntegerField(default=0)
+    # Bumped whenever the current location or home zone changes; used as an ETag
+    location_version = models.PositiveIntegerField(default=0)
 
     # JSON structured fields
     goals = models.JSONField(default=list, blank=True, null=True)
@@ -65,10 +98,24 @@ class Patient(BaseUser):
 
     # Enforcing specific structure for JSON fields
     def save(self, *args, **kwargs):
-        self.medicines = self.validate_medicines(self.medicines)
-        self.appointments = self.validate_appointments(self.appointments)
-        self.notes = self.validate_notes(self.notes)
+        self.role = BaseUser.PATIENT
+        # Partial saves (e.g. location updates) only validate the fields they write
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'medicines' in update_fields:
+            self.medicines = self.validate_medicines(self.medicines)
+        if update_fields is None or 'appointments' in update_fields:
+            self.appointments = self.validate_appointments(self.appointments)
+        if update_fields is None or 'notes' in update_fields:
+            self.notes = self.validate_notes(self.notes)
+        # Incremented in the database, so concurrent location saves each count
+        bump_location = not self._state.adding and (update_fields is None or LOCATION_FIELDS.intersection(update_fields))
+        if bump_location:
+            self.location_version = models.F('location_version') + 1
+            if update_fields is not None:
+                kwargs['update_fields'] = [*update_fields, 'location_version']
         super().save(*args, **kwargs)
+        if bump_location:
+            self.refresh_from_db(fields=['location_version'])
 
     @staticmethod
     def validate_medicines(medicines):
@@ -120,13 +167,266 @@ class Note(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
     
-    created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
+    # Not null: keyset pagination orders and filters on it
+    created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
     
     def __str__(self):
         return f"{self.patient.username} - {self.title}"
     
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Keyset pagination of a patient's notes, newest first
+            models.Index(fields=['patient', '-created_at', '-id'], name='note_patient_created_idx'),
+        ]
         verbose_name = 'Patient Note'
         verbose_name_plural = 'Patient Notes'
+
+
+class Medicine(models.Model):
+    """
+    One entry of a patient's medicine list, kept in sync with Patient.medicines
+    """
+    patient = models.ForeignKey(
+        Patient,
+        on_delete=models.CASCADE,
+        related_name='patient_medicines'
+    )
+    name = models.CharField(max_length=255)
+    dosage = models.CharField(max_length=255)
+    frequency = models.CharField(max_length=255)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.patient_id} - {self.name} ({self.dosage}, {self.frequency})"
+
+    class Meta:
+        ordering = ['name', 'id']
+        indexes = [
+            models.Index(fields=['patient', 'name'], name='medicine_patient_name_idx'),
+        ]
+
+
+class Appointment(models.Model):
+    """
+    One entry of a patient's appointment list, kept in sync with
+    Patient.appointments. The free-text date/time are kept as entered;
+    scheduled_at is the parsed datetime, or null if they could not be read.
+    """
+    patient = models.ForeignKey(
+        Patient,
+        on_delete=models.CASCADE,
+        related_name='patient_appointments'
+    )
+    description = models.TextField()
+    date = models.CharField(max_length=64)
+    time = models.CharField(max_length=64, blank=True)
+    scheduled_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.patient_id} - {self.description} @ {self.scheduled_at or self.date}"
+
+    class Meta:
+        ordering = ['scheduled_at', 'id']
+        indexes = [
+            models.Index(fields=['patient', 'scheduled_at'], name='appointment_patient_time_idx'),
+            # Upcoming appointments across many patients
+            models.Index(fields=['scheduled_at'], name='appointment_time_idx'),
+        ]
+
+
+class SafeZone(models.Model):
+    """
+    Additional safe area for a patient, e.g. a day centre or a relative's house.
+    Circles use center/radius (km); polygons use a list of [lat, long] vertices.
+    """
+    CIRCLE = 'circle'
+    POLYGON = 'polygon'
+    KIND_CHOICES = [
+        (CIRCLE, 'Circle'),
+        (POLYGON, 'Polygon'),
+    ]
+
+    patient = models.ForeignKey(
+        Patient,
+        on_delete=models.CASCADE,
+        related_name='safe_zones'
+    )
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=CIRCLE)
+    center_lat = models.FloatField(null=True, blank=True)
+    center_long = models.FloatField(null=True, blank=True)
+    radius = models.FloatField(null=True, blank=True, help_text="Radius in kilometers")
+    polygon = models.JSONField(default=list, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.bump_patient_version()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.bump_patient_version()
+        return result
+
+    def bump_patient_version(self):
+        Patient.objects.filter(pk=self.patient_id).update(zones_version=models.F('zones_version') + 1)
+
+    def __str__(self):
+        return f"{self.patient_id} - {self.name} ({self.kind})"
+
+
+class LocationFix(models.Model):
+    """
+    Append-only history of patient location fixes.
+    Kept narrow so ingest never touches the wide Patient row.
+    """
+    patient = models.ForeignKey(
+        Patient,
+        on_delete=models.CASCADE,
+        related_name='location_fixes'
+    )
+    timestamp = models.DateTimeField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    accuracy = models.FloatField(null=True, blank=True, help_text="Horizontal accuracy in meters")
+
+    def __str__(self):
+        return f"{self.patient_id} @ {self.timestamp}: ({self.latitude}, {self.longitude})"
+
+    class Meta:
+        constraints = [
+            # Also serves as the (patient, timestamp) index for history reads
+            models.UniqueConstraint(fields=['patient', 'timestamp'], name='unique_patient_location_fix'),
+        ]
+        verbose_name = 'Location Fix'
+        verbose_name_plural = 'Location Fixes'
+
+
+class LocationTrail(models.Model):
+    """
+    One patient's simplified movement trail for one day, stored as an encoded
+    polyline plus encoded second offsets from start_time.
+    """
+    patient = models.ForeignKey(
+        Patient,
+        on_delete=models.CASCADE,
+        related_name='location_trails'
+    )
+    date = models.DateField()
+    start_time = models.DateTimeField()
+    polyline = models.TextField()
+    timestamps = models.TextField()
+    point_count = models.PositiveIntegerField()
+    raw_point_count = models.PositiveIntegerField()
+    tolerance_m = models.FloatField(help_text="Douglas-Peucker tolerance in meters")
+    # Raw fixes for the day were deleted after compaction
+    pruned = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.patient_id} - {self.date} ({self.point_count}/{self.raw_point_count} points)"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['patient', 'date'], name='unique_patient_trail_date'),
+        ]
+
+
+class GeofenceState(models.Model):
+    """
+    Last confirmed inside/outside state of a patient's geofence,
+    plus a pending crossing that has not yet lasted the dwell time.
+    """
+    patient = models.OneToOneField(
+        Patient,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='geofence_state'
+    )
+    is_outside = models.BooleanField(null=True, blank=True)
+    pending_outside = models.BooleanField(null=True, blank=True)
+    pending_since = models.DateTimeField(null=True, blank=True)
+    changed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.patient_id}: {'outside' if self.is_outside else 'inside'}"
+
+
+class GeofenceEvent(models.Model):
+    """
+    One row per confirmed geofence crossing.
+    """
+    EXIT = 'exit'
+    ENTER = 'enter'
+    KIND_CHOICES = [
+        (EXIT, 'Exit'),
+        (ENTER, 'Enter'),
+    ]
+
+    patient = models.ForeignKey(
+        Patient,
+        on_delete=models.CASCADE,
+        related_name='geofence_events'
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    timestamp = models.DateTimeField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    distance_from_edge = models.FloatField(help_text="Signed distance to the fence edge in km, positive inside")
+
+    def __str__(self):
+        return f"{self.patient_id} {self.kind} @ {self.timestamp}"
+
+    class Meta:
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['patient', '-timestamp'], name='geofence_event_patient_time'),
+        ]
+
+
+class ChangeLog(models.Model):
+    """
+    Append-only log of changes to a patient's data, read by the sync endpoint.
+    The auto-increment id doubles as the cursor handed to clients.
+    """
+    NOTE = 'note'
+    CONTACT = 'contact'
+    MEDICINE = 'medicine'
+    APPOINTMENT = 'appointment'
+    PATIENT = 'patient'
+    RESOURCE_CHOICES = [
+        (NOTE, 'Note'),
+        (CONTACT, 'Contact'),
+        (MEDICINE, 'Medicine'),
+        (APPOINTMENT, 'Appointment'),
+        (PATIENT, 'Patient'),
+    ]
+
+    patient = models.ForeignKey(
+        Patient,
+        on_delete=models.CASCADE,
+        related_name='changes'
+    )
+    resource = models.CharField(max_length=20, choices=RESOURCE_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        action = 'deleted' if self.deleted else 'changed'
+        return f"#{self.id} {self.resource} {self.object_id} {action} for patient {self.patient_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'id'], name='changelog_patient_cursor_idx'),
+        ]
+
@@ -1,18 +1,20 @@
 from rest_framework import permissions
+from .models import BaseUser
+from .roles import get_role
 
 class Iscaretaker(permissions.BasePermission):
     """
     Custom permission to only allow caretakers to access certain views.
     """
     def has_permission(self, request, view):
-        return request.user.is_authenticated and hasattr(request.user, 'caretaker')
+        return get_role(request.user) == BaseUser.CARETAKER
 
 class IsPatient(permissions.BasePermission):
     """
     Custom permission to only allow patients to access certain views.
     """
     def has_permission(self, request, view):
-        return request.user.is_authenticated and hasattr(request.user, 'patient')
+        return get_role(request.user) == BaseUser.PATIENT
     
 
 class IsCaretakerOrReadOnlyForCenter(permissions.BasePermission):
@@ -0,0 +1,110 @@
+import logging
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from .zones import get_patient_index, point_distance_km
+
+logger = logging.getLogger(__name__)
+
+
+def location_group_name(patient_id):
+    """
+    Channel group that caretakers watching a patient's location subscribe to.
+    """
+    return f"patient_location_{patient_id}"
+
+
+def reminder_group_name(user_id):
+    """
+    Channel group for a user's (patient's or caretaker's) reminder stream.
+    """
+    return f"user_reminders_{user_id}"
+
+
+# Channel group the run_reminders process listens on for schedule changes
+REMINDER_SCHEDULER_GROUP = "reminder_scheduler"
+
+
+def build_location_payload(patient):
+    """
+    Build the location snapshot sent to caretakers for a patient.
+    Same shape as the PatientLocationView response.
+
+    is_outside_geofence, distance_from_edge and zone describe the safe zone
+    the patient is in (or nearest to). distance_from_center is always the
+    distance to the patient's home centre.
+    """
+    check = None
+    home_distance = None
+    if patient.current_coordinates_lat is not None and patient.current_coordinates_long is not None:
+        lat, lon = float(patient.current_coordinates_lat), float(patient.current_coordinates_long)
+        check = get_patient_index(patient).locate(lat, lon)
+        if patient.center_coordinates_lat is not None and patient.center_coordinates_long is not None:
+            home_distance = point_distance_km(
+                float(patient.center_coordinates_lat), float(patient.center_coordinates_long), lat, lon
+            )
+
+    return {
+        "current_coordinates_lat": patient.current_coordinates_lat,
+        "current_coordinates_long": patient.current_coordinates_long,
+        "radius": patient.radius,
+        "center_coordinates_lat": patient.center_coordinates_lat,
+        "center_coordinates_long": patient.center_coordinates_long,
+        "is_outside_geofence": check is not None and not check.inside,
+        "distance_from_center": home_distance,
+        "distance_from_edge": check.edge_distance_km if check else None,
+        "zone": check.zone.name if check else None
+    }
+
+
+def serialize_geofence_event(event):
+    return {
+        "event": event.kind,
+        "timestamp": event.timestamp.isoformat(),
+        "latitude": event.latitude,
+        "longitude": event.longitude,
+        "distance_from_edge": event.distance_from_edge
+    }
+
+
+def publish_location(patient_id, payload):
+    """
+    Push a location snapshot to every caretaker subscribed to the patient.
+    """
+    send_to_patient_group(patient_id, {"type": "location.update", "location": payload})
+
+
+def publish_geofence_event(patient_id, event):
+    """
+    Push a confirmed geofence enter/exit to every caretaker subscribed to the patient.
+    """
+    send_to_patient_group(patient_id, {"type": "geofence.transition", "event": serialize_geofence_event(event)})
+
+
+def send_to_patient_group(patient_id, message):
+    """
+    Publishing is best effort: a broken channel layer must not fail the fix upload.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(location_group_name(patient_id), message)
+    except Exception as e:
+        logger.error(f"Failed to publish {message['type']} for patient {patient_id}: {e}")
+
+
+def request_reminder_reload(patient_id):
+    """
+    Ask the reminder scheduler to reload a patient whose schedule changed.
+    Best effort, like the location publishing above.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            REMINDER_SCHEDULER_GROUP,
+            {"type": "reminders.reload", "patient_id": patient_id}
+        )
+    except Exception as e:
+        logger.error(f"Failed to request a reminder reload for patient {patient_id}: {e}")
@@ -0,0 +1,308 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import re
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from .models import Medicine, Appointment, caretaker
+from .realtime import reminder_group_name, REMINDER_SCHEDULER_GROUP
+
+logger = logging.getLogger(__name__)
+
+# Times of day used when a medicine's frequency names a count or a period
+DOSE_TIMES = {
+    1: ['09:00'],
+    2: ['09:00', '21:00'],
+    3: ['08:00', '14:00', '20:00'],
+    4: ['08:00', '12:00', '16:00', '20:00'],
+}
+PERIOD_TIMES = {
+    'morning': '08:00',
+    'breakfast': '08:00',
+    'noon': '13:00',
+    'lunch': '13:00',
+    'afternoon': '15:00',
+    'evening': '18:00',
+    'dinner': '19:00',
+    'night': '21:00',
+    'bedtime': '21:00',
+}
+COUNT_WORDS = {'once': 1, 'twice': 2, 'thrice': 3, 'one': 1, 'two': 2, 'three': 3, 'four': 4}
+# Prescription shorthand: once, twice, three and four times daily
+ABBREVIATIONS = {'od': 1, 'bd': 2, 'bid': 2, 'tds': 3, 'tid': 3, 'qds': 4, 'qid': 4}
+
+CLOCK_RE = re.compile(r'\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)?\b', re.IGNORECASE)
+EVERY_HOURS_RE = re.compile(r'every\s+(\d{1,2})\s*(?:h|hr|hrs|hour|hours)\b', re.IGNORECASE)
+COUNT_RE = re.compile(r'\b(\d|once|twice|thrice|one|two|three|four)\b(?:\s*(?:times|x))?\s*(?:a|per|/)?\s*(?:day|daily)', re.IGNORECASE)
+WORD_RE = re.compile(r'[a-z]+')
+
+
+def dose_times(frequency):
+    """
+    Read the times of day ('HH:MM') a medicine is taken from its free-text
+    frequency, e.g. "twice a day", "8am and 8pm", "every 6 hours", "at night".
+    Returns [] if nothing usable is found.
+    """
+    text = (frequency or '').strip().lower()
+    if not text:
+        return []
+
+    match = EVERY_HOURS_RE.search(text)
+    if match:
+        step = int(match.group(1))
+        if 0 < step <= 24:
+            return sorted(f"{(8 + i * step) % 24:02d}:00" for i in range(24 // step))
+
+    times = []
+    for hour, minute, meridiem in CLOCK_RE.findall(text):
+        # Bare numbers are only clock times with a colon or am/pm ("2 times" is a count)
+        if not minute and not meridiem:
+            continue
+        hour, minute = int(hour), int(minute or 0)
+        if meridiem:
+            hour = hour % 12 + (12 if meridiem.lower() == 'pm' else 0)
+        if hour < 24 and minute < 60:
+            times.append(f"{hour:02d}:{minute:02d}")
+    # Whole words only: "noon" is inside "afternoon" and "night" inside "fortnight"
+    times += [PERIOD_TIMES[word] for word in WORD_RE.findall(text) if word in PERIOD_TIMES]
+    if times:
+        return sorted(set(times))
+
+    match = COUNT_RE.search(text)
+    if match:
+        word = match.group(1)
+        count = int(word) if word.isdigit() else COUNT_WORDS[word]
+        return DOSE_TIMES.get(count, [])
+    for word in WORD_RE.findall(text):
+        if word in ABBREVIATIONS:
+            return DOSE_TIMES[ABBREVIATIONS[word]]
+    if 'daily' in text or 'every day' in text:
+        return DOSE_TIMES[1]
+    return []
+
+
+def next_dose_at(at, after):
+    """
+    The first local datetime strictly after `after` at time of day `at` ('HH:MM').
+    """
+    hour, minute = map(int, at.split(':'))
+    local = timezone.localtime(after)
+    candidate = local.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if candidate <= local:
+        candidate = timezone.make_aware(datetime.combine(local.date() + timedelta(days=1), candidate.time()))
+    return candidate
+
+
+class ReminderQueue:
+    """
+    Min-heap of reminders keyed by an arbitrary hashable key.
+
+    schedule() is O(log n). cancel() is O(1): the entry is only marked dead
+    and dropped when it reaches the top of the heap, and the heap is rebuilt
+    once dead entries outnumber live ones.
+    """
+    REMOVED = object()
+
+    def __init__(self):
+        self._heap = []
+        self._entries = {}
+        self._counter = itertools.count()
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def schedule(self, key, due, payload):
+        """
+        Add a reminder due at `due` (epoch seconds), replacing any with the same key.
+        """
+        self.cancel(key)
+        entry = [due, next(self._counter), key, payload]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+
+    def cancel(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        entry[2] = self.REMOVED
+        self._dead += 1
+        if self._dead > len(self._entries):
+            self._heap = [entry for entry in self._heap if entry[2] is not self.REMOVED]
+            heapq.heapify(self._heap)
+            self._dead = 0
+        return True
+
+    def next_due(self):
+        while self._heap and self._heap[0][2] is self.REMOVED:
+            heapq.heappop(self._heap)
+            self._dead -= 1
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """
+        Remove and return (key, payload) for every reminder due at or before `now`.
+        """
+        due = []
+        while True:
+            next_due = self.next_due()
+            if next_due is None or next_due > now:
+                return due
+            _, _, key, payload = heapq.heappop(self._heap)
+            del self._entries[key]
+            due.append((key, payload))
+
+
+class ReminderScheduler:
+    """
+    Upcoming appointment and medicine reminders for all patients.
+
+    Appointments remind once, `lead` before scheduled_at. Medicines remind at
+    each of their dose times and are rescheduled for the next day after
+    firing. Only reminders still in the future are scheduled, so reloading a
+    patient never re-sends one that already went out.
+    """
+
+    def __init__(self, lead=None):
+        minutes = settings.REMINDER_APPOINTMENT_LEAD_MINUTES if lead is None else lead
+        self.lead = timedelta(minutes=minutes)
+        self.queue = ReminderQueue()
+        self.by_patient = defaultdict(set)
+
+    def __len__(self):
+        return len(self.queue)
+
+    def add(self, patient_id, key, due_at, payload):
+        self.queue.schedule(key, due_at.timestamp(), payload)
+        self.by_patient[patient_id].add(key)
+
+    def add_appointment(self, appointment, now):
+        if appointment.scheduled_at is None:
+            return
+        due_at = appointment.scheduled_at - self.lead
+        if due_at <= now:
+            return
+        self.add(appointment.patient_id, ('appointment', appointment.id), due_at, {
+            "kind": "appointment",
+            "id": appointment.id,
+            "patient_id": appointment.patient_id,
+            "title": appointment.description,
+            "scheduled_at": appointment.scheduled_at.isoformat(),
+        })
+
+    def add_medicine(self, medicine, now):
+        for at in dose_times(medicine.frequency):
+            self.add_dose(medicine.patient_id, medicine.id, at, f"{medicine.name} ({medicine.dosage})", now)
+
+    def add_dose(self, patient_id, medicine_id, at, title, after):
+        due_at = next_dose_at(at, after)
+        self.add(patient_id, ('medicine', medicine_id, at), due_at, {
+            "kind": "medicine",
+            "id": medicine_id,
+            "patient_id": patient_id,
+            "title": title,
+            "dose_time": at,
+            "scheduled_at": due_at.isoformat(),
+        })
+
+    def load(self, patient_ids=None, now=None):
+        """
+        Schedule reminders for the given patients (all patients if None).
+        """
+        now = now or timezone.now()
+        appointments = Appointment.objects.filter(scheduled_at__gt=now + self.lead)
+        medicines = Medicine.objects.all()
+        if patient_ids is not None:
+            appointments = appointments.filter(patient_id__in=patient_ids)
+            medicines = medicines.filter(patient_id__in=patient_ids)
+
+        fields = ['id', 'patient_id', 'description', 'scheduled_at']
+        for appointment in appointments.only(*fields).iterator(chunk_size=2000):
+            self.add_appointment(appointment, now)
+        for medicine in medicines.only('id', 'patient_id', 'name', 'dosage', 'frequency').iterator(chunk_size=2000):
+            self.add_medicine(medicine, now)
+
+    def cancel_patient(self, patient_id):
+        for key in self.by_patient.pop(patient_id, ()):
+            self.queue.cancel(key)
+
+    def reload_patient(self, patient_id, now=None):
+        """
+        Replace one patient's reminders after their schedule was edited.
+        """
+        self.cancel_patient(patient_id)
+        self.load([patient_id], now)
+
+    def pop_due(self, now=None):
+        """
+        Return the payloads of reminders that are due, rescheduling medicine doses.
+        """
+        now = now or timezone.now()
+        reminders = []
+        for key, payload in self.queue.pop_due(now.timestamp()):
+            patient_keys = self.by_patient.get(payload['patient_id'])
+            if patient_keys is not None:
+                patient_keys.discard(key)
+            if payload['kind'] == 'medicine':
+                self.add_dose(payload['patient_id'], payload['id'], payload['dose_time'], payload['title'], now)
+            reminders.append(payload)
+        return reminders
+
+    def seconds_until_next(self, now=None):
+        next_due = self.queue.next_due()
+        if next_due is None:
+            return None
+        return max(0.0, next_due - (now or timezone.now()).timestamp())
+
+
+@database_sync_to_async
+def reminder_recipients(patient_id):
+    """
+    The patient and their caretakers.
+    """
+    return [patient_id] + list(caretaker.objects.filter(patients=patient_id).values_list('id', flat=True))
+
+
+async def dispatch(channel_layer, reminder):
+    for user_id in await reminder_recipients(reminder['patient_id']):
+        await channel_layer.group_send(reminder_group_name(user_id), {"type": "reminder.due", "reminder": reminder})
+
+
+async def serve(scheduler, channel_layer, max_sleep=60):
+    """
+    Dispatch due reminders over the channel layer until cancelled, reloading
+    patients when the API announces a schedule change.
+    """
+    channel = await channel_layer.new_channel()
+    joined_at = 0.0
+
+    while True:
+        # Groups expire on the channel layer, so rejoin now and then
+        if time.monotonic() - joined_at > 600:
+            await channel_layer.group_add(REMINDER_SCHEDULER_GROUP, channel)
+            joined_at = time.monotonic()
+
+        for reminder in scheduler.pop_due():
+            try:
+                await dispatch(channel_layer, reminder)
+            except Exception as e:
+                logger.error(f"Failed to dispatch {reminder['kind']} reminder {reminder['id']}: {e}")
+
+        wait = scheduler.seconds_until_next()
+        wait = max_sleep if wait is None else min(wait, max_sleep)
+        try:
+            message = await asyncio.wait_for(channel_layer.receive(channel), timeout=wait)
+        except asyncio.TimeoutError:
+            continue
+
+        if message.get('type') == 'reminders.reload':
+            await database_sync_to_async(scheduler.reload_patient)(message['patient_id'])
+            logger.debug(f"Reloaded reminders for patient {message['patient_id']}")
@@ -0,0 +1,33 @@
+from .models import BaseUser, caretaker, Patient
+
+PROFILE_MODELS = {
+    BaseUser.CARETAKER: caretaker,
+    BaseUser.PATIENT: Patient,
+}
+
+
+def get_role(user):
+    """
+    The user's role ('caretaker', 'patient' or '') without touching the database.
+    """
+    if user is None or not user.is_authenticated:
+        return ''
+    return getattr(user, 'role', '')
+
+
+def get_profile(user):
+    """
+    Return the concrete caretaker or Patient row for a user, or None.
+
+    The row is loaded with a single join on first use and cached on the user
+    instance, which lives for one request, so later calls are free.
+    """
+    if isinstance(user, (caretaker, Patient)):
+        return user
+    if '_profile' in user.__dict__:
+        return user._profile
+
+    model = PROFILE_MODELS.get(get_role(user))
+    profile = model.objects.filter(pk=user.pk).first() if model else None
+    user._profile = profile
+    return profile
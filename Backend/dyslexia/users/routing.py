@@ -0,0 +1,7 @@
+from django.urls import re_path
+from . import consumers
+
+websocket_urlpatterns = [
+    re_path(r'ws/patient/(?P<patient_id>\d+)/location/$', consumers.PatientLocationConsumer.as_asgi()),
+    re_path(r'ws/reminders/$', consumers.ReminderConsumer.as_asgi()),
+]
@@ -0,0 +1,76 @@
+from collections import defaultdict
+from django.db import transaction
+from .appointments import parse_appointment_datetime
+from .changes import record_changes
+from .models import ChangeLog, Medicine, Appointment
+
+# JSON keys that identify an entry; rows whose keys still match keep their id
+MEDICINE_KEYS = ('name', 'dosage', 'frequency')
+APPOINTMENT_KEYS = ('date', 'time', 'description')
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+def _sync(model, resource, patient_id, entries, keys, build):
+    """
+    Make the patient's rows of `model` match the JSON `entries`.
+
+    Rows are matched on `keys`, so only added and removed entries cost a
+    write. Returns (created, deleted_ids).
+    """
+    existing = defaultdict(list)
+    for row in model.objects.filter(patient_id=patient_id):
+        existing[tuple(getattr(row, key) for key in keys)].append(row)
+
+    to_create = []
+    for entry in entries or []:
+        values = tuple(_text(entry.get(key)) for key in keys)
+        if existing.get(values):
+            existing[values].pop()
+        else:
+            to_create.append(build(patient_id, entry))
+
+    deleted_ids = [row.id for rows in existing.values() for row in rows]
+    if deleted_ids:
+        model.objects.filter(id__in=deleted_ids).delete()
+    created = model.objects.bulk_create(to_create)
+    # bulk_create sends no post_save, so log the new rows for sync here
+    record_changes(patient_id, resource, [row.id for row in created])
+    return created, deleted_ids
+
+
+def build_medicine(patient_id, entry):
+    return Medicine(
+        patient_id=patient_id,
+        name=_text(entry.get('name')),
+        dosage=_text(entry.get('dosage')),
+        frequency=_text(entry.get('frequency')),
+    )
+
+
+def build_appointment(patient_id, entry):
+    return Appointment(
+        patient_id=patient_id,
+        description=_text(entry.get('description')),
+        date=_text(entry.get('date')),
+        time=_text(entry.get('time')),
+        scheduled_at=parse_appointment_datetime(entry.get('date'), entry.get('time')),
+    )
+
+
+def sync_patient_schedule(patient, fields=('medicines', 'appointments')):
+    """
+    Mirror the patient's medicines/appointments JSON into the Medicine and
+    Appointment tables. Call after saving changes to those fields.
+
+    Returns {field: (created rows, deleted ids)} for the synced fields.
+    """
+    changes = {}
+    with transaction.atomic():
+        if 'medicines' in fields:
+            changes['medicines'] = _sync(Medicine, ChangeLog.MEDICINE, patient.pk, patient.medicines, MEDICINE_KEYS, build_medicine)
+        if 'appointments' in fields:
+            changes['appointments'] = _sync(Appointment, ChangeLog.APPOINTMENT, patient.pk, patient.appointments, APPOINTMENT_KEYS, build_appointment)
+    return changes
@@ -1,7 +1,9 @@
 from rest_framework import serializers, serializers, request
 from rest_framework.exceptions import PermissionDenied
+from datetime import timedelta
 from django.utils import timezone
-from .models import caretaker, Patient, Note
+from .models import caretaker, Patient, Note, LocationFix, SafeZone, GeofenceState, Medicine, Appointment
+from .roles import get_profile
 from django.contrib.auth import get_user_model, authenticate
 from django.contrib.auth.password_validation import validate_password
 
@@ -41,21 +43,33 @@ class LoginSerializer(serializers.Serializer):
             raise serializers.ValidationError("Must include 'username' and 'password'")
 
         # Authenticate user
-        user = authenticate(username=username, password=password)
+        user = authenticate(request=self.context.get('request'), username=username, password=password)
         
         if not user:
             raise serializers.ValidationError("Invalid credentials")
 
         # Additional check to ensure user is either caretaker or patient
-        is_caretaker = hasattr(user, 'caretaker') and isinstance(user.caretaker, caretaker)
-        is_patient = hasattr(user, 'patient') and isinstance(user.patient, Patient)
-
-        if not (is_caretaker or is_patient):
+        if not (user.is_caretaker or user.is_patient):
             raise serializers.ValidationError("Only caretakers and patients can log in")
 
         data['user'] = user
         return data
 
+def media_url(context, file):
+    """
+    Absolute URL of an uploaded file. The scheme and host are resolved once
+    and kept in the serializer context, so list responses don't rebuild
+    them for every row.
+    """
+    if not file:
+        return None
+    request = context.get('request')
+    if request is None:
+        return file.url
+    if 'base_url' not in context:
+        context['base_url'] = request.build_absolute_uri('/')[:-1]
+    return context['base_url'] + file.url
+
 # Caretaker Serializer
 class CaretakerSerializer(serializers.ModelSerializer):
     class Meta:
@@ -177,6 +191,120 @@ class PatientSerializer(serializers.ModelSerializer):
                     raise serializers.ValidationError(f"Note must include {key}")
         return value
 
+class PatientListSerializer(PatientSerializer):
+    """
+    PatientSerializer plus geofence status and next appointment, trimmed to
+    the `fields` the list view selected. The view defers every column the
+    selected fields do not need.
+    """
+    SUMMARY_FIELDS = ['id', 'name', 'photo', 'is_outside_geofence', 'geofence_changed_at', 'next_appointment']
+
+    photo = serializers.SerializerMethodField()
+    is_outside_geofence = serializers.SerializerMethodField()
+    geofence_changed_at = serializers.SerializerMethodField()
+    next_appointment = serializers.SerializerMethodField()
+
+    class Meta(PatientSerializer.Meta):
+        fields = PatientSerializer.Meta.fields + ['is_outside_geofence', 'geofence_changed_at', 'next_appointment']
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def to_representation(self, instance):
+        # Skip PatientSerializer's per-row absolute photo URL; get_photo handles it
+        return serializers.ModelSerializer.to_representation(self, instance)
+
+    def get_photo(self, instance):
+        return media_url(self.context, instance.photo)
+
+    @staticmethod
+    def geofence_state(instance):
+        try:
+            return instance.geofence_state
+        except GeofenceState.DoesNotExist:
+            return None
+
+    def get_is_outside_geofence(self, instance):
+        # None until the patient's first location report has been evaluated
+        state = self.geofence_state(instance)
+        return state.is_outside if state else None
+
+    def get_geofence_changed_at(self, instance):
+        state = self.geofence_state(instance)
+        return serializers.DateTimeField().to_representation(state.changed_at) if state and state.changed_at else None
+
+    def get_next_appointment(self, instance):
+        # PatientListView prefetches these; fall back to a query otherwise
+        if hasattr(instance, 'upcoming_appointments'):
+            upcoming = instance.upcoming_appointments[:1]
+        else:
+            upcoming = instance.patient_appointments.filter(scheduled_at__gte=timezone.now()).order_by('scheduled_at')[:1]
+        if not upcoming:
+            return None
+        return AppointmentSerializer(upcoming[0], context=self.context).data
+
+
+class MedicineSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Medicine
+        fields = ['id', 'patient', 'name', 'dosage', 'frequency', 'updated_at']
+        read_only_fields = fields
+
+
+class AppointmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Appointment
+        fields = ['id', 'patient', 'description', 'date', 'time', 'scheduled_at', 'updated_at']
+        read_only_fields = fields
+
+
+class LocationFixSerializer(serializers.ModelSerializer):
+    timestamp = serializers.DateTimeField(required=False)
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+
+    class Meta:
+        model = LocationFix
+        fields = ['timestamp', 'latitude', 'longitude', 'accuracy']
+
+    def validate_timestamp(self, value):
+        """
+        Ensure the fix is not from the future
+        """
+        if value > timezone.now() + timedelta(minutes=5):
+            raise serializers.ValidationError("Fix timestamp cannot be in the future.")
+        return value
+
+class SafeZoneSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SafeZone
+        fields = ['id', 'name', 'kind', 'center_lat', 'center_long', 'radius', 'polygon', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+    def validate(self, data):
+        """
+        Circles need a center and radius, polygons need at least three vertices
+        """
+        kind = data.get('kind', getattr(self.instance, 'kind', SafeZone.CIRCLE))
+        if kind == SafeZone.CIRCLE:
+            for key in ['center_lat', 'center_long', 'radius']:
+                if data.get(key, getattr(self.instance, key, None)) is None:
+                    raise serializers.ValidationError({key: f"Circle zones must include {key}."})
+            if data.get('radius', getattr(self.instance, 'radius', None)) <= 0:
+                raise serializers.ValidationError({'radius': "Radius must be positive."})
+        else:
+            polygon = data.get('polygon', getattr(self.instance, 'polygon', []))
+            if not isinstance(polygon, list) or len(polygon) < 3:
+                raise serializers.ValidationError({'polygon': "Polygon zones need at least three [lat, long] vertices."})
+            for vertex in polygon:
+                if (not isinstance(vertex, (list, tuple)) or len(vertex) != 2
+                        or not all(isinstance(value, (int, float)) for value in vertex)):
+                    raise serializers.ValidationError({'polygon': "Each vertex must be a [lat, long] pair."})
+        return data
+
 class AssignPatientSerializer(serializers.Serializer):
     patient_username = serializers.CharField(max_length=150)
 
@@ -227,7 +355,7 @@ class NoteSerializer(serializers.ModelSerializer):
         """
         Automatically assign the current patient
         """
-        patient = self.context['request'].user.patient
+        patient = get_profile(self.context['request'].user)
         validated_data['patient'] = patient
         return super().create(validated_data)
     def get_live_location(self, obj):
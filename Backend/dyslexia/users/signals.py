@@ -0,0 +1,77 @@
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from .authentication import invalidate_token
+from .changes import record_change, deleting_patients, VOLATILE_PATIENT_FIELDS
+from .models import BaseUser, ChangeLog, Note, Medicine, Appointment, Patient, caretaker
+
+# Per-patient rows whose changes are offered to the sync endpoint
+SYNCED_MODELS = {
+    Note: ChangeLog.NOTE,
+    Medicine: ChangeLog.MEDICINE,
+    Appointment: ChangeLog.APPOINTMENT,
+}
+
+
+@receiver(post_save)
+def log_saved(sender, instance, **kwargs):
+    resource = SYNCED_MODELS.get(sender)
+    if resource:
+        record_change(instance.patient_id, resource, instance.pk)
+
+
+@receiver(post_delete)
+def log_deleted(sender, instance, **kwargs):
+    resource = SYNCED_MODELS.get(sender)
+    if resource:
+        record_change(instance.patient_id, resource, instance.pk, deleted=True)
+
+
+@receiver(pre_delete, sender=Patient)
+def mark_patient_deleting(sender, instance, **kwargs):
+    # pre_delete runs for every collected object before any row is deleted,
+    # so the cascade's post_delete receivers below see the mark
+    deleting_patients().add(instance.pk)
+
+
+@receiver(post_delete, sender=Patient)
+def unmark_patient_deleting(sender, instance, **kwargs):
+    deleting_patients().discard(instance.pk)
+
+
+@receiver(post_save, sender=Patient)
+def log_patient_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= VOLATILE_PATIENT_FIELDS:
+        return
+    record_change(instance.pk, ChangeLog.PATIENT, instance.pk)
+
+
+@receiver(m2m_changed, sender=caretaker.patients.through)
+def touch_caretaker(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    A caretaker's record lists their patients, so assigning or removing one
+    counts as a change to the caretaker (their updated_at drives the ETag).
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        caretaker_ids = [instance.pk]
+    elif pk_set:
+        caretaker_ids = list(pk_set)
+    else:
+        # patient.caretakers.clear() does not say which caretakers were affected
+        return
+    BaseUser.objects.filter(pk__in=caretaker_ids).update(updated_at=timezone.now())
+
+
+
+@receiver(post_save)
+def drop_cached_tokens(sender, instance, **kwargs):
+    """
+    A deactivated user's cached token must stop authenticating straight away,
+    not when the cache entry expires.
+    """
+    if isinstance(instance, BaseUser) and not instance.is_active:
+        for key in Token.objects.filter(user_id=instance.pk).values_list('key', flat=True):
+            invalidate_token(key)
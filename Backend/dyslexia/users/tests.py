@@ -1,3 +1,742 @@
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from datetime import timedelta
+from importlib import import_module
+from unittest.mock import patch
+from django.apps import apps
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from . import authentication
+from .models import Appointment, BaseUser, ChangeLog, GeofenceEvent, GeofenceState, LocationFix, Medicine, Note, Patient, SafeZone, caretaker
+from .changes import collapse
+from .geofence import (
+    GeofencePopulation, GeofenceTransitionDetector, estimate_speed_mps, haversine_km, next_report_interval,
+    track_fixes,
+)
+from .reminders import ReminderQueue, ReminderScheduler, dose_times
+from .routing import websocket_urlpatterns
+from .views import SyncView
+from .trails import decode_polyline, decode_values, encode_polyline, encode_values, simplify
+from .zones import SafeZoneIndex, Zone, get_patient_index
 
-# Create your tests here.
+
+class PatientDeleteTests(TransactionTestCase):
+    # Outside a test transaction, so foreign keys are checked when the delete commits
+
+    def test_deleting_patient_with_rows_skips_change_log(self):
+        patient = Patient.objects.create_user(email='p@example.com', username='p', password='pw')
+        Note.objects.create(patient=patient, title='Note', description='Text')
+        Medicine.objects.create(patient=patient, name='Aspirin', dosage='75mg', frequency='daily')
+
+        patient.delete()
+
+        self.assertFalse(Patient.objects.exists())
+        self.assertFalse(ChangeLog.objects.exists())
+
+    def test_deleting_note_is_still_logged(self):
+        patient = Patient.objects.create_user(email='p@example.com', username='p', password='pw')
+        note = Note.objects.create(patient=patient, title='Note', description='Text')
+        note_id = note.id
+
+        note.delete()
+
+        self.assertTrue(ChangeLog.objects.filter(object_id=note_id, resource=ChangeLog.NOTE, deleted=True).exists())
+
+
+class DoseTimesTests(TestCase):
+
+    def test_periods_match_whole_words(self):
+        self.assertEqual(dose_times("once in the afternoon"), ['15:00'])
+        self.assertEqual(dose_times("once a fortnight"), [])
+
+    def test_periods_and_counts(self):
+        self.assertEqual(dose_times("morning and night"), ['08:00', '21:00'])
+        self.assertEqual(dose_times("twice a day"), ['09:00', '21:00'])
+
+
+class CaretakerPatientFetchTests(APITestCase):
+
+    def setUp(self):
+        self.caretaker = caretaker.objects.create_user(email='c@example.com', username='c', password='pw')
+        self.patient = Patient.objects.create_user(
+            email='p@example.com', username='p', password='pw',
+            medicines=[{'name': 'Aspirin', 'dosage': '75mg', 'frequency': 'daily'}],
+        )
+        self.caretaker.patients.add(self.patient)
+        self.client.force_authenticate(self.caretaker)
+
+    def test_list_returns_only_requested_fields(self):
+        response = self.client.get('/api/users/patient/', {'fields': 'id,username,email,name,photo'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data[0]), {'id', 'username', 'email', 'name', 'photo'})
+
+    def test_detail_returns_full_record(self):
+        response = self.client.get(f'/api/users/patient/{self.patient.id}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['medicines'][0]['name'], 'Aspirin')
+
+
+class LocationVersionTests(TestCase):
+
+    def test_location_save_increments_stored_version(self):
+        patient = Patient.objects.create_user(email='p@example.com', username='p', password='pw')
+        stale = Patient.objects.get(pk=patient.pk)
+
+        patient.current_coordinates_lat = 1.0
+        patient.save(update_fields=['current_coordinates_lat'])
+        stale.current_coordinates_lat = 2.0
+        stale.save(update_fields=['current_coordinates_lat'])
+
+        self.assertEqual(stale.location_version, 2)
+        self.assertEqual(Patient.objects.get(pk=patient.pk).location_version, 2)
+
+
+class NoteDetailVersionTests(APITestCase):
+
+    def setUp(self):
+        self.patient = Patient.objects.create_user(email='p@example.com', username='p', password='pw')
+        self.note = Note.objects.create(patient=self.patient, title='Keys', description='In the drawer')
+        self.other = Note.objects.create(patient=self.patient, title='Milk', description='Buy some')
+        self.client.force_authenticate(self.patient)
+
+    def test_etag_follows_only_this_note(self):
+        url = f'/api/users/patient/notes/{self.note.id}'
+        etag = self.client.get(url)['ETag']
+
+        self.other.description = 'Buy two'
+        self.other.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.note.description = 'On the hook'
+        self.note.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class AppointmentWithinTests(APITestCase):
+
+    def setUp(self):
+        self.caretaker = caretaker.objects.create_user(email='c@example.com', username='c', password='pw')
+        self.client.force_authenticate(self.caretaker)
+
+    def test_rejects_non_finite_and_out_of_range_values(self):
+        for within in ['inf', 'nan', '1e20', '-5']:
+            with self.subTest(within=within):
+                response = self.client.get('/api/users/appointments/', {'within': within})
+                self.assertEqual(response.status_code, 400)
+
+    def test_accepts_minutes_within_range(self):
+        self.assertEqual(self.client.get('/api/users/appointments/', {'within': '60'}).status_code, 200)
+
+
+class LocationBatchTests(APITestCase):
+
+    def setUp(self):
+        self.patient = Patient.objects.create_user(email='p@example.com', username='p', password='pw')
+        self.client.force_authenticate(self.patient)
+
+    def test_rejects_undated_fixes_in_a_batch(self):
+        fixes = [
+            {'timestamp': '2026-01-01T10:00:00Z', 'latitude': 51.5, 'longitude': -0.1},
+            {'latitude': 51.6, 'longitude': -0.1},
+            {'latitude': 51.7, 'longitude': -0.1},
+        ]
+        response = self.client.post('/api/users/geofence/batch/', {'fixes': fixes}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['undated'], [1, 2])
+        self.assertFalse(LocationFix.objects.exists())
+
+    def test_single_undated_fix_is_stamped_now(self):
+        response = self.client.post('/api/users/geofence/batch/', {'fixes': [{'latitude': 51.5, 'longitude': -0.1}]}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(LocationFix.objects.count(), 1)
+
+    def test_resent_batch_does_not_repeat_crossings(self):
+        self.patient.center_coordinates_lat = 51.5
+        self.patient.center_coordinates_long = -0.1
+        self.patient.radius = 1.0
+        self.patient.save()
+        fixes = [
+            {'timestamp': '2026-01-01T10:00:00Z', 'latitude': 51.5, 'longitude': -0.1},
+            {'timestamp': '2026-01-01T10:01:00Z', 'latitude': 51.6, 'longitude': -0.1},
+            {'timestamp': '2026-01-01T10:05:00Z', 'latitude': 51.6, 'longitude': -0.1},
+            {'timestamp': '2026-01-01T10:06:00Z', 'latitude': 51.5, 'longitude': -0.1},
+            {'timestamp': '2026-01-01T10:10:00Z', 'latitude': 51.5, 'longitude': -0.1},
+            {'timestamp': '2026-01-01T10:10:00Z', 'latitude': 51.5, 'longitude': -0.1},
+        ]
+        first = self.client.post('/api/users/geofence/batch/', {'fixes': fixes}, format='json')
+        resent = self.client.post('/api/users/geofence/batch/', {'fixes': fixes}, format='json')
+
+        self.assertEqual(first.data['geofence_event'], GeofenceEvent.ENTER)
+        self.assertEqual(resent.status_code, 201)
+        self.assertIsNone(resent.data['geofence_event'])
+        self.assertFalse(resent.data['is_outside_geofence'])
+        self.assertEqual(LocationFix.objects.count(), 5)
+        self.assertEqual(
+            list(GeofenceEvent.objects.order_by('timestamp').values_list('kind', flat=True)),
+            [GeofenceEvent.EXIT, GeofenceEvent.ENTER]
+        )
+
+
+class PatientLocationConsumerTests(TransactionTestCase):
+    # Consumers query from another thread, which can't see a test transaction
+
+    def setUp(self):
+        self.caretaker = caretaker.objects.create_user(email='c@example.com', username='c', password='pw')
+        self.patient = Patient.objects.create_user(
+            email='p@example.com', username='p', password='pw',
+            current_coordinates_lat=51.5, current_coordinates_long=-0.1,
+            center_coordinates_lat=51.5, center_coordinates_long=-0.1, radius=1.0,
+        )
+        self.caretaker.patients.add(self.patient)
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/patient/{self.patient.id}/location/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def test_connect_sends_current_location(self):
+        communicator, connected = await self.connect(self.caretaker)
+
+        self.assertTrue(connected)
+        snapshot = await communicator.receive_json_from()
+        self.assertEqual(snapshot['current_coordinates_lat'], 51.5)
+        self.assertFalse(snapshot['is_outside_geofence'])
+        await communicator.disconnect()
+
+    async def test_rejects_other_caretakers(self):
+        stranger = await sync_to_async(caretaker.objects.create_user)(email='s@example.com', username='s', password='pw')
+        communicator, connected = await self.connect(stranger)
+
+        self.assertFalse(connected)
+
+
+class PatientStatusZoneTests(APITestCase):
+
+    def setUp(self):
+        self.caretaker = caretaker.objects.create_user(email='c@example.com', username='c', password='pw')
+        # About 11km north of home, inside the day centre zone
+        self.patient = Patient.objects.create_user(
+            email='p@example.com', username='p', password='pw',
+            center_coordinates_lat=51.5, center_coordinates_long=-0.1, radius=1.0,
+            current_coordinates_lat=51.6, current_coordinates_long=-0.1,
+        )
+        SafeZone.objects.create(
+            patient=self.patient, name='Day centre', kind=SafeZone.CIRCLE,
+            center_lat=51.6, center_long=-0.1, radius=0.5,
+        )
+        self.caretaker.patients.add(self.patient)
+        self.client.force_authenticate(self.caretaker)
+
+    def test_status_list_agrees_with_location_view(self):
+        status_entry = self.client.get('/api/users/patient/status/').data[0]
+        location = self.client.get(f'/api/users/patient/{self.patient.id}/location/').data
+
+        self.assertFalse(status_entry['is_outside_geofence'])
+        self.assertFalse(location['is_outside_geofence'])
+        self.assertEqual(location['zone'], 'Day centre')
+
+    def test_distance_from_center_is_to_home(self):
+        location = self.client.get(f'/api/users/patient/{self.patient.id}/location/').data
+
+        self.assertAlmostEqual(location['distance_from_center'], 11.1, delta=0.2)
+
+
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared'},
+    'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'local-fallback'},
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CachedTokenAuthenticationTests(APITestCase):
+
+    def setUp(self):
+        for alias in LOCAL_CACHES:
+            caches[alias].clear()
+        self.caretaker = caretaker.objects.create_user(email='c@example.com', username='c', password='pw')
+        self.token = Token.objects.create(user=self.caretaker)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        # Cache the token
+        self.assertEqual(self.client.get('/api/users/caretaker/').status_code, 200)
+
+    def tearDown(self):
+        authentication._fallback_until = 0.0
+
+    def test_sign_out_invalidates_cached_token(self):
+        self.assertEqual(self.client.get('/api/users/logout/').status_code, 200)
+
+        self.assertEqual(self.client.get('/api/users/caretaker/').status_code, 401)
+
+    def test_deactivated_user_loses_access(self):
+        self.caretaker.is_active = False
+        self.caretaker.save()
+
+        self.assertEqual(self.client.get('/api/users/caretaker/').status_code, 401)
+
+    def test_cached_inactive_user_is_rejected(self):
+        cache_key = authentication.token_cache_key(self.token.key)
+        values = caches['default'].get(cache_key)
+        values[authentication.CACHED_USER_FIELDS.index('is_active')] = False
+        caches['default'].set(cache_key, values)
+
+        self.assertEqual(self.client.get('/api/users/caretaker/').status_code, 401)
+
+    def test_invalidate_reaches_shared_cache_during_fallback(self):
+        authentication._fallback_until = float('inf')
+
+        authentication.invalidate_token(self.token.key)
+
+        self.assertIsNone(caches['default'].get(authentication.token_cache_key(self.token.key)))
+
+
+class ReminderQueueTests(SimpleTestCase):
+
+    def test_pops_due_reminders_in_time_order(self):
+        queue = ReminderQueue()
+        queue.schedule('c', 30, 'third')
+        queue.schedule('a', 10, 'first')
+        queue.schedule('b', 20, 'second')
+
+        self.assertEqual(queue.pop_due(25), [('a', 'first'), ('b', 'second')])
+        self.assertEqual(queue.next_due(), 30)
+
+    def test_reschedule_and_cancel(self):
+        queue = ReminderQueue()
+        queue.schedule('a', 10, 'old')
+        queue.schedule('b', 20, 'b')
+        queue.schedule('a', 40, 'new')
+        queue.cancel('b')
+
+        self.assertEqual(queue.pop_due(30), [])
+        self.assertEqual(queue.pop_due(40), [('a', 'new')])
+        self.assertEqual(len(queue), 0)
+
+
+class ReminderSchedulerTests(TestCase):
+
+    def setUp(self):
+        self.patient = Patient.objects.create_user(email='p@example.com', username='p', password='pw')
+        self.now = timezone.now()
+
+    def test_reload_replaces_a_patients_reminders(self):
+        medicine = Medicine.objects.create(patient=self.patient, name='Aspirin', dosage='75mg', frequency='twice a day')
+        scheduler = ReminderScheduler(lead=30)
+        scheduler.load(now=self.now)
+        self.assertEqual(len(scheduler), 2)
+
+        medicine.frequency = 'at night'
+        medicine.save()
+        Appointment.objects.create(
+            patient=self.patient, description='GP', date='2030-01-01', time='10:00',
+            scheduled_at=self.now + timedelta(days=1),
+        )
+        scheduler.reload_patient(self.patient.id, now=self.now)
+
+        self.assertEqual(len(scheduler), 2)
+        due = scheduler.pop_due(self.now + timedelta(days=2))
+        self.assertEqual(sorted(reminder['kind'] for reminder in due), ['appointment', 'medicine'])
+        self.assertEqual([reminder['dose_time'] for reminder in due if reminder['kind'] == 'medicine'], ['21:00'])
+
+
+class RunRemindersCommandTests(SimpleTestCase):
+
+    def test_refuses_in_memory_channel_layer(self):
+        with self.assertRaises(CommandError):
+            call_command('run_reminders')
+
+
+class NoteKeysetPaginationTests(APITestCase):
+
+    def setUp(self):
+        self.patient = Patient.objects.create_user(email='p@example.com', username='p', password='pw')
+        self.notes = [Note.objects.create(patient=self.patient, title=f'Note {i}', description='Text') for i in range(5)]
+        self.client.force_authenticate(self.patient)
+
+    def test_follows_cursor_across_pages(self):
+        seen = []
+        url = '/api/users/patient/notes/?page_size=2'
+        while url:
+            page = self.client.get(url).data
+            seen += [note['id'] for note in page['results']]
+            url = page['next']
+
+        self.assertEqual(seen, [note.id for note in reversed(self.notes)])
+
+    def test_bad_cursor_is_not_found(self):
+        for cursor in ['not-a-cursor', 'WzEsMl0=']:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get('/api/users/patient/notes/', {'cursor': cursor}).status_code, 404)
+
+
+class GeofencePopulationTests(SimpleTestCase):
+
+    def test_evaluates_every_patient_in_one_pass(self):
+        rows = [
+            (1, 51.5, -0.1, 1.0, 51.5, -0.1),    # at home
+            (2, 51.5, -0.1, 1.0, 51.6, -0.1),    # ~11km away
+            (3, None, None, 5.0, 51.5, -0.1),    # no centre
+            (4, 51.5, -0.1, 5.0, None, None),    # no fix yet
+        ]
+        statuses = GeofencePopulation.from_rows(rows).evaluate().as_dict()
+
+        self.assertFalse(statuses[1]['is_outside_geofence'])
+        self.assertTrue(statuses[2]['is_outside_geofence'])
+        self.assertAlmostEqual(statuses[2]['distance_from_center'], 11.1, delta=0.2)
+        self.assertIsNone(statuses[3]['is_outside_geofence'])
+        self.assertIsNone(statuses[4]['distance_from_center'])
+
+    def test_outside_ids_and_empty_population(self):
+        rows = [(1, 51.5, -0.1, 1.0, 51.5, -0.1), (2, 51.5, -0.1, 1.0, 52.5, -0.1)]
+        self.assertEqual(GeofencePopulation.from_rows(rows).evaluate().outside_ids, [2])
+        self.assertEqual(GeofencePopulation.from_rows([]).evaluate().as_dict(), {})
+
+    def test_haversine_matches_known_distance(self):
+        # London to Paris is about 344km
+        self.assertAlmostEqual(float(haversine_km(51.5074, -0.1278, 48.8566, 2.3522)), 343.5, delta=1.0)
+
+
+class GeofenceTransitionDetectorTests(SimpleTestCase):
+
+    def setUp(self):
+        self.detector = GeofenceTransitionDetector(margin_km=0.05, dwell_seconds=30)
+        self.state = GeofenceState()
+        self.start = timezone.now()
+
+    def observe(self, edge_km, seconds):
+        return self.detector.observe(self.state, edge_km, self.start + timedelta(seconds=seconds))
+
+    def test_first_fix_sets_state_and_alerts_only_if_outside(self):
+        self.assertIsNone(self.observe(0.5, 0))
+        self.assertFalse(self.state.is_outside)
+
+        outside = GeofenceState()
+        self.assertEqual(self.detector.observe(outside, -0.5, self.start), GeofenceEvent.EXIT)
+
+    def test_fixes_inside_the_margin_band_are_ignored(self):
+        self.observe(0.5, 0)
+        for seconds in range(0, 300, 10):
+            self.assertIsNone(self.observe(-0.04, seconds))
+        self.assertFalse(self.state.is_outside)
+
+    def test_exit_is_confirmed_after_dwell(self):
+        self.observe(0.5, 0)
+
+        self.assertIsNone(self.observe(-0.2, 10))
+        self.assertIsNone(self.observe(-0.2, 30))
+        self.assertEqual(self.observe(-0.2, 40), GeofenceEvent.EXIT)
+        self.assertTrue(self.state.is_outside)
+        self.assertIsNone(self.observe(-0.3, 50))
+
+    def test_brief_excursion_does_not_fire(self):
+        self.observe(0.5, 0)
+
+        self.assertIsNone(self.observe(-0.2, 10))
+        self.assertIsNone(self.observe(0.2, 20))
+        # The dwell restarts after returning inside
+        self.assertIsNone(self.observe(-0.2, 45))
+        self.assertIsNone(self.observe(-0.2, 60))
+        self.assertEqual(self.observe(-0.2, 75), GeofenceEvent.EXIT)
+
+
+class TrackFixesTests(TestCase):
+
+    def test_persists_state_and_confirmed_events(self):
+        patient = Patient.objects.create_user(
+            email='p@example.com', username='p', password='pw',
+            center_coordinates_lat=51.5, center_coordinates_long=-0.1, radius=1.0,
+        )
+        start = timezone.now() - timedelta(minutes=5)
+        fixes = [
+            LocationFix(patient=patient, timestamp=start + timedelta(seconds=seconds), latitude=latitude, longitude=-0.1)
+            for seconds, latitude in [(0, 51.5), (10, 51.6), (60, 51.6)]
+        ]
+
+        state, events = track_fixes(patient, fixes, GeofenceTransitionDetector(margin_km=0.05, dwell_seconds=30))
+
+        self.assertTrue(state.is_outside)
+        self.assertEqual([event.kind for event in events], [GeofenceEvent.EXIT])
+        self.assertEqual(GeofenceEvent.objects.filter(patient=patient).count(), 1)
+        self.assertTrue(GeofenceState.objects.get(patient=patient).is_outside)
+
+
+class SafeZoneIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.home = Zone(None, 'Home', SafeZone.CIRCLE, center_lat=51.5, center_long=-0.1, radius=1.0)
+        self.park = Zone(1, 'Park', SafeZone.POLYGON, polygon=[
+            [51.52, -0.13], [51.52, -0.11], [51.54, -0.11], [51.54, -0.13],
+        ])
+        self.index = SafeZoneIndex([self.home, self.park])
+
+    def test_point_inside_a_circle(self):
+        check = self.index.locate(51.5, -0.1)
+        self.assertIs(check.zone, self.home)
+        self.assertTrue(check.inside)
+        self.assertAlmostEqual(check.edge_distance_km, 1.0, places=3)
+
+    def test_point_inside_a_polygon(self):
+        check = self.index.locate(51.53, -0.12)
+        self.assertIs(check.zone, self.park)
+        self.assertTrue(check.inside)
+        self.assertGreater(check.edge_distance_km, 0)
+
+    def test_point_outside_uses_the_nearest_edge(self):
+        check = self.index.locate(51.5, -0.07)
+        self.assertIs(check.zone, self.home)
+        self.assertFalse(check.inside)
+        self.assertAlmostEqual(check.edge_distance_km, 1.0 - check.center_distance_km, places=6)
+
+    def test_far_point_falls_back_to_bounding_boxes(self):
+        check = self.index.locate(48.85, 2.35)
+        self.assertFalse(check.inside)
+        self.assertLess(check.edge_distance_km, -300)
+
+    def test_no_zones(self):
+        self.assertIsNone(SafeZoneIndex([]).locate(51.5, -0.1))
+
+
+class PatientIndexCacheTests(TestCase):
+
+    def setUp(self):
+        self.patient = Patient.objects.create_user(
+            email='zones@example.com', username='zones', password='pw',
+            center_coordinates_lat=51.5, center_coordinates_long=-0.1, radius=1.0,
+        )
+
+    def test_index_is_reused_until_zones_change(self):
+        index = get_patient_index(self.patient)
+        self.assertEqual(len(index), 1)
+        self.assertIs(get_patient_index(self.patient), index)
+
+        SafeZone.objects.create(patient=self.patient, name='Park', center_lat=51.6, center_long=-0.1, radius=0.5)
+        self.patient.refresh_from_db()
+
+        rebuilt = get_patient_index(self.patient)
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(len(rebuilt), 2)
+        self.assertTrue(rebuilt.locate(51.6, -0.1).inside)
+
+
+@override_settings(GEOFENCE_REPORT_MIN_SECONDS=5, GEOFENCE_REPORT_MAX_SECONDS=300, GEOFENCE_MIN_SPEED_MPS=1.4)
+class ReportIntervalTests(SimpleTestCase):
+
+    def test_outside_unknown_or_pending_reports_at_the_minimum(self):
+        self.assertEqual(next_report_interval(None), 5)
+        self.assertEqual(next_report_interval(-0.2, 1.0), 5)
+        self.assertEqual(next_report_interval(5.0, 1.0, crossing_pending=True), 5)
+
+    def test_interval_is_half_the_time_to_the_edge(self):
+        # 0.28km at 1.4m/s is 200s away
+        self.assertEqual(next_report_interval(0.28, 1.4), 100)
+        # Faster movement shortens the wait
+        self.assertEqual(next_report_interval(0.28, 14.0), 10)
+
+    def test_interval_is_clamped(self):
+        self.assertEqual(next_report_interval(0.001, 30.0), 5)
+        self.assertEqual(next_report_interval(50.0, 1.0), 300)
+
+    def test_slow_or_missing_speed_uses_walking_pace(self):
+        self.assertEqual(next_report_interval(0.28, None), 100)
+        self.assertEqual(next_report_interval(0.28, 0.1), 100)
+
+    def test_estimate_speed(self):
+        start = timezone.now()
+        latest = (start + timedelta(seconds=100), 51.509, -0.1)
+        speed = estimate_speed_mps((start, 51.5, -0.1), latest)
+        self.assertAlmostEqual(speed, 10.0, delta=0.1)
+        self.assertIsNone(estimate_speed_mps(None, latest))
+        self.assertIsNone(estimate_speed_mps(latest, latest))
+
+
+class TrailEncodingTests(SimpleTestCase):
+
+    def test_matches_the_reference_polyline(self):
+        points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+        encoded = encode_polyline(points)
+        self.assertEqual(encoded, '_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+        self.assertEqual(decode_polyline(encoded), points)
+
+    def test_round_trip_keeps_five_decimal_places(self):
+        points = [(51.501234, -0.141234), (51.501299, -0.141188), (-33.868820, 151.209296)]
+        for (lat, lon), (decoded_lat, decoded_lon) in zip(points, decode_polyline(encode_polyline(points))):
+            self.assertAlmostEqual(lat, decoded_lat, places=5)
+            self.assertAlmostEqual(lon, decoded_lon, places=5)
+
+    def test_values_round_trip(self):
+        values = [0, 1, -1, 31, -32, 86400, -86400]
+        self.assertEqual(decode_values(encode_values(values)), values)
+
+
+class TrailSimplifyTests(SimpleTestCase):
+
+    def test_drops_points_within_tolerance(self):
+        # About 5m of sideways jitter along a straight 1km walk north
+        points = [(51.5 + i * 0.0009, -0.1 + (0.00007 if i % 2 else 0)) for i in range(11)]
+        self.assertEqual(simplify(points, tolerance_m=10), [0, 10])
+        self.assertEqual(simplify(points, tolerance_m=1), list(range(11)))
+
+    def test_keeps_corners(self):
+        points = [(51.5, -0.1), (51.505, -0.1), (51.51, -0.1), (51.51, -0.09), (51.51, -0.08)]
+        self.assertEqual(simplify(points), [0, 2, 4])
+
+    def test_short_trails_are_kept(self):
+        self.assertEqual(simplify([]), [])
+        self.assertEqual(simplify([(51.5, -0.1), (51.6, -0.1)]), [0, 1])
+
+
+class RoleBackfillTests(TestCase):
+
+    def test_backfill_sets_role_from_the_child_table(self):
+        carer = caretaker.objects.create_user(email='c@example.com', username='c', password='pw')
+        patient = Patient.objects.create_user(email='p@example.com', username='p', password='pw')
+        BaseUser.objects.update(role='')
+
+        migration = import_module('users.migrations.0006_baseuser_role')
+        migration.backfill_roles(apps, None)
+
+        self.assertEqual(BaseUser.objects.get(pk=carer.pk).role, BaseUser.CARETAKER)
+        self.assertEqual(BaseUser.objects.get(pk=patient.pk).role, BaseUser.PATIENT)
+
+
+class ChangeCollapseTests(SimpleTestCase):
+
+    def test_keeps_the_last_action_per_object(self):
+        entries = [
+            ChangeLog(resource=ChangeLog.NOTE, object_id=1, deleted=False),
+            ChangeLog(resource=ChangeLog.NOTE, object_id=2, deleted=False),
+            ChangeLog(resource=ChangeLog.NOTE, object_id=1, deleted=True),
+            ChangeLog(resource=ChangeLog.MEDICINE, object_id=1, deleted=False),
+        ]
+        self.assertEqual(collapse(entries), {
+            ChangeLog.NOTE: {1: True, 2: False},
+            ChangeLog.MEDICINE: {1: False},
+        })
+
+
+class SyncViewTests(APITestCase):
+    url = '/api/users/sync/'
+
+    def setUp(self):
+        self.patient = Patient.objects.create_user(email='p@example.com', username='p', password='pw')
+        self.client.force_authenticate(self.patient)
+
+    def sync(self, since=None):
+        response = self.client.get(self.url, {} if since is None else {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_returns_changes_since_the_cursor(self):
+        cursor = self.sync()['cursor']
+        kept = Note.objects.create(patient=self.patient, title='Kept', description='Text')
+        removed = Note.objects.create(patient=self.patient, title='Removed', description='Text')
+        kept.title = 'Edited'
+        kept.save()
+        removed_id = removed.id
+        removed.delete()
+
+        data = self.sync(cursor)
+        notes = data['changes']['notes']
+        self.assertEqual([note['title'] for note in notes['updated']], ['Edited'])
+        self.assertEqual(notes['deleted'], [removed_id])
+        self.assertFalse(data['has_more'])
+
+        # Nothing new past the returned cursor
+        self.assertEqual(self.sync(data['cursor']), {'cursor': data['cursor'], 'has_more': False, 'changes': {}})
+
+    def test_pages_with_has_more(self):
+        cursor = self.sync()['cursor']
+        for i in range(3):
+            Note.objects.create(patient=self.patient, title=f'Note {i}', description='Text')
+
+        with patch.object(SyncView, 'max_changes', 2):
+            first = self.sync(cursor)
+            second = self.sync(first['cursor'])
+
+        self.assertTrue(first['has_more'])
+        self.assertEqual(len(first['changes']['notes']['updated']), 2)
+        self.assertFalse(second['has_more'])
+        self.assertEqual([note['title'] for note in second['changes']['notes']['updated']], ['Note 2'])
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get(self.url, {'since': 'abc'}).status_code, 400)
+
+
+class ConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        self.caretaker = caretaker.objects.create_user(email='c@example.com', username='c', password='pw')
+        self.patient = Patient.objects.create_user(
+            email='p@example.com', username='p', password='pw', name='Pat',
+            center_coordinates_lat=51.5, center_coordinates_long=-0.1, radius=1.0,
+            current_coordinates_lat=51.5, current_coordinates_long=-0.1,
+        )
+        self.caretaker.patients.add(self.patient)
+        self.client.force_authenticate(self.caretaker)
+
+    def assertRevalidates(self, url, change):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], etag)
+
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_patient_list(self):
+        def rename():
+            self.patient.name = 'Renamed'
+            self.patient.save()
+
+        self.assertRevalidates('/api/users/patient/', rename)
+
+    def test_patient_location(self):
+        def move():
+            self.patient.current_coordinates_lat = 51.6
+            self.patient.save(update_fields=['current_coordinates_lat'])
+
+        self.assertRevalidates(f'/api/users/patient/{self.patient.id}/location/', move)
+
+    def test_etag_is_per_user(self):
+        url = '/api/users/patient/'
+        etag = self.client.get(url)['ETag']
+        other = caretaker.objects.create_user(email='o@example.com', username='o', password='pw')
+        other.patients.add(self.patient)
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class PatientListFieldsTests(APITestCase):
+    url = '/api/users/patient/'
+
+    def setUp(self):
+        self.caretaker = caretaker.objects.create_user(email='c@example.com', username='c', password='pw')
+        self.patient = Patient.objects.create_user(email='p@example.com', username='p', password='pw', name='Pat')
+        self.caretaker.patients.add(self.patient)
+        self.client.force_authenticate(self.caretaker)
+
+    def test_selects_requested_fields(self):
+        response = self.client.get(self.url, {'fields': 'id,name'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0], {'id': self.patient.id, 'name': 'Pat'})
+
+    def test_unknown_fields_are_rejected(self):
+        for fields in ['nope', 'id,nope,password']:
+            with self.subTest(fields=fields):
+                response = self.client.get(self.url, {'fields': fields})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('nope', response.data['error'])
@@ -0,0 +1,199 @@
+"""
+Movement trail compaction.
+
+A day of raw 10-second fixes is simplified with Douglas-Peucker and stored
+as an encoded polyline: coordinates are delta-encoded, zigzagged and
+written as 5-bit varint chunks (Google's Encoded Polyline Algorithm, which
+map clients can decode directly). Timestamps get the same treatment as
+second offsets from the start of the trail.
+"""
+import math
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from .models import LocationFix, LocationTrail
+
+POLYLINE_PRECISION = 5
+DEFAULT_TOLERANCE_M = 10.0
+EARTH_RADIUS_M = 6371008.8
+
+
+def simplify(points, tolerance_m=DEFAULT_TOLERANCE_M):
+    """
+    Douglas-Peucker over (lat, long) points. Returns the indexes to keep.
+    Distances are measured on a local equirectangular projection in meters.
+    """
+    if len(points) <= 2:
+        return list(range(len(points)))
+
+    ref_lat = math.radians(sum(lat for lat, _ in points) / len(points))
+    kx = math.radians(1) * EARTH_RADIUS_M * math.cos(ref_lat)
+    ky = math.radians(1) * EARTH_RADIUS_M
+    xy = [(lon * kx, lat * ky) for lat, lon in points]
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    # Iterative to stay clear of the recursion limit on long days
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = xy[first]
+        bx, by = xy[last]
+        dx, dy = bx - ax, by - ay
+        length = math.hypot(dx, dy)
+
+        worst_index, worst_distance = None, tolerance_m
+        for i in range(first + 1, last):
+            px, py = xy[i]
+            if length == 0:
+                d = math.hypot(px - ax, py - ay)
+            else:
+                d = abs(dy * (px - ax) - dx * (py - ay)) / length
+            if d > worst_distance:
+                worst_index, worst_distance = i, d
+
+        if worst_index is not None:
+            keep[worst_index] = True
+            stack.append((first, worst_index))
+            stack.append((worst_index, last))
+
+    return [i for i, kept in enumerate(keep) if kept]
+
+
+def encode_values(values):
+    """
+    Encode a sequence of integers as zigzagged 5-bit varint chunks.
+    """
+    chunks = []
+    for value in values:
+        value = ~(value << 1) if value < 0 else value << 1
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return ''.join(chunks)
+
+
+def decode_values(encoded):
+    values = []
+    value = shift = 0
+    for char in encoded:
+        byte = ord(char) - 63
+        value |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    return values
+
+
+def deltas(values):
+    previous = 0
+    for value in values:
+        yield value - previous
+        previous = value
+
+
+def encode_polyline(points, precision=POLYLINE_PRECISION):
+    """
+    Encode (lat, long) points as a Google encoded polyline.
+    """
+    factor = 10 ** precision
+    flat = []
+    previous_lat = previous_lon = 0
+    for lat, lon in points:
+        lat, lon = round(lat * factor), round(lon * factor)
+        flat.extend((lat - previous_lat, lon - previous_lon))
+        previous_lat, previous_lon = lat, lon
+    return encode_values(flat)
+
+
+def decode_polyline(encoded, precision=POLYLINE_PRECISION):
+    factor = 10 ** precision
+    values = decode_values(encoded)
+    points = []
+    lat = lon = 0
+    for i in range(0, len(values), 2):
+        lat += values[i]
+        lon += values[i + 1]
+        points.append((lat / factor, lon / factor))
+    return points
+
+
+def day_bounds(day):
+    """
+    Start and end of a local calendar day as aware datetimes.
+    """
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def decode_trail(trail):
+    """
+    Decode a stored trail back into (timestamp, lat, long) points.
+    """
+    offsets = []
+    total = 0
+    for delta in decode_values(trail.timestamps):
+        total += delta
+        offsets.append(total)
+    return [
+        (trail.start_time + timedelta(seconds=offset), lat, lon)
+        for offset, (lat, lon) in zip(offsets, decode_polyline(trail.polyline))
+    ]
+
+
+def build_trail(patient_id, day, tolerance_m=DEFAULT_TOLERANCE_M, previous=None):
+    """
+    Build an unsaved LocationTrail from a patient's raw fixes for one day,
+    or None if there are no fixes. A previous trail whose raw fixes were
+    pruned is merged back in, so late uploads don't replace it.
+    """
+    start, end = day_bounds(day)
+    rows = list(
+        LocationFix.objects.filter(patient_id=patient_id, timestamp__gte=start, timestamp__lt=end)
+        .order_by('timestamp')
+        .values_list('timestamp', 'latitude', 'longitude')
+    )
+    if not rows:
+        return None
+
+    raw_point_count = len(rows)
+    if previous is not None and previous.pruned:
+        raw_point_count += previous.raw_point_count
+        rows = sorted(decode_trail(previous) + rows, key=lambda row: row[0])
+
+    kept = [rows[i] for i in simplify([(lat, lon) for _, lat, lon in rows], tolerance_m)]
+    start_time = kept[0][0]
+    offsets = [int((timestamp - start_time).total_seconds()) for timestamp, _, _ in kept]
+
+    return LocationTrail(
+        patient_id=patient_id,
+        date=day,
+        start_time=start_time,
+        polyline=encode_polyline([(lat, lon) for _, lat, lon in kept]),
+        timestamps=encode_values(deltas(offsets)),
+        point_count=len(kept),
+        raw_point_count=raw_point_count,
+        tolerance_m=tolerance_m,
+        pruned=previous is not None and previous.pruned,
+    )
+
+
+def compact_day(patient_id, day, tolerance_m=DEFAULT_TOLERANCE_M, prune=False):
+    """
+    Build and store a patient's trail for one day. With prune, the raw
+    fixes for that day are deleted once the trail is saved.
+    """
+    previous = LocationTrail.objects.filter(patient_id=patient_id, date=day).first()
+    trail = build_trail(patient_id, day, tolerance_m, previous)
+    if trail is None:
+        return previous
+
+    trail.pk = previous.pk if previous else None
+    trail.pruned = trail.pruned or prune
+    trail.save()
+
+    if prune:
+        start, end = day_bounds(day)
+        LocationFix.objects.filter(patient_id=patient_id, timestamp__gte=start, timestamp__lt=end).delete()
+    return trail
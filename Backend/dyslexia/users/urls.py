@@ -7,12 +7,20 @@ urlpatterns = [
     path('logout/', views.SignOutView.as_view(), name='logout'),  # User logout
     path('assign/', views.AssignPatientView.as_view(), name='assign'),  # Assign patient to caretaker
     path('patient/', views.PatientListView.as_view(), name='patient-list'),  # List patients for caretaker
+    path('patient/status/', views.PatientStatusListView.as_view(), name='patient-status'),  # Geofence status of all patients
     path('caretaker/', views.CaretakerDetailView.as_view(), name='caretaker-detail'),  # Caretaker detail
-    path('patient/<int:pk>/', views.UpdatePatientDetailsView.as_view(), name='update-patient'), 
+    path('patient/<int:pk>/', views.UpdatePatientDetailsView.as_view(), name='update-patient'),  # Full record and updates
     path('patient/notes/', views.NoteListCreateView.as_view(), name='update-patient'),
     path('patient/notes/<int:pk>', views.NoteDetailView.as_view(), name='update-patient'), 
     path('geofence/', views.GeofenceView.as_view(), name='geofence'),  # Geofence view for patients
+    path('geofence/batch/', views.LocationBatchView.as_view(), name='geofence-batch'),  # Buffered location fixes
     path('patient/<int:patient_id>/location/', views.PatientLocationView.as_view(), name='patient-location'), 
+    path('patient/<int:patient_id>/trail/', views.PatientTrailView.as_view(), name='patient-trail'),  # Day's movement trail
+    path('patient/<int:patient_id>/zones/', views.SafeZoneListCreateView.as_view(), name='patient-zones'),  # Patient safe zones
+    path('sync/', views.SyncView.as_view(), name='sync'),  # Changes since a cursor
+    path('medicines/', views.MedicineListView.as_view(), name='medicine-list'),  # Paged, filterable medicines
+    path('appointments/', views.AppointmentListView.as_view(), name='appointment-list'),  # Paged, filterable appointments
+    path('patient/<int:patient_id>/zones/<int:pk>/', views.SafeZoneDetailView.as_view(), name='patient-zone-detail'),
     # Get patient location
     
 ]
\ No newline at end of file
@@ -1,17 +1,34 @@
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.exceptions import NotFound, ValidationError
 from django.contrib.auth import login, authenticate
-from .serializers import SignUpSerializer,NoteSerializer, LoginSerializer, PatientSerializer, CaretakerSerializer, AssignPatientSerializer,SignOutSerializer
-from .models import caretaker, Patient,Note
+from django.utils import timezone
+from .serializers import SignUpSerializer,NoteSerializer, LoginSerializer, PatientSerializer, CaretakerSerializer, AssignPatientSerializer,SignOutSerializer, LocationFixSerializer, SafeZoneSerializer, PatientListSerializer, MedicineSerializer, AppointmentSerializer
+from .models import BaseUser, caretaker, Patient,Note, LocationFix, SafeZone, LocationTrail, Medicine, Appointment, ChangeLog
+from .changes import collapse
+from contacts.models import Contact
+from contacts.serializers import ContactSerializer
+from .roles import get_role, get_profile
+from .authentication import invalidate_token
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from users.permissions import Iscaretaker, IsPatient
 from .permissions import IsCaretakerOrReadOnlyForCenter
+from .realtime import build_location_payload, publish_location, publish_geofence_event, request_reminder_reload
+from .geofence import GeofencePopulation, POPULATION_FIELDS, track_fixes, estimate_speed_mps, next_report_interval
+from .trails import build_trail, POLYLINE_PRECISION
+from .zones import get_patient_index
+from .schedule import sync_patient_schedule
+from .pagination import StandardPagination, KeysetPagination
+from .conditional import conditional_get, queryset_version
+from django.db.models import Prefetch, Count, Sum, Max, Q
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta
+from datetime import date
 import logging
-import geopy
-from geopy.distance import distance
+import math
 
 logger = logging.getLogger(__name__)
 # View to handle user registration (Sign Up)
@@ -51,44 +68,22 @@ class LoginView(generics.GenericAPIView):
     permission_classes = [AllowAny]
 
     def post(self, request, *args, **kwargs):
+        # LoginSerializer.validate authenticates the user and checks the role,
+        # so the password is only hashed once per login
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        
-        user = authenticate(
-            username=serializer.validated_data['username'],
-            password=serializer.validated_data['password']
-        )
-        
-        if user is not None:
-            # Determine user type
-            user_type = None
-            if hasattr(user, 'caretaker') and isinstance(user.caretaker, caretaker):
-                user_type = 'caretaker'
-            elif hasattr(user, 'patient') and isinstance(user.patient, Patient):
-                user_type = 'patient'
-            
-            # Ensure user is either a caretaker or patient
-            if user_type is None:
-                return Response(
-                    {"error": "Invalid user type. Only caretakers and patients can log in."},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            
-            # Generate or retrieve token
-            token, created = Token.objects.get_or_create(user=user)
-            
-            return Response({
-                'message': "Logged in successfully",
-                'token': token.key,
-                'user_id': user.pk,
-                'email': user.email,
-                'user_type': user_type
-            }, status=status.HTTP_200_OK)
-        else:
-            return Response(
-                {"error": "Invalid credentials"}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        user = serializer.validated_data['user']
+
+        # Generate or retrieve token
+        token, created = Token.objects.get_or_create(user=user)
+
+        return Response({
+            'message': "Logged in successfully",
+            'token': token.key,
+            'user_id': user.pk,
+            'email': user.email,
+            'user_type': user.role
+        }, status=status.HTTP_200_OK)
 
 
 class SignOutView(generics.GenericAPIView):
@@ -102,7 +97,9 @@ class SignOutView(generics.GenericAPIView):
         try:
             # Get the token associated with the authenticated user
             token = Token.objects.get(user=request.user)
+            key = token.key
             token.delete()  # Delete the token to log out
+            invalidate_token(key)
             logger.debug(f"Token for user {request.user} deleted.")
             return Response({"message": "Successfully logged out."}, status=status.HTTP_200_OK)
         except Token.DoesNotExist:
@@ -146,28 +143,109 @@ class AssignPatientView(generics.GenericAPIView):
             )
 
 class PatientListView(generics.ListAPIView):
+    """
+    Caretakers get a summary row per patient (id, name, photo, geofence
+    status, next appointment); a patient gets their own full record.
+
+    ?expand=medicines,appointments adds fields to the summary, ?expand=all
+    returns every field, and ?fields=id,name,... picks fields explicitly.
+    """
     permission_classes = [IsAuthenticated]
-    serializer_class = PatientSerializer
+    serializer_class = PatientListSerializer
+
+    # Serializer fields backed by something other than the same-named column
+    FIELD_COLUMNS = {
+        'pk': ['id'],
+        'is_outside_geofence': ['geofence_state__is_outside'],
+        'geofence_changed_at': ['geofence_state__changed_at'],
+        'next_appointment': [],
+    }
+
+    def get_fields(self):
+        all_fields = PatientListSerializer.Meta.fields
+        params = self.request.query_params
+
+        if params.get('fields'):
+            requested = [name.strip() for name in params['fields'].split(',') if name.strip()]
+            unknown = [name for name in requested if name not in all_fields]
+            if unknown:
+                raise ValidationError({"error": f"Unknown fields: {', '.join(unknown)}."})
+            return [name for name in all_fields if name in requested]
+
+        expand = params.get('expand', '').split(',')
+        if 'all' in expand or (not params.get('expand') and get_role(self.request.user) == BaseUser.PATIENT):
+            return list(all_fields)
+        return [name for name in all_fields if name in PatientListSerializer.SUMMARY_FIELDS or name in expand]
+
+    @conditional_get
+    def get(self, request, *args, **kwargs):
+        # Reject unknown ?fields= here; get_queryset turns exceptions into 500s
+        self.get_fields()
+        return super().get(request, *args, **kwargs)
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_patients(self):
+        """
+        If the user is a caretaker, all patients assigned to them.
+        If the user is a patient, only themselves.
+        """
+        user = self.request.user
+        role = get_role(user)
+        if role == BaseUser.CARETAKER:
+            return Patient.objects.filter(caretakers=user)
+        if role == BaseUser.PATIENT:
+            return Patient.objects.filter(id=user.id)
+        return None
+
+    def get_version(self, request, *args, **kwargs):
+        """
+        Everything the list renders, as a handful of aggregates: membership,
+        location versions, who is outside, logged edits and how many
+        appointments are still upcoming (the next one moves as they pass).
+        """
+        patients = self.get_patients()
+        if patients is None:
+            return None
+        outside = Q(geofence_state__is_outside=True)
+        summary = patients.aggregate(
+            count=Count('id'),
+            ids=Sum('id'),
+            locations=Sum('location_version'),
+            outside=Count('id', filter=outside),
+            outside_ids=Sum('id', filter=outside),
+            geofence_changed=Max('geofence_state__changed_at'),
+        )
+        last_change = ChangeLog.objects.filter(patient__in=patients).aggregate(last=Max('id'))['last']
+        upcoming = Appointment.objects.filter(patient__in=patients, scheduled_at__gte=timezone.now()).count()
+        return (sorted(summary.items()), last_change, upcoming)
 
     def get_queryset(self):
         """
         Return the list of patients for the authenticated user.
-        If the user is a caretaker, return all patients assigned to them.
-        If the user is a patient, return only their own details.
+        Only the columns the selected fields need are loaded.
         """
-        user = self.request.user
         try:
-            # Check if the user is a Caretaker
-            if hasattr(user, 'caretaker') and isinstance(user.caretaker, caretaker):
-                return Patient.objects.filter(caretakers=user)
-
-            # Check if the user is a Patient
-            elif hasattr(user, 'patient') and isinstance(user.patient, Patient):
-                return Patient.objects.filter(id=user.id)
-
-            # Fallback for users with neither role
-            print("User is neither caretaker nor patient")
-            return Patient.objects.none()
+            queryset = self.get_patients()
+            if queryset is None:
+                # Fallback for users with neither role
+                print("User is neither caretaker nor patient")
+                return Patient.objects.none()
+
+            columns = []
+            for name in self.get_fields():
+                columns += self.FIELD_COLUMNS.get(name, [name])
+            if any(column.startswith('geofence_state__') for column in columns):
+                queryset = queryset.select_related('geofence_state')
+            if 'next_appointment' in self.get_fields():
+                queryset = queryset.prefetch_related(Prefetch(
+                    'patient_appointments',
+                    queryset=Appointment.objects.filter(scheduled_at__gte=timezone.now()).order_by('scheduled_at', 'id'),
+                    to_attr='upcoming_appointments'
+                ))
+            return queryset.only(*columns)
 
         except Exception as e:
             return Response(
@@ -181,7 +259,7 @@ class PatientListView(generics.ListAPIView):
         Only caretakers are allowed to set the center for their assigned patients.
         """
         user = request.user
-        if not hasattr(user, 'caretaker') or not isinstance(user.caretaker, caretaker):
+        if get_role(user) != BaseUser.CARETAKER:
             return Response(
                 {"error": "You are not authorized to set the center."},
                 status=status.HTTP_403_FORBIDDEN
@@ -205,7 +283,7 @@ class PatientListView(generics.ListAPIView):
             patient.center_coordinates_long = center_long
             patient.save()
 
-            serializer = self.serializer_class(patient)
+            serializer = PatientSerializer(patient)
             return Response(
                 {"message": "Center updated successfully.", "patient": serializer.data},
                 status=status.HTTP_200_OK
@@ -218,6 +296,15 @@ class CaretakerDetailView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated, Iscaretaker]
     serializer_class = CaretakerSerializer
 
+    def get_version(self, request, *args, **kwargs):
+        # Patient assignments also touch updated_at (see users.signals)
+        self.updated_at = BaseUser.objects.filter(pk=request.user.pk).values_list('updated_at', flat=True).first()
+        return self.updated_at
+
+    def get_last_modified(self, request, *args, **kwargs):
+        return self.updated_at
+
+    @conditional_get
     def get(self, request, *args, **kwargs):
         """
         Retrieve the caretaker details for the authenticated user.
@@ -255,7 +342,11 @@ class CaretakerDetailView(generics.RetrieveAPIView):
         return caretaker.objects.filter(id=self.request.user.id)
     
     
-class UpdatePatientDetailsView(generics.UpdateAPIView):
+class UpdatePatientDetailsView(generics.RetrieveUpdateAPIView):
+    """
+    A caretaker's patient: GET returns the full record the detail screens
+    need (the list only carries a summary), PUT/PATCH updates it.
+    """
     permission_classes = [IsAuthenticated, Iscaretaker]
     serializer_class = PatientSerializer
 
@@ -284,6 +375,14 @@ class UpdatePatientDetailsView(generics.UpdateAPIView):
             self.perform_update(serializer)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def perform_update(self, serializer):
+        patient = serializer.save()
+        # Keep the Medicine/Appointment tables in step with the JSON the app edits
+        changed = [name for name in ('medicines', 'appointments') if name in serializer.validated_data]
+        if changed:
+            sync_patient_schedule(patient, changed)
+            request_reminder_reload(patient.pk)
     
 class NoteListCreateView(generics.ListCreateAPIView):
     """
@@ -291,13 +390,21 @@ class NoteListCreateView(generics.ListCreateAPIView):
     """
     permission_classes = [IsAuthenticated, IsPatient]
     serializer_class = NoteSerializer
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         """
         Return notes only for the authenticated patient
         """
-        patient = self.request.user.patient
-        return Note.objects.filter(patient=patient)
+        # IsPatient already checked the role, so the user's pk is the patient's
+        return Note.objects.filter(patient_id=self.request.user.pk)
+
+    def get_version(self, request, *args, **kwargs):
+        return queryset_version(self.get_queryset())
+
+    @conditional_get
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 class NoteDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
@@ -310,19 +417,25 @@ class NoteDetailView(generics.RetrieveUpdateDestroyAPIView):
         """
         Ensure only the patient's own notes can be accessed
         """
-        patient = self.request.user.patient
-        return Note.objects.filter(patient=patient)
+        # IsPatient already checked the role, so the user's pk is the patient's
+        return Note.objects.filter(patient_id=self.request.user.pk)
+
+    def get_version(self, request, *args, **kwargs):
+        # This note's own edit time; None for a missing note, so get() answers 404
+        return self.get_queryset().filter(pk=kwargs['pk']).values_list('updated_at', flat=True).first()
+
+    @conditional_get
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
     
 class GeofenceView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated, IsPatient]
 
     def post(self, request):
-        user = request.user
-        if not hasattr(user, 'patient'):
+        patient = get_profile(request.user)
+        if not isinstance(patient, Patient):
             return Response({"error": "User is not a patient."}, status=status.HTTP_400_BAD_REQUEST)
 
-        patient = user.patient
-
         # Get current location from request data
         current_lat = request.data.get('current_lat')
         current_long = request.data.get('current_long')
@@ -330,33 +443,401 @@ class GeofenceView(generics.GenericAPIView):
         if current_lat is None or current_long is None:
             return Response({"error": "Current location is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Update current location in the database
-        patient.current_coordinates_lat = current_lat
-        patient.current_coordinates_long = current_long
-        patient.save()
+        try:
+            current_lat, current_long = float(current_lat), float(current_long)
+        except (TypeError, ValueError):
+            return Response({"error": "Current location must be numeric."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Record the fix and denormalise it onto the patient row
+        fix = LocationFix(patient=patient, timestamp=timezone.now(), latitude=current_lat, longitude=current_long)
+        LocationFix.objects.bulk_create([fix], ignore_conflicts=True)
+        update_current_location(patient, fix)
 
         # Check if the user is outside the geofence
-        center_point = (patient.center_coordinates_lat, patient.center_coordinates_long)
-        current_point = (current_lat, current_long)
-        radius = patient.radius
+        location_data = build_location_payload(patient)
+
+        # Push the new fix to caretakers watching this patient
+        publish_location(patient.id, location_data)
+
+        return Response({
+            **geofence_status(patient, [fix], location_data),
+            "distance_from_center": location_data["distance_from_center"]
+        }, status=status.HTTP_200_OK)
+
+class PatientStatusListView(generics.GenericAPIView):
+    """
+    Geofence status of all the caretaker's patients. The home circles are
+    evaluated in one vectorised pass; only patients outside theirs who have
+    SafeZones are then checked against their zone index, so the result
+    agrees with PatientLocationView.
+    """
+    permission_classes = [IsAuthenticated, Iscaretaker]
+
+    def get(self, request):
+        patients = list(
+            Patient.objects.filter(caretakers=request.user)
+            .order_by('id')
+            .only('name', 'zones_version', *POPULATION_FIELDS)
+        )
+        rows = [[getattr(patient, field) for field in POPULATION_FIELDS] for patient in patients]
+        statuses = GeofencePopulation.from_rows(rows).evaluate().as_dict()
+
+        zoned = set(
+            SafeZone.objects.filter(patient_id__in=[patient.pk for patient in patients])
+            .values_list('patient_id', flat=True)
+        )
+        for patient in patients:
+            entry = statuses[patient.pk]
+            if patient.pk not in zoned or entry["is_outside_geofence"] is False:
+                continue
+            if patient.current_coordinates_lat is None or patient.current_coordinates_long is None:
+                continue
+            check = get_patient_index(patient).locate(
+                float(patient.current_coordinates_lat),
+                float(patient.current_coordinates_long)
+            )
+            entry["is_outside_geofence"] = not check.inside
+
+        return Response([
+            {"id": patient.pk, "name": patient.name, **statuses[patient.pk]}
+            for patient in patients
+        ], status=status.HTTP_200_OK)
+
+
+class LocationBatchView(generics.GenericAPIView):
+    """
+    Ingest a batch of buffered location fixes from a patient's device.
+    A lone fix may omit its timestamp (taken as now); in a larger batch
+    every fix must carry one.
+    """
+    permission_classes = [IsAuthenticated, IsPatient]
+    serializer_class = LocationFixSerializer
+    max_batch_size = 1000
+
+    def post(self, request):
+        patient = get_profile(request.user)
+
+        # Accept either a bare list or {"fixes": [...]}
+        data = request.data.get('fixes') if isinstance(request.data, dict) else request.data
+        if not isinstance(data, list) or not data:
+            return Response({"error": "A non-empty list of fixes is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(data) > self.max_batch_size:
+            return Response(
+                {"error": f"At most {self.max_batch_size} fixes can be sent in one batch."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = self.get_serializer(data=data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        # Undated fixes are stamped with the current time, so several in one batch
+        # would collide on (patient, timestamp) and all but one be dropped
+        undated = [index for index, item in enumerate(serializer.validated_data) if 'timestamp' not in item]
+        if undated and len(data) > 1:
+            return Response(
+                {"error": "Every fix in a batch needs a timestamp.", "undated": undated},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        now = timezone.now()
+        fixes = [
+            LocationFix(patient=patient, **{'timestamp': now, **item})
+            for item in serializer.validated_data
+        ]
+        # Resent fixes (a retried upload, or a repeat within the batch) are
+        # stored and tracked once, so they can't fire the same crossing again
+        stored = set(
+            patient.location_fixes.filter(timestamp__in=[fix.timestamp for fix in fixes])
+            .values_list('timestamp', flat=True)
+        )
+        new_fixes = []
+        for fix in fixes:
+            if fix.timestamp not in stored:
+                stored.add(fix.timestamp)
+                new_fixes.append(fix)
+        # A concurrent upload of the same fixes still hits the (patient, timestamp) constraint
+        LocationFix.objects.bulk_create(new_fixes, ignore_conflicts=True)
+
+        # Only the most recent fix is denormalised onto the patient,
+        # and only if a newer one has not already been recorded
+        latest = max(fixes, key=lambda fix: fix.timestamp)
+        if not patient.location_fixes.filter(timestamp__gt=latest.timestamp).exists():
+            update_current_location(patient, latest)
+
+        location_data = build_location_payload(patient)
+        publish_location(patient.id, location_data)
+
+        return Response({
+            "received": len(fixes),
+            **geofence_status(patient, new_fixes, location_data),
+            "distance_from_center": location_data["distance_from_center"]
+        }, status=status.HTTP_201_CREATED)
+
+
+def update_current_location(patient, fix):
+    """
+    Copy a fix onto the patient without rewriting the rest of the row.
+    """
+    patient.current_coordinates_lat = fix.latitude
+    patient.current_coordinates_long = fix.longitude
+    patient.save(update_fields=['current_coordinates_lat', 'current_coordinates_long'])
+
+
+def geofence_status(patient, fixes, location_data):
+    """
+    Run new fixes through the transition detector and publish any crossings.
+    is_outside_geofence reports the confirmed (debounced) state; geofence_event
+    is only set on the ping that confirms an enter/exit; next_report_after_s
+    hints when the device should send its next fix.
+    """
+    state, events = track_fixes(patient, fixes)
+    for event in events:
+        publish_geofence_event(patient.id, event)
+
+    if state is None or state.is_outside is None:
+        is_outside_geofence = location_data["is_outside_geofence"]
+    else:
+        is_outside_geofence = state.is_outside
+
+    # Speed since the previous stored fix drives the reporting cadence
+    speed_mps = None
+    latest = max(fixes, key=lambda fix: fix.timestamp, default=None)
+    if latest is not None:
+        previous = (
+            LocationFix.objects.filter(patient=patient, timestamp__lt=latest.timestamp)
+            .order_by('-timestamp')
+            .values_list('timestamp', 'latitude', 'longitude')
+            .first()
+        )
+        speed_mps = estimate_speed_mps(previous, (latest.timestamp, latest.latitude, latest.longitude))
+
+    return {
+        "is_outside_geofence": is_outside_geofence,
+        "geofence_event": events[-1].kind if events else None,
+        "next_report_after_s": next_report_interval(
+            location_data["distance_from_edge"],
+            speed_mps,
+            crossing_pending=state is not None and state.pending_since is not None
+        )
+    }
+
+
+class PatientTrailView(generics.GenericAPIView):
+    """
+    A patient's movement trail for one day as a single encoded polyline
+    """
+    permission_classes = [IsAuthenticated, Iscaretaker]
+
+    def get(self, request, patient_id):
+        if not Patient.objects.filter(id=patient_id, caretakers=request.user).exists():
+            return Response({"error": "Patient not found or not assigned to you."}, status=status.HTTP_404_NOT_FOUND)
 
-        distance_km = distance(center_point, current_point).km
+        try:
+            day = date.fromisoformat(request.query_params.get('date', timezone.localdate().isoformat()))
+        except ValueError:
+            return Response({"error": "Date must be in YYYY-MM-DD format."}, status=status.HTTP_400_BAD_REQUEST)
 
-        is_outside_geofence = distance_km > radius
+        # Past days are normally compacted already; today is simplified on the fly
+        trail = LocationTrail.objects.filter(patient_id=patient_id, date=day).first()
+        if trail is None or day >= timezone.localdate():
+            trail = build_trail(patient_id, day, previous=trail) or trail
+        if trail is None:
+            return Response({"error": "No location history for this day."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Return user data
-        serializer = PatientSerializer(patient)
         return Response({
-            "is_outside_geofence": is_outside_geofence,
-            "distance_from_center": distance_km
+            "date": day.isoformat(),
+            "start_time": trail.start_time,
+            "polyline": trail.polyline,
+            "polyline_precision": POLYLINE_PRECISION,
+            "timestamps": trail.timestamps,
+            "point_count": trail.point_count,
+            "raw_point_count": trail.raw_point_count
         }, status=status.HTTP_200_OK)
 
+
+def visible_to(queryset, user):
+    """
+    Restrict per-patient rows to the caretaker's patients, or to the patient's own
+    """
+    role = get_role(user)
+    if role == BaseUser.CARETAKER:
+        return queryset.filter(patient__caretakers=user)
+    if role == BaseUser.PATIENT:
+        return queryset.filter(patient_id=user.pk)
+    return queryset.none()
+
+
+class MedicineListView(generics.ListAPIView):
+    """
+    Paged medicines of the user's patients.
+    ?patient=<id> and ?search=<name> narrow the list.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = MedicineSerializer
+    pagination_class = StandardPagination
+
+    def get_queryset(self):
+        queryset = visible_to(Medicine.objects.all(), self.request.user)
+        params = self.request.query_params
+        if params.get('patient'):
+            if not params['patient'].isdigit():
+                raise ValidationError({"error": "patient must be a patient id."})
+            queryset = queryset.filter(patient_id=params['patient'])
+        if params.get('search'):
+            queryset = queryset.filter(name__icontains=params['search'])
+        return queryset.order_by('patient_id', 'name', 'id')
+
+
+class AppointmentListView(generics.ListAPIView):
+    """
+    Paged appointments of the user's patients, soonest first.
+    ?patient=<id>, ?after=/?before=<ISO datetime> and ?within=<minutes from
+    now> narrow the list, e.g. ?within=60 for the next hour.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = AppointmentSerializer
+    pagination_class = StandardPagination
+    # Furthest ahead ?within may look: a year
+    MAX_WITHIN_MINUTES = 366 * 24 * 60
+
+    def get_queryset(self):
+        queryset = visible_to(Appointment.objects.all(), self.request.user)
+        params = self.request.query_params
+        if params.get('patient'):
+            if not params['patient'].isdigit():
+                raise ValidationError({"error": "patient must be a patient id."})
+            queryset = queryset.filter(patient_id=params['patient'])
+
+        if params.get('within'):
+            try:
+                minutes = float(params['within'])
+            except ValueError:
+                raise ValidationError({"error": "within must be a number of minutes."})
+            # float() also accepts inf, nan and 1e20, none of which fit a timedelta
+            if not math.isfinite(minutes) or not 0 <= minutes <= self.MAX_WITHIN_MINUTES:
+                raise ValidationError({"error": f"within must be between 0 and {self.MAX_WITHIN_MINUTES} minutes."})
+            now = timezone.now()
+            queryset = queryset.filter(scheduled_at__gte=now, scheduled_at__lte=now + timedelta(minutes=minutes))
+
+        for param, lookup in (('after', 'scheduled_at__gte'), ('before', 'scheduled_at__lte')):
+            if params.get(param):
+                value = parse_datetime(params[param])
+                if value is None:
+                    raise ValidationError({"error": f"{param} must be an ISO 8601 datetime."})
+                if timezone.is_naive(value):
+                    value = timezone.make_aware(value)
+                queryset = queryset.filter(**{lookup: value})
+
+        return queryset.order_by('scheduled_at', 'id')
+
+
+class SyncView(generics.GenericAPIView):
+    """
+    Rows of notes, contacts, medicines, appointments and patient records
+    created, updated or deleted since ?since=<cursor>, collapsed to their
+    latest state. Without ?since= only the current cursor is returned, so
+    clients fetch the full lists once and sync from there.
+    ?patient=<id> narrows a caretaker's sync to one patient.
+    """
+    permission_classes = [IsAuthenticated]
+    max_changes = 500
+
+    # resource -> (response key, model, serializer)
+    RESOURCES = {
+        ChangeLog.NOTE: ('notes', Note, NoteSerializer),
+        ChangeLog.CONTACT: ('contacts', Contact, ContactSerializer),
+        ChangeLog.MEDICINE: ('medicines', Medicine, MedicineSerializer),
+        ChangeLog.APPOINTMENT: ('appointments', Appointment, AppointmentSerializer),
+        ChangeLog.PATIENT: ('patients', Patient, PatientSerializer),
+    }
+
+    def get(self, request):
+        log = visible_to(ChangeLog.objects.all(), request.user)
+        patient = request.query_params.get('patient')
+        if patient:
+            if not patient.isdigit():
+                return Response({"error": "patient must be a patient id."}, status=status.HTTP_400_BAD_REQUEST)
+            log = log.filter(patient_id=patient)
+
+        since = request.query_params.get('since')
+        if since is None:
+            latest = log.order_by('-id').values_list('id', flat=True).first()
+            return Response({"cursor": latest or 0, "has_more": False, "changes": {}}, status=status.HTTP_200_OK)
+        if not since.isdigit():
+            return Response({"error": "since must be a cursor returned by this endpoint."}, status=status.HTTP_400_BAD_REQUEST)
+
+        entries = list(log.filter(id__gt=int(since)).order_by('id')[:self.max_changes + 1])
+        has_more = len(entries) > self.max_changes
+        entries = entries[:self.max_changes]
+        cursor = entries[-1].id if entries else int(since)
+
+        changes = {}
+        for resource, objects in collapse(entries).items():
+            key, model, serializer_class = self.RESOURCES[resource]
+            updated_ids = [object_id for object_id, deleted in objects.items() if not deleted]
+            rows = model.objects.filter(pk__in=updated_ids) if updated_ids else []
+            changes[key] = {
+                "updated": serializer_class(rows, many=True, context=self.get_serializer_context()).data,
+                "deleted": [object_id for object_id, deleted in objects.items() if deleted],
+            }
+
+        return Response({"cursor": cursor, "has_more": has_more, "changes": changes}, status=status.HTTP_200_OK)
+
+
+class SafeZoneListCreateView(generics.ListCreateAPIView):
+    """
+    List and create safe zones for one of the caretaker's patients
+    """
+    permission_classes = [IsAuthenticated, Iscaretaker]
+    serializer_class = SafeZoneSerializer
+
+    def get_queryset(self):
+        return SafeZone.objects.filter(
+            patient_id=self.kwargs['patient_id'],
+            patient__caretakers=self.request.user
+        )
+
+    def perform_create(self, serializer):
+        try:
+            patient = Patient.objects.get(id=self.kwargs['patient_id'], caretakers=self.request.user)
+        except Patient.DoesNotExist:
+            raise NotFound("Patient not found or not assigned to you.")
+        serializer.save(patient=patient)
+
+
+class SafeZoneDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """
+    Retrieve, update, and delete one of a patient's safe zones
+    """
+    permission_classes = [IsAuthenticated, Iscaretaker]
+    serializer_class = SafeZoneSerializer
+
+    def get_queryset(self):
+        return SafeZone.objects.filter(
+            patient_id=self.kwargs['patient_id'],
+            patient__caretakers=self.request.user
+        )
+
+
 class PatientLocationView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated, Iscaretaker]
 
+    def get_version(self, request, patient_id):
+        """
+        The payload only changes with the location or the safe zones, so two
+        counters decide a 304 without loading the patient row. Unknown or
+        unassigned patients fall through to the normal 404/403 handling.
+        """
+        return (
+            Patient.objects.filter(id=patient_id, caretakers=request.user)
+            .values_list('location_version', 'zones_version')
+            .first()
+        )
+
+    @conditional_get
     def get(self, request, patient_id):
         user = request.user
-        if not hasattr(user, 'caretaker'):
+        if get_role(user) != BaseUser.CARETAKER:
             return Response({"error": "User is not a caretaker."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
@@ -368,29 +849,14 @@ class PatientLocationView(generics.GenericAPIView):
         if not patient.caretakers.filter(id=user.id).exists():
             return Response({"error": "You are not authorized to view this patient's location."}, status=status.HTTP_403_FORBIDDEN)
 
-        # Calculate if the patient is outside the geofence
-        center_point = (patient.center_coordinates_lat, patient.center_coordinates_long)
-        current_point = (patient.current_coordinates_lat, patient.current_coordinates_long)
-        radius = patient.radius
-        distance_km = distance(center_point, current_point).km
-        is_outside_geofence = distance_km > radius
-
         # Return patient's current location data along with geofence status
-        location_data = {
-            "current_coordinates_lat": patient.current_coordinates_lat,
-            "current_coordinates_long": patient.current_coordinates_long,
-            "radius": patient.radius,
-            "center_coordinates_lat": patient.center_coordinates_lat,
-            "center_coordinates_long": patient.center_coordinates_long,
-            "is_outside_geofence": is_outside_geofence,
-            "distance_from_center": distance_km
-        }
+        location_data = build_location_payload(patient)
         return Response(location_data, status=status.HTTP_200_OK)
         
 
     def post(self, request, patient_id):
         user = request.user
-        if not hasattr(user, 'caretaker'):
+        if get_role(user) != BaseUser.CARETAKER:
             return Response({"error": "User is not a caretaker."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
@@ -416,6 +882,11 @@ class PatientLocationView(generics.GenericAPIView):
         patient.radius = new_radius
         patient.save()
 
+        # Subscribed maps redraw the new zone without waiting for the next fix
+        if patient.current_coordinates_lat is not None:
+            patient.refresh_from_db(fields=['center_coordinates_lat', 'center_coordinates_long', 'radius'])
+            publish_location(patient.id, build_location_payload(patient))
+
         return Response({"message": "Patient center location and radius updated successfully."}, status=status.HTTP_200_OK)
 
 
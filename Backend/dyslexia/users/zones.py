@@ -0,0 +1,309 @@
+"""
+Safe zones and an in-process spatial index over them.
+
+A patient can have several circular and polygonal safe zones (SafeZone
+rows) plus the legacy circle stored on Patient itself. Zones are bucketed
+by the geohash cells that cover their bounding box, so a point lookup only
+tests the handful of zones in its own cell. Indexes are cached per process
+and keyed on Patient.zones_version, which SafeZone bumps on every change.
+"""
+import math
+from collections import OrderedDict
+import numpy as np
+from .models import SafeZone
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Precision 5 cells are about 4.9km x 4.9km
+DEFAULT_PRECISION = 5
+INDEX_CACHE_SIZE = 10000
+
+
+def point_distance_km(lat1, lon1, lat2, lon2):
+    """
+    Haversine distance between two points, in kilometers.
+    """
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def geohash_encode(lat, lon, precision=DEFAULT_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, bounds = (lon, lon_range) if even else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            bounds[0] = mid
+        else:
+            bounds[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision=DEFAULT_PRECISION):
+    """
+    (lat_degrees, lon_degrees) spanned by one cell at this precision.
+    """
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = math.floor(precision * 5 / 2)
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def geohash_cover(min_lat, min_lon, max_lat, max_lon, precision=DEFAULT_PRECISION):
+    """
+    All geohash cells that intersect a bounding box.
+    """
+    lat_step, lon_step = geohash_cell_size(precision)
+    # Snap to the cell grid so every cell is visited exactly once
+    lat = math.floor((max(min_lat, -90.0) + 90.0) / lat_step) * lat_step - 90.0
+    start_lon = math.floor((max(min_lon, -180.0) + 180.0) / lon_step) * lon_step - 180.0
+    cells = set()
+    while lat <= min(max_lat, 90.0):
+        lon = start_lon
+        while lon <= min(max_lon, 180.0):
+            cells.add(geohash_encode(
+                min(lat + lat_step / 2, 90.0),
+                min(lon + lon_step / 2, 180.0),
+                precision
+            ))
+            lon += lon_step
+        lat += lat_step
+    return cells
+
+
+class Zone:
+    """
+    A safe zone in plain Python, detached from the ORM for fast lookups.
+    Radius is in kilometers; polygon is a list of [lat, long] vertices.
+    """
+
+    def __init__(self, zone_id, name, kind, center_lat=None, center_long=None, radius=None, polygon=None):
+        self.id = zone_id
+        self.name = name
+        self.kind = kind
+        self.radius = radius
+        self.polygon = [(float(lat), float(lon)) for lat, lon in (polygon or [])]
+
+        if kind == SafeZone.POLYGON:
+            lats = [lat for lat, _ in self.polygon]
+            lons = [lon for _, lon in self.polygon]
+            self.bbox = (min(lats), min(lons), max(lats), max(lons))
+            self.center_lat = sum(lats) / len(lats)
+            self.center_long = sum(lons) / len(lons)
+        else:
+            self.center_lat = float(center_lat)
+            self.center_long = float(center_long)
+            dlat = math.degrees(radius / EARTH_RADIUS_KM)
+            dlon = dlat / max(math.cos(math.radians(self.center_lat)), 1e-6)
+            self.bbox = (
+                self.center_lat - dlat, self.center_long - dlon,
+                self.center_lat + dlat, self.center_long + dlon,
+            )
+
+    def contains(self, lat, lon):
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+            return False
+        if self.kind == SafeZone.POLYGON:
+            return self._polygon_contains(lat, lon)
+        return point_distance_km(self.center_lat, self.center_long, lat, lon) <= self.radius
+
+    def edge_distance_km(self, lat, lon):
+        """
+        Signed distance from the point to the zone boundary, positive inside.
+        """
+        if self.kind == SafeZone.POLYGON:
+            distance_km = self._polygon_edge_distance_km(lat, lon)
+            return distance_km if self._polygon_contains(lat, lon) else -distance_km
+        return self.radius - point_distance_km(self.center_lat, self.center_long, lat, lon)
+
+    def center_distance_km(self, lat, lon):
+        return point_distance_km(self.center_lat, self.center_long, lat, lon)
+
+    def _polygon_contains(self, lat, lon):
+        # Ray casting in the lat/long plane; fine at city scale
+        inside = False
+        vertices = self.polygon
+        j = len(vertices) - 1
+        for i in range(len(vertices)):
+            lat_i, lon_i = vertices[i]
+            lat_j, lon_j = vertices[j]
+            if (lat_i > lat) != (lat_j > lat):
+                crossing_lon = lon_i + (lat - lat_i) * (lon_j - lon_i) / (lat_j - lat_i)
+                if lon < crossing_lon:
+                    inside = not inside
+            j = i
+        return inside
+
+    def _polygon_edge_distance_km(self, lat, lon):
+        # Project onto a local plane in km around the point
+        kx = math.radians(1) * EARTH_RADIUS_KM * math.cos(math.radians(lat))
+        ky = math.radians(1) * EARTH_RADIUS_KM
+        points = [((v_lon - lon) * kx, (v_lat - lat) * ky) for v_lat, v_lon in self.polygon]
+        best = float('inf')
+        for i in range(len(points)):
+            ax, ay = points[i - 1]
+            bx, by = points[i]
+            dx, dy = bx - ax, by - ay
+            length_sq = dx * dx + dy * dy
+            t = 0.0 if length_sq == 0 else max(0.0, min(1.0, -(ax * dx + ay * dy) / length_sq))
+            best = min(best, math.hypot(ax + t * dx, ay + t * dy))
+        return best
+
+
+class ZoneCheck:
+    """
+    Result of locating a point against a patient's safe zones.
+    """
+
+    def __init__(self, zone, edge_distance_km, center_distance_km):
+        self.zone = zone
+        self.edge_distance_km = edge_distance_km
+        self.center_distance_km = center_distance_km
+
+    @property
+    def inside(self):
+        return self.edge_distance_km >= 0
+
+
+class SafeZoneIndex:
+    """
+    Geohash-bucketed index over one patient's zones.
+    """
+
+    def __init__(self, zones, precision=DEFAULT_PRECISION):
+        self.zones = list(zones)
+        self.precision = precision
+        self.lat_step, self.lon_step = geohash_cell_size(precision)
+        self.buckets = {}
+        for zone in self.zones:
+            for cell in geohash_cover(*zone.bbox, precision=precision):
+                self.buckets.setdefault(cell, []).append(zone)
+        self.bboxes = np.array([zone.bbox for zone in self.zones], dtype=float).reshape(-1, 4)
+
+    def __len__(self):
+        return len(self.zones)
+
+    def candidates(self, lat, lon):
+        return self.buckets.get(geohash_encode(lat, lon, self.precision), ())
+
+    def neighbours(self, lat, lon):
+        """
+        Zones bucketed in the point's cell and the eight cells around it.
+        """
+        zones = {}
+        for dlat in (-self.lat_step, 0.0, self.lat_step):
+            for dlon in (-self.lon_step, 0.0, self.lon_step):
+                cell_lat = min(max(lat + dlat, -90.0), 90.0)
+                cell_lon = (lon + dlon + 180.0) % 360.0 - 180.0
+                for zone in self.buckets.get(geohash_encode(cell_lat, cell_lon, self.precision), ()):
+                    zones[id(zone)] = zone
+        return zones.values()
+
+    def locate(self, lat, lon):
+        """
+        Return a ZoneCheck for the point, or None if the patient has no zones.
+        Inside: the containing zone whose edge is furthest away.
+        Outside: the zone whose edge is nearest.
+        """
+        if not self.zones:
+            return None
+
+        best = None
+        for zone in self.candidates(lat, lon):
+            if zone.contains(lat, lon):
+                edge_km = zone.edge_distance_km(lat, lon)
+                if best is None or edge_km > best[1]:
+                    best = (zone, edge_km)
+
+        if best is None:
+            best = self.nearest_outside(lat, lon)
+
+        zone, edge_km = best
+        return ZoneCheck(zone, edge_km, zone.center_distance_km(lat, lon))
+
+    def nearest_outside(self, lat, lon):
+        """
+        Nearest zone edge for a point that is outside every zone.
+        """
+        # Anything beyond the 3x3 block is at least one cell away, so a hit
+        # closer than that is exact
+        cell_km = math.radians(min(self.lat_step, self.lon_step * math.cos(math.radians(lat)))) * EARTH_RADIUS_KM
+        nearby = [(zone, zone.edge_distance_km(lat, lon)) for zone in self.neighbours(lat, lon)]
+        if nearby:
+            best = max(nearby, key=lambda item: item[1])
+            if -best[1] <= cell_km:
+                return best
+
+        # Far from every zone: pick the closest bounding box in one vectorised
+        # pass and only measure that zone exactly
+        gap_lat = np.maximum(0.0, np.maximum(self.bboxes[:, 0] - lat, lat - self.bboxes[:, 2]))
+        gap_lon = np.maximum(0.0, np.maximum(self.bboxes[:, 1] - lon, lon - self.bboxes[:, 3]))
+        gap_lon *= math.cos(math.radians(lat))
+        zone = self.zones[int(np.argmin(gap_lat * gap_lat + gap_lon * gap_lon))]
+        return zone, zone.edge_distance_km(lat, lon)
+
+
+_index_cache = OrderedDict()
+
+
+def patient_zones(patient):
+    """
+    The patient's SafeZone rows plus the legacy circle on the Patient row.
+    """
+    zones = []
+    if patient.center_coordinates_lat is not None and patient.center_coordinates_long is not None:
+        zones.append(Zone(
+            None, 'Home', SafeZone.CIRCLE,
+            center_lat=patient.center_coordinates_lat,
+            center_long=patient.center_coordinates_long,
+            radius=float(patient.radius),
+        ))
+    for row in SafeZone.objects.filter(patient_id=patient.pk).values(
+        'id', 'name', 'kind', 'center_lat', 'center_long', 'radius', 'polygon'
+    ):
+        zones.append(Zone(
+            row['id'], row['name'], row['kind'],
+            center_lat=row['center_lat'],
+            center_long=row['center_long'],
+            radius=row['radius'],
+            polygon=row['polygon'],
+        ))
+    return zones
+
+
+def get_patient_index(patient):
+    """
+    Cached SafeZoneIndex for a patient, rebuilt when their zones change.
+    """
+    key = (
+        patient.zones_version,
+        patient.center_coordinates_lat,
+        patient.center_coordinates_long,
+        patient.radius,
+    )
+    cached = _index_cache.get(patient.pk)
+    if cached is not None and cached[0] == key:
+        _index_cache.move_to_end(patient.pk)
+        return cached[1]
+
+    index = SafeZoneIndex(patient_zones(patient))
+    _index_cache[patient.pk] = (key, index)
+    _index_cache.move_to_end(patient.pk)
+    while len(_index_cache) > INDEX_CACHE_SIZE:
+        _index_cache.popitem(last=False)
+    return index
@@ -19,6 +19,7 @@ class _AppointmentsPageState extends State<AppointmentsPage> with SingleTickerPr
   @override
   void initState() {
     super.initState();
+    Provider.of<PatientProvider>(context, listen: false).loadSelectedDetails();
     _controller = AnimationController(
       duration: const Duration(milliseconds: 500),
       vsync: this,
@@ -132,12 +132,20 @@ class CaretakerHomePage extends StatelessWidget {
                           subtitle: Text(patient.email),
                           trailing: IconButton(
                             icon: Icon(Icons.edit),
-                            onPressed: () {
+                            onPressed: () async {
+                              // The form saves the whole record, so load it first
+                              await patientProvider.loadDetails(patient.id);
+                              final loaded = patientProvider.selectedPatient;
+                              if (!context.mounted ||
+                                  loaded == null ||
+                                  !patientProvider.isLoaded(loaded.id)) {
+                                return;
+                              }
                               Navigator.push(
                                 context,
                                 MaterialPageRoute(
                                   builder: (context) =>
-                                      UpdateDetailsPage(patient: patient),
+                                      UpdateDetailsPage(patient: loaded),
                                 ),
                               );
                             },
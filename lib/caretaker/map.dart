@@ -45,6 +45,7 @@ class _MapPageState extends State<MapPage>
   @override
   void initState() {
     super.initState();
+    Provider.of<PatientProvider>(context, listen: false).loadSelectedDetails();
     _addMapEventListener();
     _getCurrentLocation();
   }
@@ -36,6 +36,12 @@ class MedicinePage extends StatefulWidget {
 }
 
 class _MedicinePageState extends State<MedicinePage> {
+  @override
+  void initState() {
+    super.initState();
+    Provider.of<PatientProvider>(context, listen: false).loadSelectedDetails();
+  }
+
   Future<void> _addMedicine(BuildContext context) async {
     final TextEditingController nameController = TextEditingController();
     final TextEditingController dosageController = TextEditingController();
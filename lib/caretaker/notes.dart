@@ -42,6 +42,12 @@ class NotesPage extends StatefulWidget {
 class _NotesPageState extends State<NotesPage> {
   Note? selectedNote;
 
+  @override
+  void initState() {
+    super.initState();
+    Provider.of<PatientProvider>(context, listen: false).loadSelectedDetails();
+  }
+
   @override
   Widget build(BuildContext context) {
     final patientProvider = Provider.of<PatientProvider>(context, listen: true);
@@ -95,10 +95,50 @@ class CaretakerProvider with ChangeNotifier {
 class PatientProvider with ChangeNotifier {
   List<Patient> _patients = [];
   Patient? _selectedPatient;
+  // Patients whose full record (medicines, appointments, notes, goals) is loaded
+  Set<String> _loadedPatients = {};
 
   List<Patient> get patients => _patients;
   Patient? get selectedPatient => _selectedPatient;
 
+  bool isLoaded(String patientId) => _loadedPatients.contains(patientId);
+
+  // The caretaker's patient list only carries what the home screen shows;
+  // detail screens call this to fetch the rest the first time they need it
+  Future<void> loadDetails(String patientId) async {
+    if (isLoaded(patientId)) return;
+    final baseURL = Globals.baseURL;
+    final storage = new FlutterSecureStorage();
+    final token = await storage.read(key: 'token') ?? '';
+    final response = await http.get(
+      Uri.parse('$baseURL/api/users/patient/$patientId/'),
+      headers: <String, String>{
+        'Content-Type': 'application/json; charset=UTF-8',
+        'Authorization': "Token $token",
+      },
+    );
+    if (response.statusCode != 200) {
+      print('Failed to load patient details');
+      return;
+    }
+    final patient = Patient.fromJson(jsonDecode(response.body));
+    int index = _patients.indexWhere((p) => p.id == patientId);
+    if (index != -1) {
+      _patients[index] = patient;
+    }
+    if (_selectedPatient?.id == patientId) {
+      _selectedPatient = patient;
+    }
+    _loadedPatients.add(patientId);
+    notifyListeners();
+  }
+
+  Future<void> loadSelectedDetails() async {
+    if (_selectedPatient != null) {
+      await loadDetails(_selectedPatient!.id);
+    }
+  }
+
   // Fetch patients (mock API or real API)
   Future<void> fetchPatients() async {
     // Mock API Response
@@ -153,6 +193,7 @@ class PatientProvider with ChangeNotifier {
   void clearPatients() {
     _patients = [];
     _selectedPatient = null;
+    _loadedPatients = {};
     notifyListeners();
   }
 
@@ -279,6 +320,11 @@ class PatientProvider with ChangeNotifier {
 
   //sync all data with server of selected patient
   Future<void> updateOnServer(String patientId) async {
+    // A summary-only record would overwrite the patient's lists with empty ones
+    if (!isLoaded(patientId)) {
+      print('Patient details not loaded; not updating on server');
+      return;
+    }
     final baseURL = Globals.baseURL;
     final storage = new FlutterSecureStorage();
     final token = await storage.read(key: 'token') ?? '';
@@ -6,7 +6,6 @@ import 'package:flutter/material.dart';
 import 'package:flutter_sound/flutter_sound.dart';
 import 'package:mic_stream/mic_stream.dart';
 import 'package:web_socket_channel/web_socket_channel.dart';
-import 'package:audioplayers/audioplayers.dart';
 import 'package:projects/utils/globals.dart' as globals;
 import 'package:permission_handler/permission_handler.dart';
 
@@ -19,7 +18,9 @@ class _LiveAudioPageState extends State<LiveAudioPage>
     with SingleTickerProviderStateMixin {
   late WebSocketChannel _channel;
   late Stream<List<int>> _microphoneStream;
-  AudioPlayer _audioPlayer = AudioPlayer();
+  // Replies arrive as raw PCM16 chunks streamed into this player
+  final FlutterSoundPlayer _player = FlutterSoundPlayer();
+  int _replySampleRate = 24000;
   List<double> _waveform = [];
   bool _isRecording = false;
   late AnimationController _animationController;
@@ -56,14 +57,22 @@ class _LiveAudioPageState extends State<LiveAudioPage>
 
     _channel.stream.listen((data) async {
       if (data is Uint8List) {
-        // Play backend audio response
-        print(data);
-        await _audioPlayer.play(BytesSource(data));
+        // Play backend audio response as it streams in
+        _player.foodSink?.add(FoodData(data));
       } else if (data is String) {
         // Handle text-based backend responses
         var response = json.decode(data);
-        if (response.containsKey('transcription')) {
-          print('Transcription: ${response['transcription']}');
+        if (response['type'] == 'Connection Successful') {
+          _replySampleRate = response['audio']?['sample_rate'] ?? _replySampleRate;
+          await _startPlayer();
+        } else if (response['type'] == 'transcript') {
+          print('Transcription: ${response['text']}');
+        } else if (response['type'] == 'interrupted') {
+          // Drop the rest of the reply that was cut off
+          await _player.stopPlayer();
+          await _startPlayer();
+        } else if (response['type'] == 'done') {
+          print('Voice turn timings: $response');
         }
       }
     }, onError: (error) {
@@ -73,6 +82,17 @@ class _LiveAudioPageState extends State<LiveAudioPage>
     });
   }
 
+  Future<void> _startPlayer() async {
+    if (!_player.isOpen()) {
+      await _player.openPlayer();
+    }
+    await _player.startPlayerFromStream(
+      codec: Codec.pcm16,
+      numChannels: 1,
+      sampleRate: _replySampleRate,
+    );
+  }
+
   void _startRecording() async {
     if (_isRecording) return;
     setState(() => _isRecording = true);
@@ -114,7 +134,7 @@ class _LiveAudioPageState extends State<LiveAudioPage>
   @override
   void dispose() {
     _stopRecording();
-    _audioPlayer.dispose();
+    _player.closePlayer();
     _animationController.dispose();
     super.dispose();
   }
@@ -42,9 +42,10 @@ Future<bool> fetchData(BuildContext context, [bool update = false]) async {
             .setCaretaker(Caretaker.fromJson(caretakerData));
       }
 
-      // Fetch all patients associated with the caretaker
+      // Fetch all patients associated with the caretaker, with just what the
+      // home screen shows; detail screens load the rest (loadDetails)
       final patientsResponse = await http.get(
-        Uri.parse(dataURL),
+        Uri.parse('$dataURL?fields=id,username,email,name,photo'),
         headers: <String, String>{
           'Content-Type': 'application/json; charset=UTF-8',
           'Authorization': 'Token ${token}',